@@ -0,0 +1,102 @@
+from bson import ObjectId
+from pymongo import ReturnDocument
+from sync import touch
+from timestamps import utc_now
+
+# Optional references recorded with each ledger entry
+DETAIL_FIELDS = ('incidentId', 'teamId', 'note', 'by')
+
+
+class AllocationConflict(Exception):
+    """The resource does not have enough units to reserve or release"""
+
+
+def parse_quantity(value):
+    """Units to reserve or release: a positive integer"""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError('quantity must be a positive integer')
+    return value
+
+
+def _details(body):
+    details = {}
+    for field in DETAIL_FIELDS:
+        value = body.get(field)
+        if value is not None:
+            details[field] = str(value)
+    return details
+
+
+def _record(ledger, resource, action, quantity, details, now, session=None):
+    """Append a ledger entry for a change that has already been applied"""
+    entry = {
+        'resourceId': resource['_id'],
+        'action': action,
+        'quantity': quantity,
+        'availableAfter': resource.get('available'),
+        'at': now,
+        **details,
+    }
+    ledger.insert_one(entry, session=session)
+    return entry
+
+
+def _conflict(resources, object_id, action, quantity, session=None):
+    current = resources.find_one({'_id': object_id}, {'available': 1, 'quantity': 1}, session=session)
+    if current is None:
+        raise LookupError('Resource not found')
+    if action == 'reserve':
+        raise AllocationConflict(f"Cannot reserve {quantity}: only {current.get('available', 0)} available")
+    raise AllocationConflict(
+        f"Cannot release {quantity}: {current.get('available', 0)} of {current.get('quantity', 0)} already available"
+    )
+
+
+def reserve(resources, ledger, resource_id, body, now=None, session=None):
+    """
+    Take `quantity` units out of a resource's available count.
+    A single conditional $inc (guarded by available >= quantity) makes concurrent
+    reservations safe without a read-modify-write round trip; the ledger entry is
+    appended once the update has succeeded.
+    With a `session` in a transaction both writes commit or abort together. Without
+    one, a failed ledger insert is compensated by undoing the $inc before the error
+    is raised, so a retried request does not reserve twice. Only if that compensating
+    update fails as well does the count stay changed without a ledger entry.
+    Returns (resource before, resource after, ledger entry).
+    """
+    return _apply(resources, ledger, resource_id, body, 'reserve', now, session)
+
+
+def release(resources, ledger, resource_id, body, now=None, session=None):
+    """Return `quantity` units to a resource, never exceeding its total quantity"""
+    return _apply(resources, ledger, resource_id, body, 'release', now, session)
+
+
+def _apply(resources, ledger, resource_id, body, action, now=None, session=None):
+    now = now or utc_now()
+    quantity = parse_quantity(body.get('quantity'))
+    object_id = ObjectId(resource_id)
+    if action == 'reserve':
+        guard = {'available': {'$gte': quantity}}
+        change = -quantity
+    else:
+        guard = {'$expr': {'$lte': [{'$add': ['$available', quantity]}, '$quantity']}}
+        change = quantity
+
+    after = resources.find_one_and_update(
+        {'_id': object_id, **guard},
+        {'$inc': {'available': change}, '$set': touch({'lastUpdated': now}, now)},
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if after is None:
+        _conflict(resources, object_id, action, quantity, session)
+    before = {**after, 'available': after['available'] - change}
+    try:
+        entry = _record(ledger, after, action, quantity, _details(body), now, session)
+    except Exception:
+        if session is None:
+            # No transaction to roll back: undo the change the ledger does not record
+            resources.update_one({'_id': object_id}, {'$inc': {'available': -change}})
+        raise
+    return before, after, entry
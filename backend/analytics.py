@@ -0,0 +1,236 @@
+from datetime import datetime, timezone
+import calendar
+
+# Rollup document kept in the analytics collection
+SUMMARY_ID = 'summary'
+# Number of months shown in monthlyIncidents
+MONTHS_SHOWN = 6
+
+
+def _key(value):
+    """Make a value safe to use as a field name in a $inc path"""
+    if value is None or value == '':
+        return 'unknown'
+    return str(value).replace('.', '_').lstrip('$') or 'unknown'
+
+
+def _parse_time(value):
+    """Parse an ISO string or datetime into a naive UTC datetime (None if invalid)"""
+    if isinstance(value, datetime):
+        if value.tzinfo:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if parsed.tzinfo:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    return None
+
+
+def _number(value):
+    """Numeric value as counted by $sum (non-numbers count as 0)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return 0
+
+
+def _response_time(incident):
+    """
+    Time the incident was first responded to: respondedAt when recorded,
+    otherwise updatedAt once the status has moved past 'reported'.
+    """
+    if incident.get('respondedAt') is not None:
+        return _parse_time(incident['respondedAt'])
+    status = incident.get('status')
+    if status is not None and status != 'reported':
+        return _parse_time(incident.get('updatedAt'))
+    return None
+
+
+def incident_contribution(incident):
+    """$inc values one incident contributes to the rollup (mirrors INCIDENT_PIPELINE)"""
+    if not incident:
+        return {}
+    inc = {
+        'incidents.total': 1,
+        f"incidents.byStatus.{_key(incident.get('status'))}": 1,
+        f"incidents.byType.{_key(incident.get('type'))}": 1,
+    }
+    created = _parse_time(incident.get('createdAt'))
+    if created:
+        inc[f"incidents.byMonth.{created.strftime('%Y-%m')}"] = 1
+        responded = _response_time(incident)
+        if responded:
+            inc['incidents.responseMinutes'] = (responded - created).total_seconds() / 60
+            inc['incidents.respondedCount'] = 1
+    return inc
+
+
+def resource_contribution(resource):
+    """$inc values one resource contributes to the rollup"""
+    if not resource:
+        return {}
+    return {
+        'resources.quantity': _number(resource.get('quantity')),
+        'resources.available': _number(resource.get('available')),
+    }
+
+
+def _diff(before, after):
+    delta = dict(after)
+    for key, value in before.items():
+        delta[key] = delta.get(key, 0) - value
+    return {key: value for key, value in delta.items() if value}
+
+
+def apply_delta(analytics_collection, contribution, before=None, after=None):
+    """
+    Incrementally update the rollup for a document going from `before` to `after`
+    (None for inserts/deletes). If no rollup exists yet nothing is written; it is
+    rebuilt from scratch on the next read instead.
+    """
+    apply_batch_delta(analytics_collection, contribution, [(before, after)])
+
+
+def apply_batch_delta(analytics_collection, contribution, changes):
+    """Apply many (before, after) changes to the rollup with a single $inc"""
+    inc = {}
+    for before, after in changes:
+        for key, value in _diff(contribution(before), contribution(after)).items():
+            inc[key] = inc.get(key, 0) + value
+    inc = {key: value for key, value in inc.items() if value}
+    if inc:
+        analytics_collection.update_one({'_id': SUMMARY_ID}, {'$inc': inc})
+
+
+def _to_date(field):
+    return {'$convert': {'input': field, 'to': 'date', 'onError': None, 'onNull': None}}
+
+
+# One pass over incidents producing every rollup bucket at once
+INCIDENT_PIPELINE = [
+    {'$project': {
+        'status': 1,
+        'type': 1,
+        'created': _to_date('$createdAt'),
+        'responded': {'$cond': [
+            {'$ne': [{'$ifNull': ['$respondedAt', None]}, None]},
+            _to_date('$respondedAt'),
+            {'$cond': [
+                {'$ne': [{'$ifNull': ['$status', 'reported']}, 'reported']},
+                _to_date('$updatedAt'),
+                None
+            ]}
+        ]}
+    }},
+    {'$facet': {
+        'byStatus': [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}],
+        'byType': [{'$group': {'_id': '$type', 'count': {'$sum': 1}}}],
+        'byMonth': [
+            {'$match': {'created': {'$ne': None}}},
+            {'$group': {'_id': {'$dateToString': {'format': '%Y-%m', 'date': '$created'}}, 'count': {'$sum': 1}}}
+        ],
+        'response': [
+            {'$match': {'created': {'$ne': None}, 'responded': {'$ne': None}}},
+            {'$group': {
+                '_id': None,
+                'minutes': {'$sum': {'$divide': [{'$subtract': ['$responded', '$created']}, 60000]}},
+                'count': {'$sum': 1}
+            }}
+        ]
+    }}
+]
+
+RESOURCE_PIPELINE = [
+    {'$group': {'_id': None, 'quantity': {'$sum': '$quantity'}, 'available': {'$sum': '$available'}}}
+]
+
+
+def rebuild_summary(analytics_collection, incidents_collection, resources_collection):
+    """Recompute the rollup document from the source collections and store it"""
+    facets = next(incidents_collection.aggregate(INCIDENT_PIPELINE), {})
+    by_status = {}
+    for row in facets.get('byStatus', []):
+        by_status[_key(row['_id'])] = by_status.get(_key(row['_id']), 0) + row['count']
+    by_type = {}
+    for row in facets.get('byType', []):
+        by_type[_key(row['_id'])] = by_type.get(_key(row['_id']), 0) + row['count']
+    response = (facets.get('response') or [{}])[0]
+    resources = next(resources_collection.aggregate(RESOURCE_PIPELINE), {})
+
+    summary = {
+        '_id': SUMMARY_ID,
+        'incidents': {
+            'total': sum(by_status.values()),
+            'byStatus': by_status,
+            'byType': by_type,
+            'byMonth': {row['_id']: row['count'] for row in facets.get('byMonth', [])},
+            'responseMinutes': response.get('minutes', 0),
+            'respondedCount': response.get('count', 0),
+        },
+        'resources': {
+            'quantity': resources.get('quantity', 0),
+            'available': resources.get('available', 0),
+        },
+        'rebuiltAt': datetime.utcnow(),
+    }
+    analytics_collection.replace_one({'_id': SUMMARY_ID}, summary, upsert=True)
+    return summary
+
+
+def get_summary(analytics_collection, incidents_collection, resources_collection):
+    """Read the precomputed rollup, building it on first use"""
+    summary = analytics_collection.find_one({'_id': SUMMARY_ID})
+    if summary is None:
+        summary = rebuild_summary(analytics_collection, incidents_collection, resources_collection)
+    return summary
+
+
+def format_analytics(summary, now=None):
+    """Shape a rollup document into the /api/analytics response"""
+    now = now or datetime.utcnow()
+    incidents = summary.get('incidents', {})
+    resources = summary.get('resources', {})
+    total = incidents.get('total', 0)
+    resolved = incidents.get('byStatus', {}).get('resolved', 0)
+
+    responded = incidents.get('respondedCount', 0)
+    if responded:
+        average_response = f"{round(incidents.get('responseMinutes', 0) / responded)} minutes"
+    else:
+        average_response = 'N/A'
+
+    quantity = resources.get('quantity', 0)
+    utilization = round((quantity - resources.get('available', 0)) * 100 / quantity) if quantity else 0
+
+    by_month = incidents.get('byMonth', {})
+    monthly = []
+    year, month = now.year, now.month
+    for _ in range(MONTHS_SHOWN):
+        monthly.append({
+            'month': calendar.month_abbr[month],
+            'incidents': by_month.get(f'{year:04d}-{month:02d}', 0)
+        })
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    monthly.reverse()
+
+    by_type = sorted(
+        ({'type': name, 'count': count} for name, count in incidents.get('byType', {}).items() if count),
+        key=lambda row: row['count'], reverse=True
+    )
+
+    return {
+        'totalIncidents': total,
+        'resolvedIncidents': resolved,
+        'activeIncidents': total - resolved,
+        'averageResponseTime': average_response,
+        'resourceUtilization': utilization,
+        'monthlyIncidents': monthly,
+        'incidentsByType': by_type,
+    }
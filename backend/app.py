@@ -1,20 +1,45 @@
-import requests
 import os
+import click
+import queue
 import re
-from flask import Flask, request, jsonify
+import time
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
 from datetime import datetime, timedelta
-import copy
+from concurrent.futures import ThreadPoolExecutor
+from pagination import build_list_query, encode_cursor, parse_filters, parse_limit, parse_time_range
+from indexes import ensure_indexes, index_report
+from mongo import LazyDatabase, LazyMongo, client_options, options_from_env
+from dedup import IncidentDeduplicator, IncidentIndexSync
+from dispatch import plan_dispatch, solver_name
+from evacuation import EvacuationNetwork
+from events import EventBroker
+from fast_json import FastJSONProvider, public_document
+from geo import MAX_NEAR_RESULTS, near_pipeline, parse_bbox, parse_bounds, parse_point, parse_radius, with_geo_point
+from heatmap import (CELL_ZOOM_OFFSET, MAX_HEATMAP_TILES, MAX_ZOOM, HeatmapTiles, cells_by_tile, heatmap_pipeline,
+                     parse_zoom, tile_range, tiles_in_range)
+from response_cache import ResponseCache, create_backend
+from timestamps import coerce_timestamps, migrate_timestamps, utc_now
+from versions import CollectionVersions
+from search import MAX_SEARCH_RESULTS, decode_search_cursor, merge_results, parse_query, search_pipeline
+from sync import WATERMARK_FIELD, collect_changes, decode_token, tombstones_for, touch
+from weather_cache import WeatherCache
+from weather_client import CircuitBreaker, CircuitOpenError, OpenWeatherClient, server_timing_header
+from allocations import AllocationConflict, release, reserve
+from analytics import (apply_batch_delta, apply_delta, format_analytics, get_summary, incident_contribution,
+                       rebuild_summary, resource_contribution)
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+# Routes and CLI commands; create_app() registers them on a Flask application
+api = Blueprint('api', __name__, cli_group=None)
 
-# MongoDB Configuration
+# MongoDB Configuration: the client is created on first use in each process (see create_app)
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
-client = MongoClient(MONGO_URI)
-db = client['disaster_management']
+MONGO_DB = os.getenv('MONGO_DB', 'disaster_management')
+mongo = LazyMongo(MONGO_URI, MONGO_DB, **client_options(options_from_env()))
+db = LazyDatabase(mongo)
 
 # Collections
 alerts_collection = db['alerts']
@@ -25,24 +50,232 @@ evacuation_plans_collection = db['evacuation_plans']
 messages_collection = db['messages']
 users_collection = db['users']
 weather_collection = db['weather']
+analytics_collection = db['analytics']
+tombstones_collection = db['tombstones']
+resource_allocations_collection = db['resource_allocations']
+
+# Version counters behind list endpoint ETags
+collection_versions = CollectionVersions(db['collection_versions'])
+
+# Serialized response cache for the hot list endpoints
+response_cache = ResponseCache(
+    create_backend(
+        os.getenv('RESPONSE_CACHE_BACKEND', 'memory'),
+        max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+        url=os.getenv('RESPONSE_CACHE_URL'),
+        ttl=int(os.getenv('RESPONSE_CACHE_TTL', 300))
+    ),
+    collections=('alerts', 'resources', 'teams', 'evacuation_plans')
+)
+
+# Number of documents pymongo fetches per round trip when streaming list responses
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+NDJSON_MIMETYPE = 'application/x-ndjson'
 
 # Helper function to convert ObjectId to string
 def serialize_doc(doc):
-    if doc and '_id' in doc:
-        doc['id'] = str(doc['_id'])
-        del doc['_id']
-    return doc
+    # Returns a copy with a string 'id'; the internal sync watermark is dropped
+    return public_document(doc) if doc else doc
 
-# ============= ALERTS ENDPOINTS =============
-@app.route('/api/alerts', methods=['GET'])
-def get_alerts():
+# Collections pushed to /api/events subscribers
+EVENT_COLLECTIONS = ('alerts', 'incidents', 'messages')
+
+def publish_change(collection_name, operation, doc):
+    """Encode a change once and fan it out to matching SSE subscribers"""
+    payload = serialize_doc(dict(doc))
+    event_broker.publish({
+        'collection': collection_name,
+        'severity': payload.get('severity'),
+        'data': current_app.json.dumps({'collection': collection_name, 'operation': operation, 'document': payload})
+    })
+
+# One shared change stream watcher (or in-process publishing on standalone servers)
+event_broker = EventBroker(
+    db,
+    EVENT_COLLECTIONS,
+    on_change=publish_change,
+    mode=os.getenv('EVENTS_MODE', 'auto'),
+    max_queue=int(os.getenv('EVENT_QUEUE_SIZE', 100))
+)
+
+def notify_local(collection, operation, doc):
+    """Publish a write directly when change streams are not available"""
+    if event_broker.publishes_locally and collection.name in EVENT_COLLECTIONS:
+        publish_change(collection.name, operation, doc)
+
+def bump_version(collection):
+    """Invalidate ETags and cached responses of a collection after a successful write"""
+    collection_versions.bump(collection.name)
+    response_cache.invalidate(collection.name)
+
+def record_deletions(collection, ids):
+    """Write tombstones so deletes propagate through /api/sync"""
+    if ids:
+        tombstones_collection.insert_many(tombstones_for(collection.name, ids))
+
+def wants_stream():
+    """Streaming is requested with ?stream=1 or an Accept: application/x-ndjson header"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'ndjson'):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+def stream_documents(cursor):
+    """
+    Stream a pymongo cursor without materializing it. Documents are written as
+    NDJSON when the client asked for it (Accept header or ?stream=ndjson),
+    otherwise as a chunked JSON array.
+    """
+    ndjson = (request.args.get('stream', '').lower() == 'ndjson'
+              or request.accept_mimetypes.best == NDJSON_MIMETYPE)
+    cursor = cursor.batch_size(STREAM_BATCH_SIZE)
+    # Pull the first batch now so database errors still produce a normal 500
+    first = next(cursor, None)
+
+    def generate():
+        try:
+            if first is None:
+                if not ndjson:
+                    yield b'[]'
+                return
+            encode = current_app.json.dumps_document
+            if ndjson:
+                yield encode(first) + b'\n'
+                for doc in cursor:
+                    yield encode(doc) + b'\n'
+            else:
+                yield b'[' + encode(first)
+                for doc in cursor:
+                    yield b',' + encode(doc)
+                yield b']'
+        finally:
+            cursor.close()
+
+    mimetype = NDJSON_MIMETYPE if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+# list_documents() arguments per list endpoint (/api/<name>), shared with the async server
+LIST_ENDPOINTS = {
+    'alerts': {'collection': alerts_collection, 'range_field': 'createdAt'},
+    'resources': {'collection': resources_collection, 'range_field': 'lastUpdated', 'geo': True},
+    'incidents': {'collection': incidents_collection, 'range_field': 'createdAt', 'geo': True},
+    'teams': {'collection': teams_collection, 'geo': True},
+    'evacuation-plans': {'collection': evacuation_plans_collection, 'range_field': 'lastUpdated'},
+    'messages': {'collection': messages_collection, 'sort_field': 'timestamp', 'direction': DESCENDING, 'range_field': 'timestamp'},
+    'users': {'collection': users_collection},
+}
+
+def list_documents(collection, sort_field='_id', direction=ASCENDING, range_field=None, geo=False):
+    """
+    Shared GET handler for collection list endpoints.
+    Supports ?limit= and ?after= keyset pagination, ?fields= projection,
+    ?status= / ?severity= / ?type= filters, ?from= / ?to= on `range_field` and, for
+    collections with GeoJSON points (`geo`), ?bbox=minLng,minLat,maxLng,maxLat. When more results are available the
+    cursor for the next page is returned in the X-Next-Cursor header.
+    With ?stream=1 or Accept: application/x-ndjson the results are streamed
+    straight from the cursor (no X-Next-Cursor header in that mode).
+    Responses carry an ETag derived from the collection's version counter; a matching
+    If-None-Match is answered with 304 without querying the collection, and cached
+    collections are served from the serialized response cache when possible.
+    """
+    try:
+        query, projection, sort, limit = build_list_query(request.args, sort_field, direction, range_field=range_field, geo=geo)
+        streaming = wants_stream()
+        variant = request.query_string.decode('utf-8') + ('|stream' if streaming else '')
+        if streaming and request.accept_mimetypes.best == NDJSON_MIMETYPE:
+            variant += '|ndjson'
+        etag = collection_versions.etag(collection.name, variant)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+
+        use_cache = not streaming and response_cache.enabled_for(collection.name)
+        if use_cache:
+            cached = response_cache.get(collection.name, etag)
+            if cached:
+                body, next_cursor = cached
+                response = Response(body, mimetype='application/json')
+                response.set_etag(etag, weak=True)
+                if next_cursor:
+                    response.headers['X-Next-Cursor'] = next_cursor
+                return response, 200
+
+        cursor = collection.find(query, projection).sort(sort)
+        if streaming:
+            if limit:
+                cursor = cursor.limit(limit)
+            response = stream_documents(cursor)
+            response.set_etag(etag, weak=True)
+            return response, 200
+
+        if limit:
+            # Fetch one extra document to know whether there is a next page
+            cursor = cursor.limit(limit + 1)
+        docs = list(cursor)
+
+        next_cursor = None
+        if limit and len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_cursor(docs[-1], sort_field)
+
+        body = current_app.json.dumps_documents(docs)
+        if use_cache:
+            response_cache.set(collection.name, etag, body, next_cursor)
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag, weak=True)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def prefers_minimal():
+    """True when the client sent Prefer: return=minimal"""
+    prefer = request.headers.get('Prefer', '')
+    return any(token.strip() == 'return=minimal' for token in prefer.split(','))
+
+def create_document(collection, timestamp_fields=(), prepare=None, on_created=None):
+    """
+    Shared POST handler for collection create endpoints.
+    Stamps `timestamp_fields`, runs `prepare(data)`, inserts the document and builds the
+    response from the inserted data (insert_one sets its _id), so no read-back is needed.
+    `on_created(doc)` runs after a successful insert (and version bump). With Prefer: return=minimal only
+    the new id is returned.
+    """
     try:
-        alerts = list(alerts_collection.find())
-        return jsonify([serialize_doc(alert) for alert in alerts]), 200
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        coerce_timestamps(collection.name, data)
+        now = utc_now()
+        for field in timestamp_fields:
+            data[field] = now
+        touch(data)
+        if prepare:
+            prepare(data)
+
+        result = collection.insert_one(data)
+        bump_version(collection)
+        if on_created:
+            on_created(data)
+        notify_local(collection, 'insert', data)
+
+        if prefers_minimal():
+            response = jsonify({'id': str(result.inserted_id)})
+            response.headers['Preference-Applied'] = 'return=minimal'
+            return response, 201
+        return jsonify(serialize_doc(data)), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/alerts/<alert_id>', methods=['GET'])
+# ============= ALERTS ENDPOINTS =============
+@api.route('/api/alerts', methods=['GET'])
+def get_alerts():
+    return list_documents(**LIST_ENDPOINTS['alerts'])
+
+@api.route('/api/alerts/<alert_id>', methods=['GET'])
 def get_alert(alert_id):
     try:
         alert = alerts_collection.find_one({'_id': ObjectId(alert_id)})
@@ -52,246 +285,1091 @@ def get_alert(alert_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/alerts', methods=['POST'])
+@api.route('/api/alerts', methods=['POST'])
 def create_alert():
-    try:
-        data = copy.deepcopy(request.json)
-        data['createdAt'] = datetime.utcnow().isoformat() + 'Z'
-        data['updatedAt'] = datetime.utcnow().isoformat() + 'Z'
-        result = alerts_collection.insert_one(data)
-        # Fetch the created document to ensure proper serialization
-        created_alert = alerts_collection.find_one({'_id': result.inserted_id})
-        return jsonify(serialize_doc(created_alert)), 201
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return create_document(alerts_collection, timestamp_fields=('createdAt', 'updatedAt'))
 
-@app.route('/api/alerts/<alert_id>', methods=['PUT'])
+@api.route('/api/alerts/<alert_id>', methods=['PUT'])
 def update_alert(alert_id):
     try:
         data = request.json
-        data['updatedAt'] = datetime.utcnow().isoformat() + 'Z'
-        result = alerts_collection.update_one(
+        touch(data)
+        coerce_timestamps(alerts_collection.name, data)
+        data['updatedAt'] = utc_now()
+        updated = alerts_collection.find_one_and_update(
             {'_id': ObjectId(alert_id)},
-            {'$set': data}
+            {'$set': data},
+            return_document=ReturnDocument.AFTER
         )
-        if result.matched_count:
+        if updated:
+            bump_version(alerts_collection)
+            notify_local(alerts_collection, 'update', updated)
             return jsonify({'message': 'Alert updated successfully'}), 200
         return jsonify({'error': 'Alert not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/alerts/<alert_id>', methods=['DELETE'])
+@api.route('/api/alerts/<alert_id>', methods=['DELETE'])
 def delete_alert(alert_id):
     try:
         result = alerts_collection.delete_one({'_id': ObjectId(alert_id)})
         if result.deleted_count:
+            record_deletions(alerts_collection, [ObjectId(alert_id)])
+            bump_version(alerts_collection)
             return jsonify({'message': 'Alert deleted successfully'}), 200
         return jsonify({'error': 'Alert not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # ============= RESOURCES ENDPOINTS =============
-@app.route('/api/resources', methods=['GET'])
+@api.route('/api/resources', methods=['GET'])
 def get_resources():
-    try:
-        resources = list(resources_collection.find())
-        return jsonify([serialize_doc(resource) for resource in resources]), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return list_documents(**LIST_ENDPOINTS['resources'])
 
-@app.route('/api/resources', methods=['POST'])
+@api.route('/api/resources', methods=['POST'])
 def create_resource():
-    try:
-        data = copy.deepcopy(request.json)
-        result = resources_collection.insert_one(data)
-        # Fetch the created document to ensure proper serialization
-        created_resource = resources_collection.find_one({'_id': result.inserted_id})
-        return jsonify(serialize_doc(created_resource)), 201
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return create_document(
+        resources_collection,
+        timestamp_fields=('lastUpdated',),
+        prepare=with_geo_point,
+        on_created=lambda doc: apply_delta(analytics_collection, resource_contribution, after=doc)
+    )
 
-@app.route('/api/resources/<resource_id>', methods=['PUT'])
+@api.route('/api/resources/<resource_id>', methods=['PUT'])
 def update_resource(resource_id):
     try:
         data = request.json
-        result = resources_collection.update_one(
+        touch(data)
+        coerce_timestamps(resources_collection.name, data)
+        data['lastUpdated'] = utc_now()
+        with_geo_point(data)
+        previous = resources_collection.find_one_and_update(
             {'_id': ObjectId(resource_id)},
-            {'$set': data}
+            {'$set': data},
+            return_document=ReturnDocument.BEFORE
         )
-        if result.matched_count:
+        if previous:
+            bump_version(resources_collection)
+            apply_delta(analytics_collection, resource_contribution, previous, {**previous, **data})
             return jsonify({'message': 'Resource updated successfully'}), 200
         return jsonify({'error': 'Resource not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/resources/<resource_id>', methods=['DELETE'])
+@api.route('/api/resources/<resource_id>', methods=['DELETE'])
 def delete_resource(resource_id):
     try:
-        result = resources_collection.delete_one({'_id': ObjectId(resource_id)})
-        if result.deleted_count:
+        deleted = resources_collection.find_one_and_delete({'_id': ObjectId(resource_id)})
+        if deleted:
+            record_deletions(resources_collection, [deleted['_id']])
+            bump_version(resources_collection)
+            apply_delta(analytics_collection, resource_contribution, before=deleted)
             return jsonify({'message': 'Resource deleted successfully'}), 200
         return jsonify({'error': 'Resource not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# ============= INCIDENTS ENDPOINTS =============
-@app.route('/api/incidents', methods=['GET'])
-def get_incidents():
+def allocate_atomically(operation, resource_id, body):
+    """
+    Apply a reserve/release and its ledger entry in one transaction. Standalone servers
+    do not support transactions; there allocations.py undoes the $inc if the ledger
+    insert fails.
+    """
+    result, _ = mongo.run_in_transaction(
+        lambda session: operation(resources_collection, resource_allocations_collection, resource_id, body,
+                                  session=session)
+    )
+    return result
+
+def allocate_resource(resource_id, operation):
+    """
+    Shared handler for reserve/release: applies an atomic $inc on 'available' and
+    returns the updated resource with its allocation ledger entry.
+    Body: {"quantity": n, "incidentId": ..., "teamId": ..., "note": ..., "by": ...}
+    """
     try:
-        incidents = list(incidents_collection.find())
-        return jsonify([serialize_doc(incident) for incident in incidents]), 200
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        before, after, entry = allocate_atomically(operation, resource_id, body)
+        bump_version(resources_collection)
+        apply_delta(analytics_collection, resource_contribution, before, after)
+        return jsonify({'resource': serialize_doc(after), 'allocation': serialize_doc(entry)}), 200
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except AllocationConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/incidents', methods=['POST'])
-def create_incident():
+@api.route('/api/resources/<resource_id>/reserve', methods=['POST'])
+def reserve_resource(resource_id):
+    return allocate_resource(resource_id, reserve)
+
+@api.route('/api/resources/<resource_id>/release', methods=['POST'])
+def release_resource(resource_id):
+    return allocate_resource(resource_id, release)
+
+@api.route('/api/resources/<resource_id>/allocations', methods=['GET'])
+def get_resource_allocations(resource_id):
+    """Allocation ledger of a resource, newest first (?limit= caps the number of entries)"""
     try:
-        data = copy.deepcopy(request.json)
-        data['createdAt'] = datetime.utcnow().isoformat() + 'Z'
-        data['updatedAt'] = datetime.utcnow().isoformat() + 'Z'
-        result = incidents_collection.insert_one(data)
-        # Fetch the created document to ensure proper serialization
-        created_incident = incidents_collection.find_one({'_id': result.inserted_id})
-        return jsonify(serialize_doc(created_incident)), 201
+        cursor = resource_allocations_collection.find({'resourceId': ObjectId(resource_id)}).sort(
+            [('at', DESCENDING), ('_id', DESCENDING)]
+        )
+        limit = parse_limit(request.args.get('limit'))
+        if limit:
+            cursor = cursor.limit(limit)
+        return Response(current_app.json.dumps_documents(cursor), mimetype='application/json'), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/incidents/<incident_id>', methods=['PUT'])
+# ============= INCIDENTS ENDPOINTS =============
+@api.route('/api/incidents', methods=['GET'])
+def get_incidents():
+    return list_documents(**LIST_ENDPOINTS['incidents'])
+
+# Duplicate report handling for new incidents: 'link' stores the report with duplicateOf set,
+# 'merge' folds it into the existing incident, 'off' disables detection
+INCIDENT_DEDUP_MODE = os.getenv('INCIDENT_DEDUP_MODE', 'link')
+# Most recent merged reports kept on an incident
+INCIDENT_MAX_MERGED_REPORTS = int(os.getenv('INCIDENT_MAX_MERGED_REPORTS', 50))
+incident_dedup = IncidentDeduplicator(
+    radius_m=float(os.getenv('INCIDENT_DEDUP_RADIUS_METERS', 500)),
+    window=int(os.getenv('INCIDENT_DEDUP_WINDOW_MINUTES', 360)) * 60,
+    threshold=float(os.getenv('INCIDENT_DEDUP_THRESHOLD', 0.5))
+)
+incident_index_sync = IncidentIndexSync(
+    incidents_collection,
+    incident_dedup,
+    refresh_interval=float(os.getenv('INCIDENT_DEDUP_REFRESH_SECONDS', 5))
+)
+# Heatmap cells per map tile, evicted by the incident write endpoints
+heatmap_tiles = HeatmapTiles(
+    collection_versions,
+    incidents_collection.name,
+    max_tiles=int(os.getenv('HEATMAP_CACHE_TILES', 4096)),
+    refresh_interval=float(os.getenv('HEATMAP_REFRESH_SECONDS', 5))
+)
+# Pipeline update counting one more report (documents without reportCount stand for one)
+COUNT_REPORT = {'$set': {'reportCount': {'$add': [{'$ifNull': ['$reportCount', 1]}, 1]}}}
+
+def dedup_requested():
+    return INCIDENT_DEDUP_MODE in ('link', 'merge') and request.args.get('dedup', '').lower() not in ('0', 'false', 'off')
+
+def find_duplicate_incident(report):
+    """(incident id, distance m, similarity) of an open incident the report duplicates, or None"""
+    geo = report.get('geo')
+    if not geo:
+        return None
+    incident_index_sync.refresh()
+    lng, lat = geo['coordinates']
+    return incident_dedup.find(lat, lng, report.get('createdAt') or utc_now(), report.get('type'), report.get('title'))
+
+def prepare_incident(data):
+    with_geo_point(data)
+    if INCIDENT_DEDUP_MODE == 'link' and dedup_requested():
+        match = find_duplicate_incident(data)
+        if match:
+            data['duplicateOf'] = match[0]
+
+def incident_created(doc):
+    apply_delta(analytics_collection, incident_contribution, after=doc)
+    if doc.get('duplicateOf'):
+        primary = incidents_collection.find_one_and_update(
+            {'_id': ObjectId(doc['duplicateOf'])}, [COUNT_REPORT, {'$set': touch({})}], projection={'geo': 1}
+        )
+        bump_version(incidents_collection)
+        heatmap_tiles.points_changed([primary], bumps=2)
+    else:
+        incident_index_sync.index(doc)
+        heatmap_tiles.points_changed([doc])
+
+def merge_duplicate_report():
+    """
+    Fold a new report into the open incident it duplicates instead of inserting it.
+    Returns the response for a merged report, or None to create the incident normally.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None
+    now = utc_now()
+    try:
+        report = with_geo_point(coerce_timestamps(incidents_collection.name, dict(data)))
+    except ValueError:
+        return None
+    report['createdAt'] = now
+    match = find_duplicate_incident(report)
+    if not match:
+        return None
+    entry = {key: report.get(key) for key in ('title', 'description', 'severity', 'type', 'coordinates', 'reportedBy')
+             if report.get(key) is not None}
+    entry['reportedAt'] = now
+    updated = incidents_collection.find_one_and_update(
+        {'_id': ObjectId(match[0]), 'status': {'$ne': 'resolved'}},
+        [COUNT_REPORT, {'$set': touch({'updatedAt': now})},
+         {'$set': {'reports': {'$slice': [
+             {'$concatArrays': [{'$ifNull': ['$reports', []]}, [{'$literal': entry}]]},
+             -INCIDENT_MAX_MERGED_REPORTS
+         ]}}}],
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated:
+        # Resolved or deleted since it was indexed
+        incident_dedup.forget(match[0])
+        return None
+    bump_version(incidents_collection)
+    heatmap_tiles.points_changed([updated])
+    notify_local(incidents_collection, 'update', updated)
+    response = jsonify(serialize_doc(updated))
+    response.headers['X-Duplicate-Of'] = match[0]
+    return response, 200
+
+@api.route('/api/incidents', methods=['POST'])
+def create_incident():
+    if INCIDENT_DEDUP_MODE == 'merge' and dedup_requested():
+        try:
+            merged = merge_duplicate_report()
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        if merged:
+            return merged
+    return create_document(
+        incidents_collection,
+        timestamp_fields=('createdAt', 'updatedAt'),
+        prepare=prepare_incident,
+        on_created=incident_created
+    )
+
+@api.route('/api/incidents/<incident_id>', methods=['PUT'])
 def update_incident(incident_id):
     try:
         data = request.json
-        data['updatedAt'] = datetime.utcnow().isoformat() + 'Z'
-        result = incidents_collection.update_one(
+        touch(data)
+        coerce_timestamps(incidents_collection.name, data)
+        data['updatedAt'] = utc_now()
+        with_geo_point(data)
+        update = {'$set': data}
+        # Record the first response so analytics can measure response time, in the same
+        # write: $min only sets respondedAt when the incident has none yet
+        if data.get('status', 'reported') != 'reported' and 'respondedAt' not in data:
+            update['$min'] = {'respondedAt': data['updatedAt']}
+        previous = incidents_collection.find_one_and_update(
             {'_id': ObjectId(incident_id)},
-            {'$set': data}
+            update,
+            return_document=ReturnDocument.BEFORE
         )
-        if result.matched_count:
+        if previous:
+            bump_version(incidents_collection)
+            current = {**previous, **data}
+            if '$min' in update and not previous.get('respondedAt'):
+                current['respondedAt'] = data['updatedAt']
+            apply_delta(analytics_collection, incident_contribution, previous, current)
+            heatmap_tiles.points_changed([previous, current])
+            notify_local(incidents_collection, 'update', current)
+            if current.get('status') == 'resolved':
+                incident_dedup.forget(str(previous['_id']))
             return jsonify({'message': 'Incident updated successfully'}), 200
         return jsonify({'error': 'Incident not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/incidents/<incident_id>', methods=['DELETE'])
+@api.route('/api/incidents/<incident_id>', methods=['DELETE'])
 def delete_incident(incident_id):
     try:
-        result = incidents_collection.delete_one({'_id': ObjectId(incident_id)})
-        if result.deleted_count:
+        deleted = incidents_collection.find_one_and_delete({'_id': ObjectId(incident_id)})
+        if deleted:
+            record_deletions(incidents_collection, [deleted['_id']])
+            bump_version(incidents_collection)
+            apply_delta(analytics_collection, incident_contribution, before=deleted)
+            heatmap_tiles.points_changed([deleted])
+            incident_dedup.forget(str(deleted['_id']))
             return jsonify({'message': 'Incident deleted successfully'}), 200
         return jsonify({'error': 'Incident not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # ============= TEAMS ENDPOINTS =============
-@app.route('/api/teams', methods=['GET'])
+@api.route('/api/teams', methods=['GET'])
 def get_teams():
-    try:
-        teams = list(teams_collection.find())
-        return jsonify([serialize_doc(team) for team in teams]), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return list_documents(**LIST_ENDPOINTS['teams'])
 
-@app.route('/api/teams', methods=['POST'])
+@api.route('/api/teams', methods=['POST'])
 def create_team():
-    try:
-        data = copy.deepcopy(request.json)
-        result = teams_collection.insert_one(data)
-        # Fetch the created document to ensure proper serialization
-        created_team = teams_collection.find_one({'_id': result.inserted_id})
-        return jsonify(serialize_doc(created_team)), 201
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return create_document(teams_collection, prepare=with_geo_point)
 
-@app.route('/api/teams/<team_id>', methods=['PUT'])
+@api.route('/api/teams/<team_id>', methods=['PUT'])
 def update_team(team_id):
     try:
         data = request.json
+        touch(data)
+        with_geo_point(data)
         result = teams_collection.update_one(
             {'_id': ObjectId(team_id)},
             {'$set': data}
         )
         if result.matched_count:
+            bump_version(teams_collection)
             return jsonify({'message': 'Team updated successfully'}), 200
         return jsonify({'error': 'Team not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/teams/<team_id>', methods=['DELETE'])
+@api.route('/api/teams/<team_id>', methods=['DELETE'])
 def delete_team(team_id):
     try:
         result = teams_collection.delete_one({'_id': ObjectId(team_id)})
         if result.deleted_count:
+            record_deletions(teams_collection, [ObjectId(team_id)])
+            bump_version(teams_collection)
             return jsonify({'message': 'Team deleted successfully'}), 200
         return jsonify({'error': 'Team not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# ============= EVACUATION PLANS ENDPOINTS =============
-@app.route('/api/evacuation-plans', methods=['GET'])
-def get_evacuation_plans():
+# ============= GEOSPATIAL ENDPOINTS =============
+def near_origin():
+    """
+    Resolve the origin of a nearest-neighbour query from ?incident=<id> or ?lat=&lng=.
+    Returns (point, incident id or None); raises LookupError for an unknown incident.
+    """
+    incident_id = request.args.get('incident')
+    if incident_id:
+        try:
+            object_id = ObjectId(incident_id)
+        except Exception:
+            raise ValueError('Invalid incident id')
+        incident = incidents_collection.find_one({'_id': object_id}, {'geo': 1})
+        if not incident:
+            raise LookupError('Incident not found')
+        if not incident.get('geo'):
+            raise ValueError('Incident has no coordinates')
+        return incident['geo'], object_id
+    origin = parse_point(request.args)
+    if origin is None:
+        raise ValueError('Either incident or lat and lng are required')
+    return origin, None
+
+def nearest_documents(collection, default_status=None, exclude_origin=False):
+    """
+    Shared $geoNear handler: documents closest to the origin, nearest first, each with a
+    'distance' in metres. Accepts ?status= / ?severity= / ?type= filters, ?radius= (km),
+    ?bbox= and ?limit=. `default_status` applies when no ?status= is given.
+    """
     try:
-        plans = list(evacuation_plans_collection.find())
-        return jsonify([serialize_doc(plan) for plan in plans]), 200
+        origin, origin_id = near_origin()
+        query = parse_filters(request.args)
+        if default_status and not request.args.get('status'):
+            query['status'] = default_status
+        query.update(parse_bbox(request.args.get('bbox')))
+        if exclude_origin and origin_id:
+            query['_id'] = {'$ne': origin_id}
+        pipeline = near_pipeline(
+            origin,
+            query,
+            max_distance=parse_radius(request.args.get('radius')),
+            limit=parse_limit(request.args.get('limit'), default=20, maximum=MAX_NEAR_RESULTS)
+        )
+        docs = list(collection.aggregate(pipeline))
+        for doc in docs:
+            doc['distance'] = round(doc['distance'])
+        return Response(current_app.json.dumps_documents(docs), mimetype='application/json'), 200
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/evacuation-plans', methods=['POST'])
-def create_evacuation_plan():
+@api.route('/api/incidents/near', methods=['GET'])
+def get_incidents_near():
+    return nearest_documents(incidents_collection, exclude_origin=True)
+
+@api.route('/api/incidents/heatmap', methods=['GET'])
+def get_incident_heatmap():
+    """
+    Incident density for the map tiles covering ?bbox= at ?zoom=.
+    Incidents are binned into cells (tiles CELL_ZOOM_OFFSET levels deeper) by an
+    aggregation pipeline; cells are cached per tile, so panning and zooming back only
+    aggregate the tiles that are not cached yet. Linked duplicate reports are folded
+    into their original incident's reportCount instead of counted again.
+    Supports ?from= / ?to= on createdAt and ?status= / ?severity= / ?type= filters.
+    """
     try:
-        data = copy.deepcopy(request.json)
-        data['lastUpdated'] = datetime.utcnow().isoformat() + 'Z'
-        result = evacuation_plans_collection.insert_one(data)
-        # Fetch the created document to ensure proper serialization
-        created_plan = evacuation_plans_collection.find_one({'_id': result.inserted_id})
-        return jsonify(serialize_doc(created_plan)), 201
+        bounds = parse_bounds(request.args.get('bbox'))
+        if bounds is None:
+            return jsonify({'error': 'bbox is required'}), 400
+        zoom = parse_zoom(request.args.get('zoom'))
+        match = {**parse_filters(request.args), **parse_time_range(request.args, 'createdAt'),
+                 'duplicateOf': {'$exists': False}}
+        tiles = tile_range(bounds, zoom)
+        wanted = tiles_in_range(tiles)
+        if len(wanted) > MAX_HEATMAP_TILES:
+            return jsonify({'error': f'bbox covers {len(wanted)} tiles at zoom {zoom}, at most {MAX_HEATMAP_TILES} are allowed'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        cell_zoom = min(zoom + CELL_ZOOM_OFFSET, MAX_ZOOM + CELL_ZOOM_OFFSET)
+        variant = '&'.join(f'{name}={request.args[name]}' for name in ('from', 'to', 'status', 'severity', 'type')
+                           if request.args.get(name))
+        found, generation = heatmap_tiles.lookup(zoom, wanted, variant)
+        missing = [tile for tile in wanted if tile not in found]
+        if missing:
+            # One aggregation over the smallest tile range holding every missing tile
+            xs, ys = [x for x, _ in missing], [y for _, y in missing]
+            missing_range = (min(xs), min(ys), max(xs), max(ys))
+            groups = incidents_collection.aggregate(heatmap_pipeline(missing_range, zoom, cell_zoom, match))
+            computed = cells_by_tile(groups, zoom, cell_zoom)
+            fresh = {tile: computed.get(tile, []) for tile in tiles_in_range(missing_range)}
+            heatmap_tiles.store(zoom, fresh, variant, generation)
+            found.update(fresh)
+        cells = [cell for tile in wanted for cell in found[tile]]
+        return jsonify({
+            'zoom': zoom,
+            'cellZoom': cell_zoom,
+            'tiles': len(wanted),
+            'cachedTiles': len(wanted) - len(missing),
+            'cells': cells
+        }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/evacuation-plans/<plan_id>', methods=['PUT'])
+@api.route('/api/teams/nearest', methods=['GET'])
+def get_nearest_teams():
+    return nearest_documents(teams_collection, default_status='available')
+
+@api.route('/api/resources/nearest', methods=['GET'])
+def get_nearest_resources():
+    return nearest_documents(resources_collection, default_status='available')
+
+# ============= EVACUATION PLANS ENDPOINTS =============
+# In-memory route graph compiled from the plans' routes
+evacuation_network = EvacuationNetwork(
+    evacuation_plans_collection,
+    collection_versions,
+    refresh_interval=float(os.getenv('EVACUATION_GRAPH_REFRESH_SECONDS', 5)),
+    congestion_penalty=float(os.getenv('EVACUATION_CONGESTION_PENALTY', 3))
+)
+
+@api.route('/api/evacuation-plans', methods=['GET'])
+def get_evacuation_plans():
+    return list_documents(**LIST_ENDPOINTS['evacuation-plans'])
+
+@api.route('/api/evacuation-plans', methods=['POST'])
+def create_evacuation_plan():
+    return create_document(
+        evacuation_plans_collection,
+        timestamp_fields=('lastUpdated',),
+        on_created=lambda doc: evacuation_network.plan_changed(doc)
+    )
+
+@api.route('/api/evacuation-plans/<plan_id>', methods=['PUT'])
 def update_evacuation_plan(plan_id):
     try:
         data = request.json
-        data['lastUpdated'] = datetime.utcnow().isoformat() + 'Z'
-        result = evacuation_plans_collection.update_one(
+        touch(data)
+        coerce_timestamps(evacuation_plans_collection.name, data)
+        data['lastUpdated'] = utc_now()
+        updated = evacuation_plans_collection.find_one_and_update(
             {'_id': ObjectId(plan_id)},
-            {'$set': data}
+            {'$set': data},
+            projection={'routes': 1, 'status': 1},
+            return_document=ReturnDocument.AFTER
         )
-        if result.matched_count:
+        if updated:
+            bump_version(evacuation_plans_collection)
+            evacuation_network.plan_changed(updated)
             return jsonify({'message': 'Evacuation plan updated successfully'}), 200
         return jsonify({'error': 'Evacuation plan not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/evacuation-plans/<plan_id>', methods=['DELETE'])
+@api.route('/api/evacuation-plans/<plan_id>', methods=['DELETE'])
 def delete_evacuation_plan(plan_id):
     try:
         result = evacuation_plans_collection.delete_one({'_id': ObjectId(plan_id)})
         if result.deleted_count:
+            record_deletions(evacuation_plans_collection, [ObjectId(plan_id)])
+            bump_version(evacuation_plans_collection)
+            evacuation_network.plan_removed(plan_id)
             return jsonify({'message': 'Evacuation plan deleted successfully'}), 200
         return jsonify({'error': 'Evacuation plan not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api.route('/api/evacuation/route', methods=['GET'])
+def get_evacuation_route():
+    """
+    Fastest (?by=time, default) or shortest (?by=distance) open route between two places
+    of the evacuation network. Blocked routes are avoided, congested ones penalized.
+    """
+    try:
+        source, target = request.args.get('from'), request.args.get('to')
+        by = request.args.get('by', 'time')
+        if not source or not target:
+            return jsonify({'error': 'from and to are required'}), 400
+        if by not in ('time', 'distance'):
+            return jsonify({'error': "by must be 'time' or 'distance'"}), 400
+        path = evacuation_network.current().shortest_path(source, target, by)
+        if path is None:
+            return jsonify({'error': f'No open route from {source} to {target}'}), 404
+        steps = [{
+            'planId': edge.plan_id,
+            'routeId': edge.route_id,
+            'name': edge.name,
+            'from': edge.source,
+            'to': edge.target,
+            'distanceKm': round(edge.distance_km, 2),
+            'estimatedMinutes': round(edge.minutes, 1),
+            'status': edge.status
+        } for edge in path]
+        return jsonify({
+            'from': source,
+            'to': target,
+            'steps': steps,
+            'distanceKm': round(sum(edge.distance_km for edge in path), 2),
+            'estimatedMinutes': round(sum(edge.minutes for edge in path), 1),
+            'congested': any(edge.status == 'congested' for edge in path)
+        }), 200
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ============= MESSAGES ENDPOINTS =============
-@app.route('/api/messages', methods=['GET'])
+@api.route('/api/messages', methods=['GET'])
 def get_messages():
+    return list_documents(**LIST_ENDPOINTS['messages'])
+
+@api.route('/api/messages', methods=['POST'])
+def create_message():
+    return create_document(messages_collection, timestamp_fields=('timestamp',))
+
+# ============= BULK ENDPOINTS =============
+# Maximum number of items accepted by a single bulk request
+BULK_MAX_BATCH = int(os.getenv('BULK_MAX_BATCH', 1000))
+
+def mark_incident_response(previous, data):
+    """Set respondedAt in an incident update the first time it leaves 'reported'"""
+    status = data.get('status', previous.get('status', 'reported'))
+    if status != 'reported' and not previous.get('respondedAt'):
+        data['respondedAt'] = data['updatedAt']
+
+def incidents_bulk_written(changes):
+    """Keep the heatmap tiles and the deduplicator in step with a bulk incident write"""
+    heatmap_tiles.invalidate()
+    for previous, current in changes:
+        # Re-index updated incidents: location, title or status may have changed
+        if previous is not None:
+            incident_dedup.forget(str(previous['_id']))
+        if current is not None:
+            incident_index_sync.index(current)
+
+# Per collection settings for the bulk endpoints
+BULK_COLLECTIONS = {
+    'alerts': {
+        'collection': alerts_collection,
+        'create_timestamps': ('createdAt', 'updatedAt'),
+        'update_timestamps': ('updatedAt',),
+    },
+    'resources': {
+        'collection': resources_collection,
+        'create_timestamps': ('lastUpdated',),
+        'update_timestamps': ('lastUpdated',),
+        'prepare': with_geo_point,
+        'contribution': resource_contribution,
+    },
+    'incidents': {
+        'collection': incidents_collection,
+        'create_timestamps': ('createdAt', 'updatedAt'),
+        'update_timestamps': ('updatedAt',),
+        'prepare': with_geo_point,
+        'prepare_update': mark_incident_response,
+        'contribution': incident_contribution,
+        'after_write': incidents_bulk_written,
+    },
+    'teams': {
+        'collection': teams_collection,
+        'prepare': with_geo_point,
+    },
+    'evacuation-plans': {
+        'collection': evacuation_plans_collection,
+        'create_timestamps': ('lastUpdated',),
+        'update_timestamps': ('lastUpdated',),
+        'after_write': lambda changes: evacuation_network.invalidate(),
+    },
+    'messages': {
+        'collection': messages_collection,
+        'create_timestamps': ('timestamp',),
+    },
+}
+
+def bulk_write_errors(error):
+    """Map a BulkWriteError to {operation index: message}"""
+    return {item['index']: item.get('errmsg', 'Write failed') for item in error.details.get('writeErrors', [])}
+
+def bulk_summary(results):
+    failed = sum(1 for item in results if item['status'] in ('error', 'not_found'))
+    return jsonify({'results': results, 'succeeded': len(results) - failed, 'failed': failed}), 200
+
+def bulk_insert(config, items):
+    collection = config['collection']
+    now = utc_now()
+    results = [None] * len(items)
+    docs, positions = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {'index': index, 'status': 'error', 'error': 'Item must be a JSON object'}
+            continue
+        coerce_timestamps(collection.name, item)
+        for field in config.get('create_timestamps', ()):
+            item[field] = now
+        touch(item)
+        if config.get('prepare'):
+            config['prepare'](item)
+        docs.append(item)
+        positions.append(index)
+
+    errors = {}
+    if docs:
+        try:
+            collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = bulk_write_errors(e)
+
+    created = []
+    for op_index, (doc, index) in enumerate(zip(docs, positions)):
+        if op_index in errors:
+            results[index] = {'index': index, 'status': 'error', 'error': errors[op_index]}
+        else:
+            created.append(doc)
+            notify_local(collection, 'insert', doc)
+            results[index] = {'index': index, 'status': 'created', 'id': str(doc['_id'])}
+
+    if created:
+        bump_version(collection)
+    changes = [(None, doc) for doc in created]
+    if config.get('contribution') and changes:
+        apply_batch_delta(analytics_collection, config['contribution'], changes)
+    return results, changes
+
+def parse_bulk_ids(items, results):
+    """Collect valid ObjectIds from bulk items, recording errors for invalid ones"""
+    ids = {}
+    for index, item in enumerate(items):
+        raw_id = item.get('id') if isinstance(item, dict) else item
+        try:
+            ids[index] = ObjectId(raw_id)
+        except Exception:
+            results[index] = {'index': index, 'status': 'error', 'error': 'Invalid id'}
+    return ids
+
+def bulk_update(config, items):
+    collection = config['collection']
+    now = utc_now()
+    results = [None] * len(items)
+    ids = parse_bulk_ids(items, results)
+    # Bare ids are accepted for DELETE, but an update needs the fields to set
+    for index in [index for index in ids if not isinstance(items[index], dict)]:
+        results[index] = {'index': index, 'status': 'error', 'error': 'Item must be a JSON object with an id'}
+        del ids[index]
+    previous = {doc['_id']: doc for doc in collection.find({'_id': {'$in': list(ids.values())}})}
+
+    operations, positions, changes = [], [], []
+    for index, object_id in ids.items():
+        if object_id not in previous:
+            results[index] = {'index': index, 'status': 'not_found', 'id': str(object_id)}
+            continue
+        data = {key: value for key, value in items[index].items() if key not in ('id', '_id')}
+        coerce_timestamps(collection.name, data)
+        for field in config.get('update_timestamps', ()):
+            data[field] = now
+        touch(data)
+        if config.get('prepare'):
+            config['prepare'](data)
+        if config.get('prepare_update'):
+            config['prepare_update'](previous[object_id], data)
+        operations.append(UpdateOne({'_id': object_id}, {'$set': data}))
+        positions.append(index)
+        changes.append((previous[object_id], {**previous[object_id], **data}))
+
+    errors = {}
+    if operations:
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            errors = bulk_write_errors(e)
+
+    applied = []
+    for op_index, index in enumerate(positions):
+        if op_index in errors:
+            results[index] = {'index': index, 'status': 'error', 'error': errors[op_index]}
+        else:
+            applied.append(changes[op_index])
+            notify_local(collection, 'update', changes[op_index][1])
+            results[index] = {'index': index, 'status': 'updated', 'id': str(ids[index])}
+
+    if applied:
+        bump_version(collection)
+    if config.get('contribution') and applied:
+        apply_batch_delta(analytics_collection, config['contribution'], applied)
+    return results, applied
+
+def bulk_delete(config, items):
+    collection = config['collection']
+    results = [None] * len(items)
+    ids = parse_bulk_ids(items, results)
+    object_ids = list(ids.values())
+    deleted = {}
+    if config.get('contribution'):
+        # Deleted documents are needed to take them out of the analytics rollup
+        deleted = {doc['_id']: doc for doc in collection.find({'_id': {'$in': object_ids}})}
+        collection.delete_many({'_id': {'$in': list(deleted)}})
+        record_deletions(collection, list(deleted))
+        apply_batch_delta(analytics_collection, config['contribution'], [(doc, None) for doc in deleted.values()])
+    else:
+        existing = {doc['_id'] for doc in collection.find({'_id': {'$in': object_ids}}, {'_id': 1})}
+        collection.delete_many({'_id': {'$in': list(existing)}})
+        record_deletions(collection, list(existing))
+        deleted = {object_id: {'_id': object_id} for object_id in existing}
+
+    if deleted:
+        bump_version(collection)
+    for index, object_id in ids.items():
+        status = 'deleted' if object_id in deleted else 'not_found'
+        results[index] = {'index': index, 'status': status, 'id': str(object_id)}
+    return results, [(doc, None) for doc in deleted.values()]
+
+def bulk_endpoint(name):
+    """
+    POST inserts a list of documents, PUT applies a list of {id, ...fields} updates and
+    DELETE removes a list of ids. Writes are unordered so one bad item does not stop
+    the rest; every item gets its own result.
+    """
+    config = BULK_COLLECTIONS[name]
+
+    def handler():
+        try:
+            items = request.get_json(silent=True)
+            if isinstance(items, dict):
+                items = items.get('items') or items.get('ids')
+            if not isinstance(items, list) or not items:
+                return jsonify({'error': 'Request body must be a non-empty JSON list'}), 400
+            if len(items) > BULK_MAX_BATCH:
+                return jsonify({'error': f'At most {BULK_MAX_BATCH} items per request'}), 400
+
+            if request.method == 'POST':
+                results, changes = bulk_insert(config, items)
+            elif request.method == 'PUT':
+                results, changes = bulk_update(config, items)
+            else:
+                results, changes = bulk_delete(config, items)
+            if config.get('after_write') and changes:
+                config['after_write'](changes)
+            return bulk_summary(results)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    handler.__name__ = f"bulk_{name.replace('-', '_')}"
+    return handler
+
+for collection_name in BULK_COLLECTIONS:
+    api.add_url_rule(
+        f'/api/{collection_name}/bulk',
+        view_func=bulk_endpoint(collection_name),
+        methods=['POST', 'PUT', 'DELETE']
+    )
+
+# ============= DISPATCH ENDPOINT =============
+class DispatchConflict(Exception):
+    """
+    A planned team or incident changed state before the plan could be applied.
+    `applied` holds the pairs that stay applied: none when a transaction was aborted.
+    """
+
+    def __init__(self, message, applied=(), atomic=False):
+        super().__init__(message)
+        self.applied = [] if atomic else list(applied)
+        self.atomic = atomic
+
+def dispatch_candidates(incident_ids=None):
+    """Open, unassigned incidents and available teams that have coordinates"""
+    incident_query = {
+        'status': {'$ne': 'resolved'},
+        'assignedTeam': {'$in': [None, '']},
+        'geo': {'$exists': True}
+    }
+    if incident_ids is not None:
+        incident_query['_id'] = {'$in': incident_ids}
+    incidents = list(incidents_collection.find(incident_query))
+    teams = list(teams_collection.find({'status': 'available', 'geo': {'$exists': True}}))
+    return teams, incidents
+
+def apply_dispatch(pairs, session=None):
+    """
+    Claim each planned team and assign it to its incident. Both updates are guarded
+    (team still available, incident still unassigned) and a failed guard raises
+    DispatchConflict. Returns [(previous incident, incident $set)] for the applied pairs.
+    """
+    now = utc_now()
+    applied = []
+    for team, incident in pairs:
+        team_data = touch({'status': 'deployed', 'assignedIncident': str(incident['_id'])})
+        claimed = teams_collection.update_one(
+            {'_id': team['_id'], 'status': 'available'}, {'$set': team_data}, session=session
+        )
+        if not claimed.modified_count:
+            raise DispatchConflict(f"Team {team.get('name', team['_id'])} is no longer available", applied,
+                                   atomic=session is not None)
+
+        incident_data = {
+            'assignedTeam': team.get('name'),
+            'assignedTeamId': str(team['_id']),
+            'status': 'responding',
+            'updatedAt': now
+        }
+        mark_incident_response(incident, incident_data)
+        touch(incident_data)
+        assigned = incidents_collection.update_one(
+            {'_id': incident['_id'], 'status': {'$ne': 'resolved'}, 'assignedTeam': {'$in': [None, '']}},
+            {'$set': incident_data},
+            session=session
+        )
+        if not assigned.modified_count:
+            if session is None:
+                # No transaction to roll back: release the claimed team again
+                teams_collection.update_one(
+                    {'_id': team['_id']},
+                    {'$set': touch({'status': 'available'}), '$unset': {'assignedIncident': ''}}
+                )
+            raise DispatchConflict(f"Incident {incident.get('title', incident['_id'])} was assigned or resolved meanwhile",
+                                   applied, atomic=session is not None)
+        applied.append((incident, incident_data))
+    return applied
+
+def apply_dispatch_atomically(pairs):
+    """
+    Apply a dispatch plan in a multi-document transaction (all pairs or none).
+    Standalone servers do not support transactions; there the pairs are applied one
+    by one and a conflict stops the run, leaving earlier pairs applied.
+    Returns (applied pairs, atomic, conflict message or None).
+    """
+    try:
+        applied, atomic = mongo.run_in_transaction(lambda session: apply_dispatch(pairs, session=session))
+        return applied, atomic, None
+    except DispatchConflict as e:
+        return e.applied, e.atomic, str(e)
+
+@api.route('/api/dispatch/plan', methods=['POST'])
+def dispatch_plan():
+    """
+    Compute (and optionally apply) an assignment of available teams to open incidents.
+    Body (all optional): {"apply": false, "maxDistanceKm": null, "incidents": [ids]}
+    """
+    try:
+        options = request.get_json(silent=True) or {}
+        if not isinstance(options, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        max_distance = options.get('maxDistanceKm')
+        if max_distance is not None and (not isinstance(max_distance, (int, float)) or max_distance <= 0):
+            return jsonify({'error': 'maxDistanceKm must be a positive number'}), 400
+        incident_ids = None
+        if options.get('incidents') is not None:
+            try:
+                incident_ids = [ObjectId(incident_id) for incident_id in options['incidents']]
+            except Exception:
+                return jsonify({'error': 'incidents must be a list of incident ids'}), 400
+
+        started = time.perf_counter()
+        teams, incidents = dispatch_candidates(incident_ids)
+        assignments, unassigned, idle = plan_dispatch(teams, incidents, max_distance)
+        planned_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        plan = {
+            'assignments': [{
+                'incidentId': str(incidents[i]['_id']),
+                'incidentTitle': incidents[i].get('title'),
+                'severity': incidents[i].get('severity'),
+                'teamId': str(teams[t]['_id']),
+                'teamName': teams[t].get('name'),
+                'teamType': teams[t].get('type'),
+                'distanceKm': round(distance, 2),
+                'typeMatch': match
+            } for t, i, distance, match in assignments],
+            'unassignedIncidents': [str(incidents[i]['_id']) for i in unassigned],
+            'idleTeams': [str(teams[t]['_id']) for t in idle],
+            'totalDistanceKm': round(sum(distance for _, _, distance, _ in assignments), 2),
+            'solver': solver_name(),
+            'planningMs': planned_ms,
+            'applied': False
+        }
+        if not options.get('apply') or not assignments:
+            return jsonify(plan), 200
+
+        pairs = [(teams[t], incidents[i]) for t, i, _, _ in assignments]
+        applied, atomic, conflict = apply_dispatch_atomically(pairs)
+        if applied:
+            for previous, data in applied:
+                notify_local(incidents_collection, 'update', {**previous, **data})
+            bump_version(teams_collection)
+            bump_version(incidents_collection)
+            heatmap_tiles.points_changed([previous for previous, _ in applied])
+            apply_batch_delta(analytics_collection, incident_contribution,
+                              [(previous, {**previous, **data}) for previous, data in applied])
+        plan['atomic'] = atomic
+        if conflict:
+            # Without a transaction the pairs before the conflict stay applied
+            plan['appliedIncidents'] = [str(previous['_id']) for previous, _ in applied]
+            return jsonify({'error': conflict, 'plan': plan}), 409
+        plan['applied'] = True
+        return jsonify(plan), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============= SEARCH ENDPOINT =============
+# Collections covered by /api/search (each has a weighted text index, see indexes.py)
+SEARCH_COLLECTIONS = {
+    'alerts': alerts_collection,
+    'incidents': incidents_collection,
+    'messages': messages_collection,
+}
+
+@api.route('/api/search', methods=['GET'])
+def search():
+    """
+    Full-text search, best matches first across collections.
+    ?q= search text (words, "exact phrases", -excluded), ?collections=alerts,incidents,
+    ?status= / ?severity= / ?type= filters, ?limit= and ?after= (X-Next-Cursor) paging.
+    """
     try:
-        messages = list(messages_collection.find().sort('timestamp', -1))
-        return jsonify([serialize_doc(message) for message in messages]), 200
+        text = parse_query(request.args.get('q'))
+        limit = parse_limit(request.args.get('limit'), default=20, maximum=MAX_SEARCH_RESULTS)
+        names = [name.strip() for name in request.args.get('collections', '').split(',') if name.strip()]
+        names = names or list(SEARCH_COLLECTIONS)
+        unknown = [name for name in names if name not in SEARCH_COLLECTIONS]
+        if unknown:
+            return jsonify({'error': f"Unknown collections: {', '.join(unknown)}"}), 400
+        after = request.args.get('after')
+        cursor = decode_search_cursor(after) if after else None
+        filters = parse_filters(request.args)
+
+        results = {
+            name: list(SEARCH_COLLECTIONS[name].aggregate(search_pipeline(text, filters, name, cursor, limit)))
+            for name in names
+        }
+        page, next_cursor = merge_results(results, limit)
+        body = [{
+            'collection': item['collection'],
+            'score': round(item['score'], 4),
+            'document': public_document(item['document'])
+        } for item in page]
+        response = jsonify(body)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/messages', methods=['POST'])
-def create_message():
+# ============= SYNC ENDPOINT =============
+# Collections included in delta sync, keyed by their API name
+SYNC_COLLECTIONS = {
+    'alerts': alerts_collection,
+    'incidents': incidents_collection,
+    'resources': resources_collection,
+    'teams': teams_collection,
+    'messages': messages_collection,
+}
+
+@api.route('/api/sync', methods=['GET'])
+def sync_changes():
+    """
+    Delta sync: returns documents upserted and ids deleted since the ?since= token
+    (all documents when no token is given, with reset=true). Pass the returned token
+    on the next call. ?collections=alerts,incidents limits the collections returned.
+    """
+    try:
+        since = request.args.get('since')
+        since = decode_token(since) if since else None
+        names = request.args.get('collections')
+        collections = SYNC_COLLECTIONS
+        if names:
+            requested = [name.strip() for name in names.split(',') if name.strip()]
+            unknown = [name for name in requested if name not in SYNC_COLLECTIONS]
+            if unknown:
+                return jsonify({'error': f"Unknown collections: {', '.join(unknown)}"}), 400
+            collections = {name: SYNC_COLLECTIONS[name] for name in requested}
+
+        changes, reset, token = collect_changes(collections, tombstones_collection, since)
+        payload = {
+            name: {
+                'upserted': [serialize_doc(doc) for doc in change['upserted']],
+                'deleted': change['deleted']
+            }
+            for name, change in changes.items()
+        }
+        return jsonify({'token': token, 'reset': reset, 'changes': payload}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============= EVENTS ENDPOINT =============
+# Seconds between keep-alive comments on idle event streams
+EVENT_KEEPALIVE = int(os.getenv('EVENT_KEEPALIVE_SECONDS', 15))
+
+def parse_event_filters(args):
+    """(collections, severities or None) from ?collections= and ?severity="""
+    names = args.get('collections')
+    collections = [name.strip() for name in names.split(',') if name.strip()] if names else list(EVENT_COLLECTIONS)
+    unknown = [name for name in collections if name not in EVENT_COLLECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown collections: {', '.join(unknown)}")
+    severity = args.get('severity')
+    severities = [value.strip() for value in severity.split(',') if value.strip()] if severity else None
+    return collections, severities
+
+@api.route('/api/events', methods=['GET'])
+def stream_events():
+    """
+    Server-Sent Events stream of alert, incident and message inserts/updates.
+    ?collections=alerts,incidents narrows the collections and ?severity=critical,high
+    filters documents that carry a severity.
+    """
+    try:
+        collections, severities = parse_event_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     try:
-        data = copy.deepcopy(request.json)
-        data['timestamp'] = datetime.utcnow().isoformat() + 'Z'
-        result = messages_collection.insert_one(data)
-        # Fetch the created document to ensure proper serialization
-        created_message = messages_collection.find_one({'_id': result.inserted_id})
-        return jsonify(serialize_doc(created_message)), 201
+        subscription = event_broker.subscribe(collections, severities)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = subscription.get(timeout=EVENT_KEEPALIVE)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {event['collection']}\ndata: {event['data']}\n\n"
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # ============= WEATHER ENDPOINTS =============
 # Fallback data for cities (average values per city)
 CITY_FALLBACK_DATA = {
@@ -404,192 +1482,149 @@ def get_fallback_data(city_name):
         'sunTimes': {'sunrise': '06:30', 'sunset': '18:15'}
     }
 
-@app.route('/api/weather/<location>', methods=['GET'])
-def get_weather(location):
-    try:
-        api_key = os.getenv('OPENWEATHER_API_KEY')
-        use_api = bool(api_key)
-        weather_data = None
-        forecast_data = None
-        air_pollution_data = None
-        
-        if use_api:
-            try:
-                # Get current weather
-                weather_url = f'https://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}&units=metric'
-                weather_response = requests.get(weather_url, timeout=5)
-                
-                if weather_response.status_code == 200:
-                    weather_data = weather_response.json()
-                    
-                    # Get forecast
-                    forecast_url = f'https://api.openweathermap.org/data/2.5/forecast?q={location}&appid={api_key}&units=metric'
-                    forecast_response = requests.get(forecast_url, timeout=5)
-                    if forecast_response.status_code == 200:
-                        forecast_data = forecast_response.json()
-                    
-                    # Get air pollution data (if coordinates available)
-                    if 'coord' in weather_data:
-                        lat = weather_data['coord']['lat']
-                        lon = weather_data['coord']['lon']
-                        air_url = f'http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={api_key}'
-                        air_response = requests.get(air_url, timeout=5)
-                        if air_response.status_code == 200:
-                            air_pollution_data = air_response.json()
-            except Exception as api_error:
-                print(f"API Error: {api_error}")
-                use_api = False
-        
-        # Process forecast data
-        daily_forecast = []
-        if forecast_data and 'list' in forecast_data:
-            seen_dates = set()
-            for item in forecast_data.get('list', [])[:24]:
-                date = item['dt_txt'].split(' ')[0]
-                if date not in seen_dates and len(daily_forecast) < 3:
-                    seen_dates.add(date)
-                    daily_forecast.append({
-                        'date': date,
-                        'high': int(item['main']['temp_max']),
-                        'low': int(item['main']['temp_min']),
-                        'condition': item['weather'][0]['main'],
-                        'precipitation': int(item.get('pop', 0) * 100)
-                    })
-        
-        # Format response with real or fallback data
-        # Store original location for fallback lookup
-        original_location = location
+# Two-tier weather cache: in-process LRU backed by snapshots in weather_collection
+weather_cache = WeatherCache(
+    weather_collection,
+    ttl=int(os.getenv('WEATHER_CACHE_TTL', 600)),
+    stale_ttl=int(os.getenv('WEATHER_STALE_TTL', 1800)),
+    max_entries=int(os.getenv('WEATHER_CACHE_SIZE', 256))
+)
+
+# Shared keep-alive session for OpenWeatherMap requests
+weather_client = OpenWeatherClient(
+    base_url=os.getenv('OPENWEATHER_BASE_URL', 'https://api.openweathermap.org'),
+    timeout=float(os.getenv('OPENWEATHER_TIMEOUT', 5)),
+    pool_size=int(os.getenv('OPENWEATHER_POOL_SIZE', 10)),
+    breaker=CircuitBreaker(
+        failure_rate=float(os.getenv('OPENWEATHER_BREAKER_FAILURE_RATE', 0.5)),
+        min_calls=int(os.getenv('OPENWEATHER_BREAKER_MIN_CALLS', 5)),
+        window=int(os.getenv('OPENWEATHER_BREAKER_WINDOW', 20)),
+        cooldown=float(os.getenv('OPENWEATHER_BREAKER_COOLDOWN', 30))
+    )
+)
+
+def fetch_weather_report(location, timings=None):
+    """
+    Build the weather report for a location from OpenWeatherMap, filling gaps with
+    city fallback data. Returns (result, from_api); only API backed results are cached.
+    Upstream stage durations are written into `timings` when given.
+    """
+    api_key = os.getenv('OPENWEATHER_API_KEY')
+    use_api = bool(api_key)
+    weather_data = None
+    forecast_data = None
+    air_pollution_data = None
+    
+    if use_api:
+        # Forecast runs in parallel with the weather -> air pollution chain.
+        # Raises CircuitOpenError while the upstream is failing so callers fall back immediately.
+        weather_data, forecast_data, air_pollution_data = weather_client.fetch(location, api_key, timings)
+    return build_weather_report(location, weather_data, forecast_data, air_pollution_data)
+
+def build_weather_report(location, weather_data, forecast_data, air_pollution_data):
+    """
+    Weather report from OpenWeatherMap responses (None where unavailable), filling
+    gaps with city fallback data. Returns (result, from_api).
+    """
+    # Process forecast data
+    daily_forecast = []
+    if forecast_data and 'list' in forecast_data:
+        seen_dates = set()
+        for item in forecast_data.get('list', [])[:24]:
+            date = item['dt_txt'].split(' ')[0]
+            if date not in seen_dates and len(daily_forecast) < 3:
+                seen_dates.add(date)
+                daily_forecast.append({
+                    'date': date,
+                    'high': int(item['main']['temp_max']),
+                    'low': int(item['main']['temp_min']),
+                    'condition': item['weather'][0]['main'],
+                    'precipitation': int(item.get('pop', 0) * 100)
+                })
+    
+    # Format response with real or fallback data
+    # Store original location for fallback lookup
+    original_location = location
+    
+    if weather_data:
+        # Real API data
+        result = {
+            'location': weather_data['name'],
+            'temperature': int(weather_data['main']['temp']),
+            'humidity': weather_data['main']['humidity'],
+            'windSpeed': int(weather_data['wind']['speed'] * 3.6),
+            'visibility': int(weather_data.get('visibility', 10000) / 1000),
+            'condition': weather_data['weather'][0]['main'],
+            'alerts': [],
+            'forecast': daily_forecast
+        }
         
-        if weather_data:
-            # Real API data
-            result = {
-                'location': weather_data['name'],
-                'temperature': int(weather_data['main']['temp']),
-                'humidity': weather_data['main']['humidity'],
-                'windSpeed': int(weather_data['wind']['speed'] * 3.6),
-                'visibility': int(weather_data.get('visibility', 10000) / 1000),
-                'condition': weather_data['weather'][0]['main'],
-                'alerts': [],
-                'forecast': daily_forecast
-            }
-            
-            # Get sunrise/sunset from API
-            if 'sys' in weather_data:
-                timezone_offset = weather_data.get('timezone', 0)
-                sunrise_ts = weather_data['sys'].get('sunrise', 0)
-                sunset_ts = weather_data['sys'].get('sunset', 0)
-                if sunrise_ts and sunset_ts:
-                    result['sunTimes'] = {
-                        'sunrise': format_time_from_timestamp(sunrise_ts, timezone_offset),
-                        'sunset': format_time_from_timestamp(sunset_ts, timezone_offset)
-                    }
-            
-            # Get AQI from API
-            if air_pollution_data and 'list' in air_pollution_data and len(air_pollution_data['list']) > 0:
-                air = air_pollution_data['list'][0]['main']
-                components = air_pollution_data['list'][0]['components']
-                pm25 = components.get('pm2_5', 0)
-                pm10 = components.get('pm10', 0)
-                
-                # Calculate AQI from PM2.5 and PM10 (using the higher of the two)
-                # AQI calculation based on US EPA standards
-                # For PM2.5: AQI = ((I_high - I_low) / (C_high - C_low)) * (C - C_low) + I_low
-                # Simplified: use max of PM2.5 and PM10 based AQI
-                aqi_from_pm25 = pm25 * 2  # Rough conversion (PM2.5 in µg/m³ to AQI)
-                aqi_from_pm10 = pm10  # Rough conversion (PM10 in µg/m³ to AQI)
-                aqi_value = max(aqi_from_pm25, aqi_from_pm10)
-                
-                # Cap at reasonable maximum
-                aqi_value = min(int(aqi_value), 300)
-                
-                result['aqi'] = {
-                    'overall': aqi_value,
-                    'pm25': int(pm25),
-                    'pm10': int(pm10),
-                    'level': get_aqi_level(aqi_value)
+        # Get sunrise/sunset from API
+        if 'sys' in weather_data:
+            timezone_offset = weather_data.get('timezone', 0)
+            sunrise_ts = weather_data['sys'].get('sunrise', 0)
+            sunset_ts = weather_data['sys'].get('sunset', 0)
+            if sunrise_ts and sunset_ts:
+                result['sunTimes'] = {
+                    'sunrise': format_time_from_timestamp(sunrise_ts, timezone_offset),
+                    'sunset': format_time_from_timestamp(sunset_ts, timezone_offset)
                 }
+        
+        # Get AQI from API
+        if air_pollution_data and 'list' in air_pollution_data and len(air_pollution_data['list']) > 0:
+            air = air_pollution_data['list'][0]['main']
+            components = air_pollution_data['list'][0]['components']
+            pm25 = components.get('pm2_5', 0)
+            pm10 = components.get('pm10', 0)
             
-            # Calculate UV index (estimate based on time and location)
-            # In real implementation, you'd use One Call API, but for free tier we estimate
-            # Use city-specific fallback data as baseline, adjusted by time of day
-            # Try original location first, then API location name
-            fallback_uv_data = get_fallback_data(original_location)
-            if not fallback_uv_data.get('uvIndex'):
-                fallback_uv_data = get_fallback_data(result['location'])
-            fallback_uv = fallback_uv_data.get('uvIndex', {}).get('value', 7)
-            current_hour = datetime.utcnow().hour
+            # Calculate AQI from PM2.5 and PM10 (using the higher of the two)
+            # AQI calculation based on US EPA standards
+            # For PM2.5: AQI = ((I_high - I_low) / (C_high - C_low)) * (C - C_low) + I_low
+            # Simplified: use max of PM2.5 and PM10 based AQI
+            aqi_from_pm25 = pm25 * 2  # Rough conversion (PM2.5 in µg/m³ to AQI)
+            aqi_from_pm10 = pm10  # Rough conversion (PM10 in µg/m³ to AQI)
+            aqi_value = max(aqi_from_pm25, aqi_from_pm10)
             
-            # Adjust UV based on time of day (peak around noon, lowest at night)
-            if 10 <= current_hour <= 14:
-                # Peak hours: use full UV value
-                uv_estimate = fallback_uv
-            elif 8 <= current_hour <= 16:
-                # Near peak: slightly lower
-                uv_estimate = max(5, fallback_uv - 1)
-            elif 6 <= current_hour <= 18:
-                # Early morning/late afternoon: moderate
-                uv_estimate = max(3, fallback_uv - 3)
-            else:
-                # Night time: very low
-                uv_estimate = 1
+            # Cap at reasonable maximum
+            aqi_value = min(int(aqi_value), 300)
             
-            result['uvIndex'] = {
-                'value': uv_estimate,
-                'level': get_uv_level(uv_estimate)
-            }
-        else:
-            # Fallback data
-            fallback = get_fallback_data(location)
-            result = {
-                'location': location,
-                'temperature': 28,
-                'humidity': 65,
-                'windSpeed': 15,
-                'visibility': 8,
-                'condition': 'Partly Cloudy',
-                'alerts': [],
-                'forecast': daily_forecast if daily_forecast else [
-                    {'date': datetime.now().strftime('%Y-%m-%d'), 'high': 30, 'low': 22, 'condition': 'Partly Cloudy', 'precipitation': 20}
-                ],
-                'aqi': fallback['aqi'],
-                'uvIndex': fallback['uvIndex'],
-                'sunTimes': fallback['sunTimes']
+            result['aqi'] = {
+                'overall': aqi_value,
+                'pm25': int(pm25),
+                'pm10': int(pm10),
+                'level': get_aqi_level(aqi_value)
             }
         
-        # Add fallback for missing fields (use original location for lookup)
-        if 'aqi' not in result:
-            fallback = get_fallback_data(original_location)
-            result['aqi'] = fallback['aqi']
-        
-        if 'uvIndex' not in result:
-            fallback = get_fallback_data(original_location)
-            result['uvIndex'] = fallback['uvIndex']
-        
-        if 'sunTimes' not in result:
-            fallback = get_fallback_data(original_location)
-            result['sunTimes'] = fallback['sunTimes']
-        
-        # Add weather alerts if temperature is extreme
-        if result['temperature'] > 35:
-            result['alerts'].append('Heat Wave Warning')
-        elif result['temperature'] < 5:
-            result['alerts'].append('Cold Wave Warning')
-        
-        if result.get('condition') == 'Rain':
-            result['alerts'].append('Heavy Rainfall Expected')
-        
-        # Add AQI alerts
-        if result.get('aqi', {}).get('overall', 0) > 150:
-            result['alerts'].append('Poor Air Quality Warning')
-        
-        # Add UV alerts
-        if result.get('uvIndex', {}).get('value', 0) >= 8:
-            result['alerts'].append('High UV Index - Protective Measures Recommended')
+        # Calculate UV index (estimate based on time and location)
+        # In real implementation, you'd use One Call API, but for free tier we estimate
+        # Use city-specific fallback data as baseline, adjusted by time of day
+        # Try original location first, then API location name
+        fallback_uv_data = get_fallback_data(original_location)
+        if not fallback_uv_data.get('uvIndex'):
+            fallback_uv_data = get_fallback_data(result['location'])
+        fallback_uv = fallback_uv_data.get('uvIndex', {}).get('value', 7)
+        current_hour = datetime.utcnow().hour
         
-        return jsonify(result), 200
+        # Adjust UV based on time of day (peak around noon, lowest at night)
+        if 10 <= current_hour <= 14:
+            # Peak hours: use full UV value
+            uv_estimate = fallback_uv
+        elif 8 <= current_hour <= 16:
+            # Near peak: slightly lower
+            uv_estimate = max(5, fallback_uv - 1)
+        elif 6 <= current_hour <= 18:
+            # Early morning/late afternoon: moderate
+            uv_estimate = max(3, fallback_uv - 3)
+        else:
+            # Night time: very low
+            uv_estimate = 1
         
-    except Exception as e:
-        # Return fallback data on error
+        result['uvIndex'] = {
+            'value': uv_estimate,
+            'level': get_uv_level(uv_estimate)
+        }
+    else:
+        # Fallback data
         fallback = get_fallback_data(location)
         result = {
             'location': location,
@@ -599,60 +1634,154 @@ def get_weather(location):
             'visibility': 8,
             'condition': 'Partly Cloudy',
             'alerts': [],
-            'forecast': [],
+            'forecast': daily_forecast if daily_forecast else [
+                {'date': datetime.now().strftime('%Y-%m-%d'), 'high': 30, 'low': 22, 'condition': 'Partly Cloudy', 'precipitation': 20}
+            ],
             'aqi': fallback['aqi'],
             'uvIndex': fallback['uvIndex'],
             'sunTimes': fallback['sunTimes']
         }
-        return jsonify(result), 200
+    
+    # Add fallback for missing fields (use original location for lookup)
+    if 'aqi' not in result:
+        fallback = get_fallback_data(original_location)
+        result['aqi'] = fallback['aqi']
+    
+    if 'uvIndex' not in result:
+        fallback = get_fallback_data(original_location)
+        result['uvIndex'] = fallback['uvIndex']
+    
+    if 'sunTimes' not in result:
+        fallback = get_fallback_data(original_location)
+        result['sunTimes'] = fallback['sunTimes']
+    
+    # Add weather alerts if temperature is extreme
+    if result['temperature'] > 35:
+        result['alerts'].append('Heat Wave Warning')
+    elif result['temperature'] < 5:
+        result['alerts'].append('Cold Wave Warning')
+    
+    if result.get('condition') == 'Rain':
+        result['alerts'].append('Heavy Rainfall Expected')
+    
+    # Add AQI alerts
+    if result.get('aqi', {}).get('overall', 0) > 150:
+        result['alerts'].append('Poor Air Quality Warning')
+    
+    # Add UV alerts
+    if result.get('uvIndex', {}).get('value', 0) >= 8:
+        result['alerts'].append('High UV Index - Protective Measures Recommended')
+    
+    return result, bool(weather_data)
+
+def fallback_weather_report(location):
+    """Weather report built only from city fallback data"""
+    fallback = get_fallback_data(location)
+    result = {
+        'location': location,
+        'temperature': 28,
+        'humidity': 65,
+        'windSpeed': 15,
+        'visibility': 8,
+        'condition': 'Partly Cloudy',
+        'alerts': [],
+        'forecast': [],
+        'aqi': fallback['aqi'],
+        'uvIndex': fallback['uvIndex'],
+        'sunTimes': fallback['sunTimes']
+    }
+    return result
+
+@api.route('/api/weather/<location>', methods=['GET'])
+def get_weather(location):
+    try:
+        timings = {}
+        result, cache_status = weather_cache.get_or_fetch(
+            location, lambda loc: fetch_weather_report(loc, timings)
+        )
+        response = jsonify(result)
+        response.headers['X-Weather-Cache'] = cache_status
+        if timings:
+            response.headers['Server-Timing'] = server_timing_header(timings)
+        return response, 200
+    except Exception as e:
+        # Return fallback data on error (e.g. circuit open and nothing cached)
+        response = jsonify(fallback_weather_report(location))
+        response.headers['X-Weather-Cache'] = 'unavailable'
+        return response, 200
+
+# Bounded pool for multi-city weather requests
+WEATHER_BATCH_MAX_LOCATIONS = int(os.getenv('WEATHER_BATCH_MAX_LOCATIONS', 50))
+weather_batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('WEATHER_BATCH_WORKERS', 8)),
+    thread_name_prefix='weather-batch'
+)
+
+def weather_batch_item(location):
+    """Weather result for one city of a batch request, with its own status"""
+    try:
+        result, cache_status = weather_cache.get_or_fetch(location, fetch_weather_report)
+        # 'expired' snapshots are only served because the upstream failed
+        status = {'bypass': 'fallback', 'expired': 'stale'}.get(cache_status, 'ok')
+        return {'location': location, 'status': status, 'cache': cache_status, 'data': result}
+    except CircuitOpenError:
+        return {'location': location, 'status': 'fallback', 'cache': 'bypass',
+                'data': fallback_weather_report(location)}
+    except Exception as e:
+        return {'location': location, 'status': 'error', 'error': str(e),
+                'data': fallback_weather_report(location)}
+
+@api.route('/api/weather', methods=['GET'])
+def get_weather_batch():
+    locations = []
+    seen = set()
+    for location in request.args.get('locations', '').split(','):
+        key = WeatherCache.normalize(location)
+        if key and key not in seen:
+            seen.add(key)
+            locations.append(location.strip())
+    if not locations:
+        return jsonify({'error': 'locations parameter required'}), 400
+    if len(locations) > WEATHER_BATCH_MAX_LOCATIONS:
+        return jsonify({'error': f'At most {WEATHER_BATCH_MAX_LOCATIONS} locations per request'}), 400
+
+    # Fan out across the pool; the cache collapses duplicate in-flight fetches
+    results = list(weather_batch_executor.map(weather_batch_item, locations))
+    return jsonify({'results': results, 'count': len(results)}), 200
 
 # ============= ANALYTICS ENDPOINT =============
-@app.route('/api/analytics', methods=['GET'])
+@api.route('/api/analytics', methods=['GET'])
 def get_analytics():
     try:
-        total_incidents = incidents_collection.count_documents({})
-        resolved_incidents = incidents_collection.count_documents({'status': 'resolved'})
-        active_incidents = incidents_collection.count_documents({'status': {'$ne': 'resolved'}})
-        
-        analytics = {
-            'totalIncidents': total_incidents,
-            'resolvedIncidents': resolved_incidents,
-            'activeIncidents': active_incidents,
-            'averageResponseTime': '18 minutes',
-            'resourceUtilization': 78,
-            'monthlyIncidents': [
-                {'month': 'Jan', 'incidents': 12},
-                {'month': 'Feb', 'incidents': 8},
-                {'month': 'Mar', 'incidents': 15},
-                {'month': 'Apr', 'incidents': 22},
-                {'month': 'May', 'incidents': 18},
-                {'month': 'Jun', 'incidents': 25}
-            ],
-            'incidentsByType': [
-                {'type': 'Natural Disaster', 'count': 45},
-                {'type': 'Fire', 'count': 32},
-                {'type': 'Medical Emergency', 'count': 28},
-                {'type': 'Accident', 'count': 25},
-                {'type': 'Other', 'count': 26}
-            ]
-        }
-        return jsonify(analytics), 200
+        # Served from the incrementally maintained rollup document
+        summary = get_summary(analytics_collection, incidents_collection, resources_collection)
+        return jsonify(format_analytics(summary)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # ============= USERS ENDPOINTS =============
-@app.route('/api/users', methods=['GET'])
+@api.route('/api/users', methods=['GET'])
 def get_users():
-    try:
-        users = list(users_collection.find())
-        return jsonify([serialize_doc(user) for user in users]), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return list_documents(**LIST_ENDPOINTS['users'])
 
 # Health check endpoint
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'ok', 'message': 'Server is running'}), 200
+    return jsonify({
+        'status': 'ok',
+        'message': 'Server is running',
+        'events': event_broker.stats(),
+        'responseCache': response_cache.stats(),
+        'jsonEncoder': current_app.json.encoder.name,
+        'mongo': mongo.stats(),
+        'evacuationGraph': evacuation_network.stats(),
+        'incidentDedup': {'mode': INCIDENT_DEDUP_MODE, **incident_dedup.stats()},
+        'heatmapCache': heatmap_tiles.stats(),
+        'weatherUpstream': {
+            'circuit': weather_client.breaker.snapshot(),
+            'timings': weather_client.timing_summary()
+        }
+    }), 200
 
 # ============= AUTH ENDPOINTS =============
 def validate_password_rules(password):
@@ -684,7 +1813,7 @@ def validate_password_rules(password):
     return True
 
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
 def login():
     try:
         data = request.json
@@ -709,9 +1838,10 @@ def login():
                 'role': 'Operator',
                 'department': 'Emergency Services',
                 'contact': '+91-0000000000',
-                'lastActive': datetime.utcnow().isoformat() + 'Z'
+                'lastActive': utc_now()
             }
             result = users_collection.insert_one(user_data)
+            bump_version(users_collection)
             user_data['id'] = str(result.inserted_id)
             del user_data['_id']
             return jsonify({'success': True, 'user': user_data}), 201
@@ -723,8 +1853,9 @@ def login():
         # Update last active
         users_collection.update_one(
             {'_id': user['_id']},
-            {'$set': {'lastActive': datetime.utcnow().isoformat() + 'Z'}}
+            {'$set': {'lastActive': utc_now()}}
         )
+        bump_version(users_collection)
         
         user_data = serialize_doc(user)
         del user_data['password']  # Don't send password back
@@ -734,5 +1865,103 @@ def login():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ============= MANAGEMENT COMMANDS =============
+def backfill_geo_points():
+    """Populate the GeoJSON 'geo' field for documents created before it existed"""
+    counts = {}
+    for collection in (incidents_collection, teams_collection, resources_collection):
+        count = 0
+        for doc in collection.find({'geo': {'$exists': False}, 'coordinates': {'$exists': True}}, {'coordinates': 1}):
+            try:
+                update = with_geo_point({'coordinates': doc['coordinates']})
+            except ValueError:
+                continue
+            if 'geo' in update:
+                collection.update_one({'_id': doc['_id']}, {'$set': {'geo': update['geo']}})
+                count += 1
+        if count:
+            counts[collection.name] = count
+    return counts
+
+def backfill_sync_watermarks():
+    """Stamp the sync watermark on documents written before delta sync existed"""
+    counts = {}
+    for name, collection in SYNC_COLLECTIONS.items():
+        result = collection.update_many({WATERMARK_FIELD: {'$exists': False}}, {'$set': touch({})})
+        if result.modified_count:
+            counts[name] = result.modified_count
+    return counts
+
+def apply_indexes():
+    """Backfill indexed fields and create every declared index, printing a summary"""
+    for name, count in backfill_geo_points().items():
+        bump_version(db[name])
+        print(f"✓ Backfilled geo points for {count} {name}")
+    for name, count in backfill_sync_watermarks().items():
+        print(f"✓ Backfilled sync watermarks for {count} {name}")
+    result = ensure_indexes(db)
+    for collection_name, names in result['created'].items():
+        print(f"✓ {collection_name}: {', '.join(names)}")
+    for collection_name, error in result['errors'].items():
+        print(f"⚠️ {collection_name}: {error}")
+    return result
+
+@api.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Create all declared MongoDB indexes (idempotent)."""
+    apply_indexes()
+
+@api.cli.command('rebuild-analytics')
+def rebuild_analytics_command():
+    """Recompute the analytics rollup from the incidents and resources collections."""
+    rebuild_summary(analytics_collection, incidents_collection, resources_collection)
+    print("✓ Analytics rollup rebuilt")
+
+@api.cli.command('migrate-timestamps')
+@click.option('--batch-size', default=1000, show_default=True, help='Documents rewritten per bulk write.')
+def migrate_timestamps_command(batch_size):
+    """Convert ISO string timestamps stored by older versions into BSON dates."""
+    for collection_name, counts in migrate_timestamps(db, batch_size=batch_size).items():
+        if counts['migrated']:
+            bump_version(db[collection_name])
+        print(f"✓ {collection_name}: {counts['migrated']} migrated, {counts['invalid']} unparseable values left as is")
+
+@api.cli.command('index-report')
+def index_report_command():
+    """Report declared indexes that are missing, undeclared or unused."""
+    for collection_name, status in index_report(db).items():
+        print(f"{collection_name}:")
+        for key in ('missing', 'undeclared', 'unused'):
+            print(f"  {key}: {', '.join(status[key]) or '-'}")
+
+# Response headers the frontend reads from cross-origin responses
+EXPOSED_HEADERS = ['ETag', 'X-Next-Cursor', 'X-Weather-Cache', 'Server-Timing', 'Preference-Applied', 'X-Duplicate-Of']
+
+def create_app(config=None):
+    """
+    Build the Flask application. `config` overrides settings read from the environment:
+    MONGO_URI, MONGO_DB, the MONGO_* client options (pool size, timeouts, read preference,
+    write concern, see mongo.CLIENT_OPTIONS) and JSON_ENCODER (orjson|json|auto).
+    No connection is opened here: the MongoDB client is created on first use in each
+    process, so the app can be built in a preloading server master and forked.
+    """
+    app = Flask(__name__)
+    app.config.update(MONGO_URI=MONGO_URI, MONGO_DB=MONGO_DB, JSON_ENCODER=os.getenv('JSON_ENCODER', 'auto'),
+                      **options_from_env())
+    app.config.update(config or {})
+    mongo.configure(app.config['MONGO_URI'], app.config['MONGO_DB'], **client_options(app.config))
+    app.json = FastJSONProvider(app, kind=app.config['JSON_ENCODER'])
+    CORS(app, expose_headers=EXPOSED_HEADERS)  # Enable CORS for all routes
+    app.register_blueprint(api)
+    # Change stream events are encoded with this app's JSON provider
+    event_broker.context = app.app_context
+    return app
+
 if __name__ == '__main__':
+    app = create_app()
+    if os.getenv('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true':
+        try:
+            apply_indexes()
+        except Exception as e:
+            print(f"Index provisioning failed: {e}")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
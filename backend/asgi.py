@@ -0,0 +1,256 @@
+"""
+ASGI entry point: the same API with the connection-heavy endpoints served by asyncio.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 [--workers 4]
+
+The event stream (/api/events), weather (/api/weather/<location>) and the collection
+list endpoints run as coroutines on Motor and httpx, so an idle SSE client or a slow
+upstream holds a coroutine, not a thread. Every other route (all writes included) is
+handed to the Flask application from create_app() through a WSGI bridge with its own
+thread pool, so routes, JSON bodies and headers are identical in both modes.
+Requires the packages in requirements-async.txt.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+
+load_dotenv()
+
+from app import (EVENT_KEEPALIVE, EXPOSED_HEADERS, LIST_ENDPOINTS, NDJSON_MIMETYPE, STREAM_BATCH_SIZE,  # noqa: E402
+                 build_weather_report, collection_versions, create_app, event_broker, fallback_weather_report,
+                 parse_event_filters, response_cache, weather_cache, weather_client)
+from events import AsyncSubscription  # noqa: E402
+from mongo import client_options  # noqa: E402
+from pagination import build_list_query, encode_cursor  # noqa: E402
+from versions import AsyncCollectionVersions  # noqa: E402
+from weather_cache import AsyncWeatherCache  # noqa: E402
+from weather_client import AsyncOpenWeatherClient, server_timing_header  # noqa: E402
+
+# Threads serving the bridged (synchronous) Flask routes
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 32))
+
+
+def best_accept(request):
+    return parse_accept_header(request.headers.get('accept'), MIMEAccept).best
+
+
+def wants_stream(request):
+    """Streaming is requested with ?stream=1 or an Accept: application/x-ndjson header"""
+    if request.query_params.get('stream', '').lower() in ('1', 'true', 'ndjson'):
+        return True
+    return best_accept(request) == NDJSON_MIMETYPE
+
+
+async def cache_call(method, *args):
+    """Response cache access; only the network backed (redis) backend is moved off the loop"""
+    if response_cache.backend is not None and response_cache.backend.name == 'redis':
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+class AsyncAPI:
+    """Async handlers; Motor and httpx clients are created in the server's lifespan"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.encoder = flask_app.json.encoder
+        self.db = None
+        self.versions = None
+        self.weather_cache = None
+        self.weather_client = None
+
+    @asynccontextmanager
+    async def lifespan(self, app):
+        config = self.flask_app.config
+        client = AsyncIOMotorClient(config['MONGO_URI'], **client_options(config))
+        self.db = client[config['MONGO_DB']]
+        self.versions = AsyncCollectionVersions(self.db[collection_versions.collection.name])
+        self.weather_cache = AsyncWeatherCache(weather_cache, self.db[weather_cache.collection.name])
+        self.weather_client = AsyncOpenWeatherClient.mirroring(weather_client)
+        try:
+            yield
+        finally:
+            await self.weather_client.aclose()
+            client.close()
+
+    def json(self, obj, status=200, headers=None):
+        return Response(self.encoder.dumps(obj), status_code=status, media_type='application/json', headers=headers)
+
+    def list_handler(self, settings):
+        """Async counterpart of app.list_documents() for one list endpoint"""
+        collection_name = settings['collection'].name
+        sort_field = settings.get('sort_field', '_id')
+        direction = settings.get('direction', ASCENDING)
+        range_field = settings.get('range_field')
+        geo = settings.get('geo', False)
+
+        async def handler(request):
+            try:
+                query, projection, sort, limit = build_list_query(request.query_params, sort_field, direction,
+                                                                  range_field=range_field, geo=geo)
+                streaming = wants_stream(request)
+                variant = request.url.query + ('|stream' if streaming else '')
+                if streaming and best_accept(request) == NDJSON_MIMETYPE:
+                    variant += '|ndjson'
+                etag = await self.versions.etag(collection_name, variant)
+                headers = {'ETag': quote_etag(etag, weak=True)}
+                if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+                    return Response(status_code=304, headers=headers)
+
+                use_cache = not streaming and response_cache.enabled_for(collection_name)
+                if use_cache:
+                    cached = await cache_call(response_cache.get, collection_name, etag)
+                    if cached:
+                        body, next_cursor = cached
+                        if next_cursor:
+                            headers['X-Next-Cursor'] = next_cursor
+                        return Response(body, media_type='application/json', headers=headers)
+
+                cursor = self.db[collection_name].find(query, projection).sort(sort)
+                if streaming:
+                    if limit:
+                        cursor = cursor.limit(limit)
+                    return await self.stream_documents(request, cursor, headers)
+
+                if limit:
+                    # Fetch one extra document to know whether there is a next page
+                    cursor = cursor.limit(limit + 1)
+                docs = await cursor.to_list(None)
+                next_cursor = None
+                if limit and len(docs) > limit:
+                    docs = docs[:limit]
+                    next_cursor = encode_cursor(docs[-1], sort_field)
+
+                body = self.flask_app.json.dumps_documents(docs)
+                if use_cache:
+                    await cache_call(response_cache.set, collection_name, etag, body, next_cursor)
+                if next_cursor:
+                    headers['X-Next-Cursor'] = next_cursor
+                return Response(body, media_type='application/json', headers=headers)
+            except ValueError as e:
+                return self.json({'error': str(e)}, 400)
+            except Exception as e:
+                return self.json({'error': str(e)}, 500)
+
+        handler.__name__ = f"list_{collection_name}"
+        return handler
+
+    async def stream_documents(self, request, cursor, headers):
+        """Async counterpart of app.stream_documents()"""
+        ndjson = (request.query_params.get('stream', '').lower() == 'ndjson'
+                  or best_accept(request) == NDJSON_MIMETYPE)
+        cursor = cursor.batch_size(STREAM_BATCH_SIZE)
+        # Pull the first batch now so database errors still produce a normal 500
+        try:
+            first = await cursor.next()
+        except StopAsyncIteration:
+            first = None
+        encode = self.flask_app.json.dumps_document
+
+        async def generate():
+            try:
+                if first is None:
+                    if not ndjson:
+                        yield b'[]'
+                    return
+                if ndjson:
+                    yield encode(first) + b'\n'
+                    async for doc in cursor:
+                        yield encode(doc) + b'\n'
+                else:
+                    yield b'[' + encode(first)
+                    async for doc in cursor:
+                        yield b',' + encode(doc)
+                    yield b']'
+            finally:
+                await cursor.close()
+
+        media_type = NDJSON_MIMETYPE if ndjson else 'application/json'
+        return StreamingResponse(generate(), media_type=media_type, headers=headers)
+
+    async def stream_events(self, request):
+        """Async counterpart of app.stream_events(): one coroutine per connected client"""
+        try:
+            collections, severities = parse_event_filters(request.query_params)
+        except ValueError as e:
+            return self.json({'error': str(e)}, 400)
+        subscription = AsyncSubscription(collections, severities, event_broker.max_queue)
+        try:
+            # The first subscriber may open the change stream, a blocking call
+            await run_in_threadpool(event_broker.attach, subscription)
+        except Exception as e:
+            return self.json({'error': str(e)}, 500)
+
+        async def generate():
+            try:
+                yield 'retry: 3000\n\n'
+                while True:
+                    try:
+                        event = await subscription.get(timeout=EVENT_KEEPALIVE)
+                    except asyncio.TimeoutError:
+                        yield ': keep-alive\n\n'
+                        continue
+                    yield f"event: {event['collection']}\ndata: {event['data']}\n\n"
+            finally:
+                event_broker.unsubscribe(subscription)
+
+        return StreamingResponse(generate(), media_type='text/event-stream',
+                                 headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    async def get_weather(self, request):
+        """Async counterpart of app.get_weather()"""
+        location = request.path_params['location']
+        timings = {}
+
+        async def fetch(loc):
+            api_key = os.getenv('OPENWEATHER_API_KEY')
+            weather = forecast = air = None
+            if api_key:
+                weather, forecast, air = await self.weather_client.fetch(loc, api_key, timings)
+            return build_weather_report(loc, weather, forecast, air)
+
+        try:
+            result, cache_status = await self.weather_cache.get_or_fetch(location, fetch)
+            headers = {'X-Weather-Cache': cache_status}
+            if timings:
+                headers['Server-Timing'] = server_timing_header(timings)
+            return self.json(result, headers=headers)
+        except Exception:
+            # Return fallback data on error (e.g. circuit open and nothing cached)
+            return self.json(fallback_weather_report(location), headers={'X-Weather-Cache': 'unavailable'})
+
+
+def create_asgi_app(config=None):
+    """
+    Build the ASGI application around create_app(config): the async routes come
+    first and everything else falls through to the Flask app.
+    """
+    flask_app = create_app(config)
+    api = AsyncAPI(flask_app)
+    routes = [
+        Route('/api/events', api.stream_events, methods=['GET']),
+        Route('/api/weather/{location}', api.get_weather, methods=['GET']),
+    ]
+    routes += [Route(f'/api/{name}', api.list_handler(settings), methods=['GET'])
+               for name, settings in LIST_ENDPOINTS.items()]
+    # Other methods on the paths above match only partially and fall through as well
+    routes.append(Mount('/', app=WSGIMiddleware(flask_app, workers=WSGI_THREADS)))
+    middleware = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+                             expose_headers=EXPOSED_HEADERS)]
+    return Starlette(routes=routes, middleware=middleware, lifespan=api.lifespan)
+
+
+app = create_asgi_app()
@@ -0,0 +1,77 @@
+"""
+Time the dispatch planner on synthetic incidents and teams (no database needed).
+
+    python benchmarks/dispatch_plan.py [--incidents 3000] [--teams 300]
+
+Runs with SciPy's solver when it is installed and always with the NumPy fallback.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import dispatch  # noqa: E402
+
+INCIDENT_TYPES = ('Industrial Accident', 'Structural Failure', 'Natural Disaster', 'Accident', 'Riot', 'Epidemic')
+TEAM_TYPES = ('fire', 'medical', 'police', 'rescue', 'evacuation')
+SEVERITIES = ('low', 'medium', 'high', 'critical')
+
+
+def random_point(rng):
+    # Roughly the bounding box of India
+    return {'type': 'Point', 'coordinates': [rng.uniform(68.0, 97.0), rng.uniform(8.0, 35.0)]}
+
+
+def make_documents(rng, incident_count, team_count):
+    incidents = [{
+        '_id': ObjectId(),
+        'type': INCIDENT_TYPES[rng.integers(len(INCIDENT_TYPES))],
+        'severity': SEVERITIES[rng.integers(len(SEVERITIES))],
+        'geo': random_point(rng),
+    } for _ in range(incident_count)]
+    teams = [{
+        '_id': ObjectId(),
+        'type': TEAM_TYPES[rng.integers(len(TEAM_TYPES))],
+        'geo': random_point(rng),
+    } for _ in range(team_count)]
+    return teams, incidents
+
+
+def run(label, teams, incidents, max_distance, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        assignments, unassigned, idle = dispatch.plan_dispatch(teams, incidents, max_distance)
+        best = min(best, time.perf_counter() - start)
+    total = sum(distance for _, _, distance, _ in assignments)
+    matched = sum(1 for _, _, _, match in assignments if match)
+    print(f'  {label:<8} {best * 1000:9.1f} ms  {len(assignments)} assigned ({matched} type matches), '
+          f'{len(unassigned)} incidents waiting, total {total:,.0f} km')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=3000)
+    parser.add_argument('--teams', type=int, default=300)
+    parser.add_argument('--max-distance', type=float, default=None, help='Distance limit in km')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    teams, incidents = make_documents(np.random.default_rng(42), args.incidents, args.teams)
+    print(f'{args.incidents} incidents x {args.teams} teams, best of {args.repeat} runs')
+    scipy_solver = dispatch.linear_sum_assignment
+    if scipy_solver is not None:
+        run('scipy', teams, incidents, args.max_distance, args.repeat)
+    dispatch.linear_sum_assignment = None
+    try:
+        run('numpy', teams, incidents, args.max_distance, args.repeat)
+    finally:
+        dispatch.linear_sum_assignment = scipy_solver
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Replay a synthetic stream of incident reports through the deduplicator.
+
+    python benchmarks/incident_dedup.py [--reports 100000] [--events 20000] [--naive 5000]
+
+Reports are generated from known events: each event is reported a few times by
+different people, with jittered positions, times and reworded titles. The first
+report of an event that is not matched becomes the indexed incident, later ones
+should be linked to it. Prints throughput and precision/recall of the links, and
+compares lookup time with a linear scan over the same window on a prefix.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dedup import IncidentDeduplicator, distance_m, normalize_type, similarity, title_tokens  # noqa: E402
+
+TYPES = ['fire', 'flood', 'medical', 'accident', 'collapse', 'gas leak']
+PLACES = ['market', 'station', 'bridge', 'school', 'warehouse', 'hospital', 'temple', 'harbour', 'mall', 'depot']
+PHRASES = ['{type} at {place}', '{place} {type}', '{type} reported near {place}', 'major {type} {place} area']
+
+
+def synthetic_reports(count, events, seed, area_degrees=2.0, duration=7 * 24 * 3600):
+    """(event id, lat, lng, at, type, title) tuples ordered by time"""
+    rng = random.Random(seed)
+    centres = []
+    for _ in range(events):
+        incident_type = rng.choice(TYPES)
+        centres.append((rng.uniform(19.0, 19.0 + area_degrees), rng.uniform(72.5, 72.5 + area_degrees),
+                        rng.uniform(0, duration), incident_type, rng.choice(PLACES)))
+    reports = []
+    for _ in range(count):
+        event = rng.randrange(events)
+        lat, lng, start, incident_type, place = centres[event]
+        # About 150 m of position noise and up to an hour of reporting delay
+        title = rng.choice(PHRASES).format(type=incident_type, place=place)
+        reports.append((event, lat + rng.gauss(0, 0.001), lng + rng.gauss(0, 0.001),
+                        start + rng.expovariate(1 / 900) % 3600, incident_type, title))
+    reports.sort(key=lambda report: report[3])
+    return reports
+
+
+class LinearScan:
+    """Same matching rule as IncidentDeduplicator without the grid"""
+
+    def __init__(self, radius_m, window, threshold):
+        self.radius_m, self.window, self.threshold = radius_m, window, threshold
+        self.entries = []
+
+    def add(self, incident_id, lat, lng, at, incident_type, title):
+        self.entries.append((incident_id, lat, lng, at, normalize_type(incident_type), title_tokens(title)))
+
+    def find(self, lat, lng, at, incident_type, title):
+        report_type, tokens = normalize_type(incident_type), title_tokens(title)
+        best = None
+        for incident_id, e_lat, e_lng, e_at, e_type, e_tokens in self.entries:
+            if abs(e_at - at) > self.window:
+                continue
+            distance = distance_m(lat, lng, e_lat, e_lng)
+            if distance > self.radius_m:
+                continue
+            score = similarity(tokens, report_type, e_tokens, e_type)
+            if score and score >= self.threshold and (best is None or (score, -distance) > best[0]):
+                best = ((score, -distance), incident_id)
+        return best and best[1]
+
+
+def replay(index, reports):
+    """Feed reports through `index`; returns (seconds, true links, false links, missed links)"""
+    event_of_incident = {}
+    primaries = set()
+    true_links = false_links = missed = 0
+    started = time.perf_counter()
+    for number, (event, lat, lng, at, incident_type, title) in enumerate(reports):
+        match = index.find(lat, lng, at, incident_type, title)
+        if match is not None:
+            incident_id = match[0] if isinstance(match, tuple) else match
+            if event_of_incident[incident_id] == event:
+                true_links += 1
+            else:
+                false_links += 1
+            continue
+        if event in primaries:
+            missed += 1
+        primaries.add(event)
+        event_of_incident[number] = event
+        index.add(number, lat, lng, at, incident_type, title)
+    return time.perf_counter() - started, true_links, false_links, missed
+
+
+def summary(label, count, result):
+    elapsed, true_links, false_links, missed = result
+    precision = true_links / (true_links + false_links) if true_links + false_links else 1.0
+    recall = true_links / (true_links + missed) if true_links + missed else 1.0
+    print(f'{label:<8} {count:>7} reports  {elapsed:7.2f} s  {count / elapsed:>9.0f} reports/s  '
+          f'precision {precision:.3f}  recall {recall:.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reports', type=int, default=100000)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--naive', type=int, default=5000, help='Reports to replay through a linear scan (0 to skip)')
+    parser.add_argument('--radius', type=float, default=500, help='Match radius in metres')
+    parser.add_argument('--window', type=int, default=6 * 3600, help='Match window in seconds')
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    reports = synthetic_reports(args.reports, args.events, args.seed)
+    summary('grid', len(reports), replay(IncidentDeduplicator(args.radius, args.window, args.threshold), reports))
+    if args.naive:
+        prefix = reports[:args.naive]
+        summary('grid', len(prefix), replay(IncidentDeduplicator(args.radius, args.window, args.threshold), prefix))
+        summary('linear', len(prefix), replay(LinearScan(args.radius, args.window, args.threshold), prefix))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Compare list response encoders on synthetic documents (no database needed).
+
+    python benchmarks/json_encoding.py [--docs 2000] [--repeat 20]
+
+Each case starts from the BSON bytes a cursor batch would hand to pymongo, so the
+decode cost is included alongside encoding. The RawBSONDocument case decodes lazily in
+pure Python and ends up slower than decoding to dicts, which is why list endpoints
+decode batches normally.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fast_json import StdlibEncoder, make_public, orjson, OrjsonEncoder, public_document  # noqa: E402
+
+RAW_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+
+def make_documents(count):
+    now = datetime(2024, 6, 1)
+    return [{
+        '_id': ObjectId(),
+        'title': f'Flood warning {i}',
+        'description': 'River levels are rising above the warning threshold. ' * 3,
+        'severity': ('low', 'medium', 'high', 'critical')[i % 4],
+        'status': 'active',
+        'location': 'Riverside District',
+        'coordinates': {'lat': 12.9 + i * 1e-4, 'lng': 77.5 + i * 1e-4},
+        'tags': ['flood', 'river', 'evacuation'],
+        'createdAt': (now + timedelta(minutes=i)).isoformat() + 'Z',
+        'updatedAt': (now + timedelta(minutes=i)).isoformat() + 'Z',
+        'syncedAt': now + timedelta(minutes=i),
+    } for i in range(count)]
+
+
+def legacy(batch, provider):
+    """serialize_doc() in place, then Flask's default jsonify encoder"""
+    docs = bson.decode_all(batch)
+    for doc in docs:
+        doc['id'] = str(doc.pop('_id'))
+        doc.pop('syncedAt', None)
+    return provider.dumps(docs).encode('utf-8')
+
+
+def fast(encoder):
+    def run(batch, _provider):
+        return encoder.dumps([make_public(doc) for doc in bson.decode_all(batch)])
+    return run
+
+
+def fast_raw(encoder):
+    def run(batch, _provider):
+        return encoder.dumps([public_document(doc) for doc in bson.decode_all(batch, RAW_OPTIONS)])
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    batch = b''.join(bson.encode(doc) for doc in make_documents(args.docs))
+    provider = DefaultJSONProvider(Flask(__name__))
+    cases = [('serialize_doc + jsonify', legacy), ('stdlib json', fast(StdlibEncoder()))]
+    if orjson is not None:
+        cases += [('orjson', fast(OrjsonEncoder())), ('orjson from RawBSONDocument', fast_raw(OrjsonEncoder()))]
+    else:
+        print('orjson is not installed, skipping the orjson cases')
+
+    print(f'{args.docs} documents, best of {args.repeat} runs')
+    # Cases take turns within each round so load on the machine affects them alike
+    best = [float('inf')] * len(cases)
+    sizes = [0] * len(cases)
+    for _ in range(args.repeat):
+        for i, (_label, run) in enumerate(cases):
+            start = time.perf_counter()
+            body = run(batch, provider)
+            best[i] = min(best[i], time.perf_counter() - start)
+            sizes[i] = len(body)
+    for (label, _run), elapsed, size in zip(cases, best, sizes):
+        print(f'  {label:<30} {elapsed * 1000:8.2f} ms  {best[0] / elapsed:5.1f}x  {size / 1024:8.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Hammer the reserve/release operations from a thread pool and check the ledger.
+
+    MONGO_URI=mongodb://localhost:27017/ python benchmarks/resource_reservations.py [--threads 32] [--operations 5000]
+
+Works on a scratch database (default disaster_management_bench, dropped afterwards).
+Every thread reserves and releases random amounts of one resource; at the end the
+available count must equal the quantity minus the net reservations in the ledger,
+and it must never have gone below zero or above the quantity.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from allocations import AllocationConflict, release, reserve  # noqa: E402
+
+
+def worker(resources, ledger, resource_id, operations, seed):
+    rng = random.Random(seed)
+    succeeded = conflicts = 0
+    for _ in range(operations):
+        operation = reserve if rng.random() < 0.55 else release
+        try:
+            operation(resources, ledger, resource_id, {'quantity': rng.randint(1, 3), 'by': f'bench-{seed}'})
+            succeeded += 1
+        except AllocationConflict:
+            conflicts += 1
+    return succeeded, conflicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--operations', type=int, default=5000, help='Total operations across all threads')
+    parser.add_argument('--quantity', type=int, default=50)
+    parser.add_argument('--database', default='disaster_management_bench')
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'), maxPoolSize=args.threads)
+    db = client[args.database]
+    resources, ledger = db['resources'], db['resource_allocations']
+    resource_id = resources.insert_one(
+        {'name': 'Bench ambulances', 'quantity': args.quantity, 'available': args.quantity}
+    ).inserted_id
+
+    per_thread = args.operations // args.threads
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(
+            lambda seed: worker(resources, ledger, resource_id, per_thread, seed), range(args.threads)
+        ))
+    elapsed = time.perf_counter() - start
+
+    succeeded = sum(ok for ok, _ in results)
+    conflicts = sum(rejected for _, rejected in results)
+    available = resources.find_one({'_id': resource_id})['available']
+    net_reserved = 0
+    for entry in ledger.find({'resourceId': resource_id}):
+        net_reserved += entry['quantity'] if entry['action'] == 'reserve' else -entry['quantity']
+        assert 0 <= entry['availableAfter'] <= args.quantity, entry
+    ledger_entries = ledger.count_documents({'resourceId': resource_id})
+
+    print(f'{args.threads} threads, {per_thread * args.threads} operations in {elapsed:.2f} s '
+          f'({per_thread * args.threads / elapsed:,.0f} ops/s)')
+    print(f'  {succeeded} applied, {conflicts} rejected by the guard, {ledger_entries} ledger entries')
+    print(f'  available {available} of {args.quantity}, ledger net reservations {net_reserved}')
+    assert ledger_entries == succeeded, 'every applied operation must have exactly one ledger entry'
+    assert available == args.quantity - net_reserved, 'available count drifted from the ledger'
+    assert 0 <= available <= args.quantity
+    print('✓ Ledger and available count agree')
+
+    client.drop_database(args.database)
+
+
+if __name__ == '__main__':
+    main()
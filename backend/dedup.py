@@ -0,0 +1,221 @@
+import math
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+
+# Words that say nothing about what happened
+STOPWORDS = {'the', 'and', 'for', 'near', 'with', 'from', 'into', 'onto', 'at', 'in', 'on', 'of', 'a', 'an', 'is'}
+# Added to the title overlap when the incident types match: with the default 0.5
+# threshold, same-type reports still need 35% of their title words in common
+TYPE_MATCH_BONUS = 0.15
+
+
+def title_tokens(text):
+    return frozenset(word for word in re.findall(r'[a-z0-9]+', (text or '').lower())
+                     if len(word) > 2 and word not in STOPWORDS)
+
+
+def normalize_type(value):
+    return ' '.join(str(value or '').lower().split())
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def similarity(tokens, incident_type, other_tokens, other_type):
+    """Title word overlap (Jaccard) plus TYPE_MATCH_BONUS when the types match; 0 without a shared word"""
+    score = jaccard(tokens, other_tokens)
+    if score and incident_type and incident_type == other_type:
+        score = min(1.0, score + TYPE_MATCH_BONUS)
+    return score
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Haversine distance in metres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def epoch_seconds(value):
+    """Seconds since the epoch for a (naive UTC) datetime or a number"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class Report:
+    """What the deduplicator keeps about an incident"""
+
+    __slots__ = ('incident_id', 'lat', 'lng', 'at', 'type', 'tokens', 'cell')
+
+    def __init__(self, incident_id, lat, lng, at, incident_type, tokens, cell):
+        self.incident_id = incident_id
+        self.lat = lat
+        self.lng = lng
+        self.at = at
+        self.type = incident_type
+        self.tokens = tokens
+        self.cell = cell
+
+
+class IncidentDeduplicator:
+    """
+    In-memory spatio-temporal index of recent open incidents.
+    Incidents are bucketed into a lat/lng grid whose cells are about `radius_m` wide,
+    so a lookup only compares a report with the incidents in the surrounding cells.
+    Entries older than `window` seconds are evicted in insertion order.
+    A report duplicates an indexed incident when it lies within `radius_m`, within
+    `window` seconds, and its similarity reaches `threshold`. Similarity is the title
+    word overlap (Jaccard) plus a small bonus when the types match, so a matching
+    type never outweighs the title: titles without a shared word are never duplicates.
+    """
+
+    def __init__(self, radius_m=500, window=6 * 3600, threshold=0.5):
+        self.radius_m = radius_m
+        self.window = window
+        self.threshold = threshold
+        self.cell_degrees = radius_m / METERS_PER_DEGREE
+        self._cells = {}
+        self._entries = {}
+        self._order = deque()
+        self._lock = threading.Lock()
+
+    def _cell(self, lat, lng):
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lng / self.cell_degrees))
+
+    def _neighbour_cells(self, lat, lng):
+        row, column = self._cell(lat, lng)
+        # Longitude degrees shrink with latitude, so more columns can fall within the radius
+        span = int(math.ceil(1 / max(math.cos(math.radians(min(abs(lat) + self.cell_degrees, 90))), 1e-6)))
+        for d_row in (-1, 0, 1):
+            for d_column in range(-span, span + 1):
+                yield row + d_row, column + d_column
+
+    def _evict(self, now):
+        horizon = now - self.window
+        while self._order and self._order[0][0] < horizon:
+            at, incident_id = self._order.popleft()
+            entry = self._entries.get(incident_id)
+            if entry is not None and entry.at == at:
+                self._remove(entry)
+
+    def _remove(self, entry):
+        del self._entries[entry.incident_id]
+        bucket = self._cells.get(entry.cell)
+        if bucket is not None:
+            bucket.discard(entry)
+            if not bucket:
+                del self._cells[entry.cell]
+
+    def add(self, incident_id, lat, lng, at, incident_type=None, title=None):
+        at = epoch_seconds(at)
+        with self._lock:
+            previous = self._entries.get(incident_id)
+            if previous is not None:
+                self._remove(previous)
+            entry = Report(incident_id, lat, lng, at, normalize_type(incident_type), title_tokens(title),
+                           self._cell(lat, lng))
+            self._entries[incident_id] = entry
+            self._cells.setdefault(entry.cell, set()).add(entry)
+            self._order.append((at, incident_id))
+            self._evict(at)
+
+    def forget(self, incident_id):
+        with self._lock:
+            entry = self._entries.get(incident_id)
+            if entry is not None:
+                self._remove(entry)
+
+    def find(self, lat, lng, at, incident_type=None, title=None):
+        """Best matching indexed incident as (incident id, distance m, similarity), or None"""
+        at = epoch_seconds(at)
+        report_type = normalize_type(incident_type)
+        tokens = title_tokens(title)
+        best = None
+        with self._lock:
+            self._evict(at)
+            for cell in self._neighbour_cells(lat, lng):
+                for entry in self._cells.get(cell, ()):
+                    if abs(entry.at - at) > self.window:
+                        continue
+                    distance = distance_m(lat, lng, entry.lat, entry.lng)
+                    if distance > self.radius_m:
+                        continue
+                    score = similarity(tokens, report_type, entry.tokens, entry.type)
+                    if not score or score < self.threshold:
+                        continue
+                    key = (score, -distance)
+                    if best is None or key > best[0]:
+                        best = (key, entry.incident_id, distance, score)
+        if best is None:
+            return None
+        return best[1], best[2], best[3]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {'indexed': len(self._entries), 'cells': len(self._cells),
+                    'radiusMeters': self.radius_m, 'windowSeconds': self.window}
+
+
+class IncidentIndexSync:
+    """
+    Keeps a deduplicator fed with incidents created by every server process.
+    At most once per `refresh_interval` seconds it reads the open incidents created
+    since the last refresh (a createdAt range served by its index), so reports filed
+    through other workers are matched as well.
+    """
+
+    # Re-read this much before the last refresh to cover clock skew between workers
+    OVERLAP = timedelta(seconds=30)
+
+    def __init__(self, collection, deduplicator, refresh_interval=5):
+        self.collection = collection
+        self.deduplicator = deduplicator
+        self.refresh_interval = refresh_interval
+        self._since = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def index(self, incident):
+        """Add an incident document (with a GeoJSON 'geo' point) to the deduplicator"""
+        geo = incident.get('geo')
+        created = incident.get('createdAt')
+        if not geo or not isinstance(created, datetime) or incident.get('status') == 'resolved':
+            return
+        lng, lat = geo['coordinates']
+        self.deduplicator.add(str(incident['_id']), lat, lng, created, incident.get('type'), incident.get('title'))
+
+    def refresh(self, now=None):
+        if time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            now = now or datetime.utcnow()
+            since = self._since - self.OVERLAP if self._since else now - timedelta(seconds=self.deduplicator.window)
+            query = {
+                'createdAt': {'$gte': since},
+                'status': {'$ne': 'resolved'},
+                'geo': {'$exists': True},
+                'duplicateOf': {'$exists': False},
+            }
+            projection = {'geo': 1, 'createdAt': 1, 'type': 1, 'title': 1, 'status': 1}
+            for incident in self.collection.find(query, projection).sort('createdAt', 1):
+                self.index(incident)
+            self._since = now
+            self._checked_at = time.monotonic()
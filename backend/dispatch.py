@@ -0,0 +1,148 @@
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # Optional, the NumPy solver below is used instead
+    linear_sum_assignment = None
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Incidents are free text typed; keywords map them to the team types best suited to respond
+TEAM_TYPE_KEYWORDS = {
+    'fire': ('fire', 'industrial', 'explosion', 'gas', 'chemical'),
+    'medical': ('medical', 'health', 'epidemic', 'accident', 'injur'),
+    'rescue': ('rescue', 'natural', 'flood', 'earthquake', 'structural', 'collapse', 'landslide', 'cyclone', 'accident'),
+    'police': ('police', 'security', 'crime', 'riot', 'terror'),
+    'evacuation': ('evacuat',),
+}
+SEVERITY_WEIGHTS = {'critical': 4.0, 'high': 3.0, 'medium': 2.0, 'low': 1.0}
+# Cost multiplier when a team's type is not one suited to the incident
+TYPE_MISMATCH_PENALTY = 2.0
+# Stand-in cost for pairs beyond the distance limit, dropped from the final plan
+INFEASIBLE_COST = 1e12
+
+
+def haversine_matrix(lat1, lng1, lat2, lng2):
+    """Great-circle distances in km between every point of set 1 (rows) and set 2 (columns)"""
+    lat1, lng1 = np.radians(lat1)[:, None], np.radians(lng1)[:, None]
+    lat2, lng2 = np.radians(lat2)[None, :], np.radians(lng2)[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def suited_team_types(incident_type):
+    """Team types suited to an incident type (empty when nothing matches)"""
+    text = (incident_type or '').lower()
+    return {team_type for team_type, keywords in TEAM_TYPE_KEYWORDS.items()
+            if any(keyword in text for keyword in keywords)}
+
+
+def type_match_matrix(team_types, incident_types):
+    """Boolean (teams x incidents) matrix of team types suited to each incident"""
+    # Compared like the incident text in suited_team_types(); teams without a type suit nothing
+    team_types = [(t or '').lower() for t in team_types]
+    categories = sorted(set(team_types) | set(TEAM_TYPE_KEYWORDS))
+    index = {name: i for i, name in enumerate(categories)}
+    suited = np.zeros((len(categories), len(incident_types)), dtype=bool)
+    for column, incident_type in enumerate(incident_types):
+        for team_type in suited_team_types(incident_type):
+            suited[index[team_type], column] = True
+    return suited[[index[t] for t in team_types], :]
+
+
+def _hungarian(cost):
+    """
+    Minimum cost assignment of every row to a distinct column for a (n x m) matrix
+    with n <= m (shortest augmenting path with potentials, O(n^2 m)). The inner
+    column scans are vectorized, so the Python loop runs O(n^2) times.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.int64)   # 1-based row assigned to each column, 0 = free
+    way = np.zeros(m + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        owner[0] = row
+        column = 0
+        min_slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current_row = owner[column]
+            free = ~used[1:]
+            slack = cost[current_row - 1] - u[current_row] - v[1:]
+            improved = free & (slack < min_slack[1:])
+            min_slack[1:][improved] = slack[improved]
+            way[1:][improved] = column
+            candidates = np.where(free, min_slack[1:], np.inf)
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+            used_columns = np.flatnonzero(used)
+            u[owner[used_columns]] += delta
+            v[used_columns] -= delta
+            min_slack[1:][free] -= delta
+            column = next_column
+            if owner[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+    columns = np.flatnonzero(owner[1:])
+    return owner[1:][columns] - 1, columns
+
+
+def solve_assignment(cost):
+    """Return (row indices, column indices) of a minimum cost assignment"""
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+    if cost.shape[0] <= cost.shape[1]:
+        rows, columns = _hungarian(cost)
+    else:
+        columns, rows = _hungarian(cost.T)
+    order = np.argsort(rows)
+    return rows[order], columns[order]
+
+
+def solver_name():
+    return 'scipy' if linear_sum_assignment is not None else 'numpy'
+
+
+def plan_dispatch(teams, incidents, max_distance_km=None):
+    """
+    Assign available teams to open incidents, one team per incident.
+    `teams` and `incidents` are documents with a GeoJSON `geo` point. The cost of
+    a pair is its distance divided by the incident's severity weight, multiplied by
+    TYPE_MISMATCH_PENALTY when the team type does not suit the incident, so scarce
+    teams go to the most severe incidents they can reach and suit. Pairs further
+    apart than `max_distance_km` are never assigned.
+    Returns (assignments, unassigned incident indices, idle team indices) where each
+    assignment is (team index, incident index, distance km, type match).
+    """
+    if not teams or not incidents:
+        return [], list(range(len(incidents))), list(range(len(teams)))
+
+    team_points = np.array([team['geo']['coordinates'] for team in teams], dtype=float)
+    incident_points = np.array([incident['geo']['coordinates'] for incident in incidents], dtype=float)
+    distances = haversine_matrix(team_points[:, 1], team_points[:, 0], incident_points[:, 1], incident_points[:, 0])
+
+    severity = np.array([SEVERITY_WEIGHTS.get(incident.get('severity'), 1.0) for incident in incidents])
+    matches = type_match_matrix([team.get('type') for team in teams], [incident.get('type') for incident in incidents])
+    # Incidents no team type is suited to do not penalise any team
+    unmatched_incidents = ~matches.any(axis=0)
+    penalty = np.where(matches | unmatched_incidents[None, :], 1.0, TYPE_MISMATCH_PENALTY)
+    cost = distances * penalty / severity[None, :]
+    if max_distance_km is not None:
+        cost = np.where(distances <= max_distance_km, cost, INFEASIBLE_COST)
+
+    rows, columns = solve_assignment(cost)
+    assignments = [
+        (int(row), int(column), float(distances[row, column]), bool(matches[row, column]))
+        for row, column in zip(rows, columns)
+        if cost[row, column] < INFEASIBLE_COST
+    ]
+    assigned_teams = {team for team, _, _, _ in assignments}
+    assigned_incidents = {incident for _, incident, _, _ in assignments}
+    unassigned = [i for i in range(len(incidents)) if i not in assigned_incidents]
+    idle = [i for i in range(len(teams)) if i not in assigned_teams]
+    return assignments, unassigned, idle
@@ -0,0 +1,273 @@
+import heapq
+import re
+import threading
+import time
+from collections import namedtuple
+
+# Average speed used to estimate travel time for routes without a parseable estimatedTime
+DEFAULT_SPEED_KMH = 20.0
+
+Edge = namedtuple('Edge', 'source target plan_id route_id name distance_km minutes status')
+
+_NUMBER = r'(\d+(?:\.\d+)?)'
+
+
+def node_key(name):
+    """Graph node for a place name: case-insensitive with collapsed whitespace"""
+    return ' '.join(str(name).lower().split())
+
+
+def parse_distance(value):
+    """'8.5 km' / '800 m' / 8.5 -> kilometres (None when unknown)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = re.search(_NUMBER + r'\s*(km|kilometers?|kilometres?|m|meters?|metres?|mi|miles?)?\b', str(value or '').lower())
+    if not match:
+        return None
+    amount, unit = float(match.group(1)), match.group(2) or 'km'
+    if unit.startswith('mi'):
+        return amount * 1.609344
+    if unit.startswith('m'):
+        return amount / 1000
+    return amount
+
+
+def parse_duration(value):
+    """'25 minutes' / '1 hour 10 min' / '1.5 h' / 25 -> minutes (None when unknown)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value or '').lower()
+    hours = re.search(_NUMBER + r'\s*(?:h|hrs?|hours?)\b', text)
+    minutes = re.search(_NUMBER + r'\s*(?:m|mins?|minutes?)\b', text)
+    if not hours and not minutes:
+        bare = re.fullmatch(r'\s*' + _NUMBER + r'\s*', text)
+        return float(bare.group(1)) if bare else None
+    return (float(hours.group(1)) * 60 if hours else 0.0) + (float(minutes.group(1)) if minutes else 0.0)
+
+
+def plan_edges(plan):
+    """Edges for the routes of an evacuation plan (both directions unless the route is oneWay)"""
+    if plan.get('status') == 'inactive':
+        return []
+    plan_id = str(plan['_id'])
+    edges = []
+    for index, route in enumerate(plan.get('routes') or []):
+        if not isinstance(route, dict) or not route.get('from') or not route.get('to'):
+            continue
+        distance = parse_distance(route.get('distance'))
+        minutes = parse_duration(route.get('estimatedTime'))
+        if minutes is None and distance is not None:
+            minutes = distance / DEFAULT_SPEED_KMH * 60
+        if distance is None and minutes is not None:
+            distance = minutes / 60 * DEFAULT_SPEED_KMH
+        route_id = str(route.get('id') or index)
+        status = route.get('status', 'clear')
+        ends = [(route['from'], route['to'])]
+        if not route.get('oneWay'):
+            ends.append((route['to'], route['from']))
+        for source, target in ends:
+            edges.append(Edge(source, target, plan_id, route_id, route.get('name'),
+                              distance if distance is not None else 1.0,
+                              minutes if minutes is not None else 1.0, status))
+    return edges
+
+
+class RouteGraph:
+    """
+    Weighted graph of evacuation routes. Adjacency lists are replaced copy-on-write,
+    so queries read a consistent snapshot without locking while updates for one plan
+    only rebuild the lists of the nodes that plan touches. Places are counted while
+    routes lead into them, so a place left without any route is dropped again.
+    """
+
+    def __init__(self, congestion_penalty=3.0):
+        self.congestion_penalty = congestion_penalty
+        self._lock = threading.Lock()
+        self._plans = {}
+        self._adjacency = {}
+        self._names = {}
+        self._incoming = {}
+
+    def load(self, plans):
+        """Replace the whole graph with the routes of `plans`"""
+        plan_edges_by_id = {str(plan['_id']): plan_edges(plan) for plan in plans}
+        adjacency, names, incoming = {}, {}, {}
+        for edges in plan_edges_by_id.values():
+            for edge in edges:
+                target = node_key(edge.target)
+                adjacency.setdefault(node_key(edge.source), []).append(edge)
+                adjacency.setdefault(target, [])
+                incoming[target] = incoming.get(target, 0) + 1
+                names.setdefault(node_key(edge.source), edge.source)
+                names.setdefault(target, edge.target)
+        with self._lock:
+            self._plans = plan_edges_by_id
+            self._adjacency = {node: tuple(edges) for node, edges in adjacency.items()}
+            self._names = names
+            self._incoming = incoming
+
+    def update_plan(self, plan):
+        """Re-read the routes of one plan (created or updated)"""
+        self._replace(str(plan['_id']), plan_edges(plan))
+
+    def remove_plan(self, plan_id):
+        self._replace(str(plan_id), [])
+
+    def _replace(self, plan_id, edges):
+        with self._lock:
+            old_edges = self._plans.get(plan_id, [])
+            affected = {node_key(edge.source) for edge in old_edges} | {node_key(edge.source) for edge in edges}
+            adjacency = dict(self._adjacency)
+            names = dict(self._names)
+            incoming = dict(self._incoming)
+            for node in affected:
+                kept = [edge for edge in adjacency.get(node, ()) if edge.plan_id != plan_id]
+                adjacency[node] = tuple(kept + [edge for edge in edges if node_key(edge.source) == node])
+            for edge in old_edges:
+                incoming[node_key(edge.target)] -= 1
+            for edge in edges:
+                target = node_key(edge.target)
+                adjacency.setdefault(target, ())
+                incoming[target] = incoming.get(target, 0) + 1
+                names.setdefault(node_key(edge.source), edge.source)
+                names.setdefault(target, edge.target)
+            # Drop the places the old routes leave without any route in or out
+            for node in affected | {node_key(edge.target) for edge in old_edges}:
+                if not adjacency.get(node) and not incoming.get(node):
+                    adjacency.pop(node, None)
+                    names.pop(node, None)
+                    incoming.pop(node, None)
+            plans = dict(self._plans)
+            if edges:
+                plans[plan_id] = edges
+            else:
+                plans.pop(plan_id, None)
+            self._plans, self._adjacency, self._names, self._incoming = plans, adjacency, names, incoming
+
+    def _cost(self, edge, by):
+        if edge.status == 'blocked':
+            return None
+        cost = edge.distance_km if by == 'distance' else edge.minutes
+        return cost * self.congestion_penalty if edge.status == 'congested' else cost
+
+    def shortest_path(self, source, target, by='time'):
+        """
+        Dijkstra over open routes: blocked routes are skipped and congested ones cost
+        `congestion_penalty` times more. `by` is 'time' or 'distance'.
+        Returns a list of edges, or None when no open path exists; raises LookupError
+        for unknown places.
+        """
+        adjacency, names = self._adjacency, self._names
+        start, goal = node_key(source), node_key(target)
+        for place, key in ((source, start), (target, goal)):
+            if key not in adjacency:
+                raise LookupError(f'Unknown place: {place}')
+        if start == goal:
+            return []
+
+        best = {start: 0.0}
+        previous = {}
+        queue = [(0.0, 0, start)]
+        counter = 1
+        while queue:
+            cost, _, node = heapq.heappop(queue)
+            if node == goal:
+                break
+            if cost > best.get(node, float('inf')):
+                continue
+            for edge in adjacency.get(node, ()):
+                step = self._cost(edge, by)
+                if step is None:
+                    continue
+                neighbour = node_key(edge.target)
+                candidate = cost + step
+                if candidate < best.get(neighbour, float('inf')):
+                    best[neighbour] = candidate
+                    previous[neighbour] = edge
+                    heapq.heappush(queue, (candidate, counter, neighbour))
+                    counter += 1
+        if goal not in previous:
+            return None
+
+        path = []
+        node = goal
+        while node != start:
+            edge = previous[node]
+            path.append(edge)
+            node = node_key(edge.source)
+        path.reverse()
+        return path
+
+    def stats(self):
+        adjacency = self._adjacency
+        return {'places': len(adjacency), 'routes': sum(len(edges) for edges in adjacency.values()),
+                'plans': len(self._plans)}
+
+
+class EvacuationNetwork:
+    """
+    Keeps a RouteGraph in sync with the evacuation plans collection.
+    Writes made by this process are applied incrementally. Writes from other workers
+    are noticed through the collection's version counter, checked at most once every
+    `refresh_interval` seconds, so route queries normally never touch the database.
+    """
+
+    def __init__(self, collection, versions, refresh_interval=5, congestion_penalty=3.0):
+        self.collection = collection
+        self.versions = versions
+        self.refresh_interval = refresh_interval
+        self.graph = RouteGraph(congestion_penalty)
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+
+    def _load(self):
+        version = self.versions.current(self.collection.name)
+        self.graph.load(self.collection.find({}, {'routes': 1, 'status': 1}))
+        self._version = version
+        self._checked_at = time.monotonic()
+
+    def current(self):
+        """The route graph, reloaded first if it is missing or another worker changed the plans"""
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.refresh_interval:
+            return self.graph
+        with self._lock:
+            if self._version is None:
+                self._load()
+            elif time.monotonic() - self._checked_at >= self.refresh_interval:
+                if self.versions.current(self.collection.name) != self._version:
+                    self._load()
+                else:
+                    self._checked_at = time.monotonic()
+        return self.graph
+
+    def _applied_locally(self):
+        """Adopt the new version if our write was the only one since the graph was synced"""
+        if self._version is None:
+            return
+        epoch, version = self.versions.current(self.collection.name)
+        if (epoch, version) == (self._version[0], self._version[1] + 1):
+            self._version = (epoch, version)
+        else:
+            self.invalidate()
+
+    def plan_changed(self, plan):
+        """Call after a plan was created or updated (and its version bumped)"""
+        with self._lock:
+            if self._version is not None:
+                self.graph.update_plan(plan)
+            self._applied_locally()
+
+    def plan_removed(self, plan_id):
+        with self._lock:
+            if self._version is not None:
+                self.graph.remove_plan(plan_id)
+            self._applied_locally()
+
+    def invalidate(self):
+        """Force a full reload on the next query (e.g. after bulk writes)"""
+        self._version = None
+
+    def stats(self):
+        return {**self.graph.stats(), 'loaded': self._version is not None}
@@ -0,0 +1,179 @@
+import asyncio
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from pymongo.errors import OperationFailure, PyMongoError
+
+
+class Subscription:
+    """One SSE client: a bounded queue plus its collection/severity filters"""
+
+    def __init__(self, collections, severities, max_queue=100):
+        self.collections = set(collections)
+        self.severities = set(severities or ())
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def matches(self, event):
+        if event['collection'] not in self.collections:
+            return False
+        # Documents without a severity (e.g. messages) are not severity filtered
+        if self.severities and event['severity'] is not None:
+            return event['severity'] in self.severities
+        return True
+
+    def offer(self, event):
+        """Queue an event, dropping the oldest one if the client is falling behind"""
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
+class AsyncSubscription(Subscription):
+    """
+    Subscription read from an asyncio event loop. Events are handed over to the loop
+    with call_soon_threadsafe, so publishers on any thread never block on it and a
+    waiting client costs a coroutine instead of a thread.
+    """
+
+    def __init__(self, collections, severities, max_queue=100, loop=None):
+        super().__init__(collections, severities, max_queue)
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_queue)
+
+    def offer(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._offer, event)
+        except RuntimeError:
+            # The loop has shut down; the subscription is about to be dropped
+            pass
+
+    def _offer(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """Next event; raises asyncio.TimeoutError after `timeout` seconds without one"""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventBroker:
+    """
+    In-process fan-out of change events to SSE subscribers.
+    Events come from a single shared change stream watcher when the server supports
+    change streams (replica set / sharded cluster). On a standalone server the
+    request handlers publish their own writes instead ('local' mode, which only
+    reaches subscribers connected to the same process).
+    """
+
+    def __init__(self, db, collections, on_change, mode='auto', max_queue=100, context=None):
+        self.db = db
+        self.collections = list(collections)
+        self.on_change = on_change
+        # Called to get a context manager around on_change in the watcher thread (e.g. an app context)
+        self.context = context
+        self.requested_mode = mode
+        self.mode = 'pending'
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def subscribe(self, collections, severities=None):
+        return self.attach(Subscription(collections, severities, self.max_queue))
+
+    def attach(self, subscription):
+        """Start delivering events to an existing (e.g. AsyncSubscription) subscription"""
+        self.start()
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.matches(event):
+                subscription.offer(event)
+
+    @property
+    def publishes_locally(self):
+        """Whether request handlers should publish their own writes"""
+        return self.mode == 'local'
+
+    def start(self):
+        """Pick the event source once; opens the shared change stream if available"""
+        with self._lock:
+            if self.mode != 'pending':
+                return
+            if self.requested_mode == 'local':
+                self.mode = 'local'
+                return
+            try:
+                stream = self._open_stream()
+            except OperationFailure as e:
+                if self.requested_mode == 'changestream':
+                    raise
+                print(f"Change streams unavailable, publishing events in-process: {e}")
+                self.mode = 'local'
+                return
+            self.mode = 'changestream'
+            self._watcher = threading.Thread(target=self._watch, args=(stream,), daemon=True, name='change-stream')
+            self._watcher.start()
+
+    def _open_stream(self, resume_after=None):
+        pipeline = [{'$match': {
+            'ns.coll': {'$in': self.collections},
+            'operationType': {'$in': ['insert', 'update', 'replace']}
+        }}]
+        return self.db.watch(pipeline, full_document='updateLookup', resume_after=resume_after)
+
+    def _watch(self, stream):
+        resume_token = None
+        while True:
+            opening = stream is None
+            try:
+                if opening:
+                    stream = self._open_stream(resume_after=resume_token)
+                    opening = False
+                with stream:
+                    for change in stream:
+                        resume_token = change['_id']
+                        document = change.get('fullDocument')
+                        if document is not None:
+                            with self.context() if self.context else nullcontext():
+                                self.on_change(change['ns']['coll'], change['operationType'], document)
+            except PyMongoError as e:
+                print(f"Change stream interrupted, resuming: {e}")
+                if opening:
+                    # The resume point may have rolled off the oplog; start from now
+                    resume_token = None
+            except Exception as e:
+                print(f"Change event handling failed: {e}")
+            stream = None
+            time.sleep(1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'subscribers': len(self._subscribers),
+                'dropped': sum(subscription.dropped for subscription in self._subscribers),
+            }
@@ -0,0 +1,123 @@
+import json
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from flask.json.provider import JSONProvider
+from sync import WATERMARK_FIELD
+
+try:
+    import orjson
+except ImportError:  # Optional, the stdlib encoder is used instead
+    orjson = None
+
+# Fields never sent to clients (clients use the /api/sync token instead of the watermark)
+HIDDEN_FIELDS = (WATERMARK_FIELD,)
+
+
+def format_datetime(value):
+    """ISO 8601 in UTC with a 'Z' suffix; naive datetimes (as pymongo returns them) are UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat() + 'Z'
+
+
+def encode_default(obj):
+    """Encoder hook for the BSON types that show up in documents"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return format_datetime(obj)
+    if isinstance(obj, RawBSONDocument):
+        # Sub-documents of a RawBSONDocument stay raw until they are encoded
+        return dict(obj.items())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def public_document(doc):
+    """
+    Shallow copy of a document in its API shape: `_id` becomes a string `id` and hidden
+    fields are dropped. Nested values are left for the encoder to handle in the same
+    pass, so the document is only walked once.
+    """
+    out = {key: value for key, value in doc.items() if key != '_id' and key not in HIDDEN_FIELDS}
+    if '_id' in doc:
+        out['id'] = str(doc['_id'])
+    return out
+
+
+def make_public(doc):
+    """
+    public_document() in place, for documents fresh from a cursor that nothing else
+    holds on to: no copy is made, which keeps the stdlib encoder at least as fast as
+    the serialize_doc() + jsonify() path it replaces.
+    """
+    if '_id' in doc:
+        doc['id'] = str(doc.pop('_id'))
+    for field in HIDDEN_FIELDS:
+        doc.pop(field, None)
+    return doc
+
+
+class OrjsonEncoder:
+    name = 'orjson'
+    # Naive datetimes are UTC and get the same 'Z' suffix as format_datetime()
+    options = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, default=encode_default, option=self.options)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class StdlibEncoder:
+    name = 'json'
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(default=encode_default)
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+def create_encoder(kind='auto'):
+    """Pick the encoder: 'orjson', 'json' (stdlib) or 'auto' (orjson when installed)"""
+    if kind == 'orjson' or (kind == 'auto' and orjson is not None):
+        if orjson is None:
+            raise RuntimeError('The orjson package is required for JSON_ENCODER=orjson')
+        return OrjsonEncoder()
+    return StdlibEncoder()
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    Flask JSON provider backed by create_encoder(), so jsonify() and app.json share the
+    fast path. dumps_documents() encodes a list of MongoDB documents straight to bytes
+    without the serialize_doc() + jsonify() double walk. The documents are converted
+    to their API shape in place, so pass documents read for this response only.
+    """
+
+    mimetype = 'application/json'
+
+    def __init__(self, app, kind='auto'):
+        super().__init__(app)
+        self.encoder = create_encoder(kind)
+
+    def dumps(self, obj, **kwargs):
+        return self.encoder.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return self.encoder.loads(s)
+
+    def dumps_documents(self, docs):
+        return self.encoder.dumps([make_public(doc) for doc in docs])
+
+    def dumps_document(self, doc):
+        return self.encoder.dumps(make_public(doc))
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encoder.dumps(obj), mimetype=self.mimetype)
@@ -0,0 +1,92 @@
+import os
+
+# Field holding the GeoJSON point derived from {lat, lng} coordinates (2dsphere indexed)
+GEO_FIELD = 'geo'
+# Upper bound for ?limit= on nearest-neighbour queries
+MAX_NEAR_RESULTS = int(os.getenv('MAX_NEAR_RESULTS', 100))
+
+
+def point(lat, lng):
+    """GeoJSON point for a latitude/longitude pair (GeoJSON order is [lng, lat])"""
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        raise ValueError('lat and lng must be numbers')
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        raise ValueError('lat must be within [-90, 90] and lng within [-180, 180]')
+    return {'type': 'Point', 'coordinates': [lng, lat]}
+
+
+def with_geo_point(data):
+    """Mirror {lat, lng} coordinates into the GeoJSON point used by geospatial queries"""
+    coords = data.get('coordinates') if data else None
+    if isinstance(coords, dict) and coords.get('lat') is not None and coords.get('lng') is not None:
+        data[GEO_FIELD] = point(coords['lat'], coords['lng'])
+    return data
+
+
+def parse_point(args):
+    """Point from ?lat=&lng= (None when neither is given)"""
+    lat, lng = args.get('lat'), args.get('lng')
+    if lat is None and lng is None:
+        return None
+    return point(lat, lng)
+
+
+def parse_bounds(value):
+    """?bbox=minLng,minLat,maxLng,maxLat as a (min_lng, min_lat, max_lng, max_lat) tuple (None when absent)"""
+    if not value:
+        return None
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError('bbox must be minLng,minLat,maxLng,maxLat')
+    point(min_lat, min_lng)
+    point(max_lat, max_lng)
+    if min_lng >= max_lng or min_lat >= max_lat:
+        raise ValueError('bbox minimums must be smaller than its maximums')
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def parse_bbox(value):
+    """
+    Turn ?bbox=minLng,minLat,maxLng,maxLat into a $geoWithin filter on the geo field.
+    The box is expressed as a GeoJSON polygon so the 2dsphere index can serve it.
+    """
+    bounds = parse_bounds(value)
+    if bounds is None:
+        return {}
+    min_lng, min_lat, max_lng, max_lat = bounds
+    ring = [[min_lng, min_lat], [max_lng, min_lat], [max_lng, max_lat], [min_lng, max_lat], [min_lng, min_lat]]
+    return {GEO_FIELD: {'$geoWithin': {'$geometry': {'type': 'Polygon', 'coordinates': [ring]}}}}
+
+
+def parse_radius(value):
+    """?radius= in kilometres, returned in metres (None means unbounded)"""
+    if value is None or value == '':
+        return None
+    try:
+        radius = float(value)
+    except ValueError:
+        raise ValueError('radius must be a number of kilometres')
+    if radius <= 0:
+        raise ValueError('radius must be positive')
+    return radius * 1000
+
+
+def near_pipeline(origin, query=None, max_distance=None, limit=20):
+    """
+    Aggregation returning documents closest to `origin`, nearest first, with their
+    distance in metres in a 'distance' field. $geoNear must be the first stage and
+    uses the 2dsphere index on the geo field; `query` is applied inside the index scan.
+    """
+    stage = {
+        'near': origin,
+        'key': GEO_FIELD,
+        'distanceField': 'distance',
+        'spherical': True,
+        'query': query or {},
+    }
+    if max_distance is not None:
+        stage['maxDistance'] = max_distance
+    return [{'$geoNear': stage}, {'$limit': limit}]
@@ -0,0 +1,34 @@
+"""
+gunicorn settings for `gunicorn -c gunicorn.conf.py wsgi:app`, overridable from the environment.
+Each worker is a separate process with its own MongoDB pool (MONGO_MAX_POOL_SIZE
+connections at most), so the cluster sees up to workers x pool size connections.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threaded workers: server-sent event streams hold a thread each while open
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+# The app is imported once in the master; MongoDB clients are only created in the workers
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+
+
+def on_starting(server):
+    """Provision indexes once from the master instead of from every worker"""
+    if os.getenv('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true':
+        from app import apply_indexes, mongo
+        try:
+            apply_indexes()
+        except Exception as e:
+            print(f"Index provisioning failed: {e}")
+        # Workers must not inherit the master's connections
+        mongo.close()
@@ -0,0 +1,245 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from geo import GEO_FIELD
+
+# Deepest map zoom served by /api/incidents/heatmap
+MAX_ZOOM = 20
+# Cells are tiles this many zoom levels below the requested zoom (3 -> 8x8 cells per tile)
+CELL_ZOOM_OFFSET = int(os.getenv('HEATMAP_CELL_ZOOM_OFFSET', 3))
+# Upper bound for the number of tiles one request may cover
+MAX_HEATMAP_TILES = int(os.getenv('MAX_HEATMAP_TILES', 64))
+# Web Mercator stops at this latitude; points further north or south land in the edge tiles
+MAX_LATITUDE = 85.05112878
+# Spacing of the extra vertices that keep geodesic polygon edges close to parallels
+EDGE_STEP_DEGREES = 1.0
+# Margin added around the prefilter polygon; covers the remaining bow of its 1 degree edges
+EDGE_MARGIN_DEGREES = 0.01
+
+
+def parse_zoom(value):
+    if value is None or value == '':
+        raise ValueError('zoom is required')
+    try:
+        zoom = int(value)
+    except ValueError:
+        raise ValueError('zoom must be an integer')
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError(f'zoom must be within [0, {MAX_ZOOM}]')
+    return zoom
+
+
+def tile_xy(lng, lat, zoom):
+    """Web Mercator (slippy map) tile containing a point"""
+    n = 1 << zoom
+    lat = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, lat)))
+    x = int(math.floor((lng + 180) / 360 * n))
+    y = int(math.floor((1 - math.log(math.tan(lat) + 1 / math.cos(lat)) / math.pi) / 2 * n))
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(x, y, zoom):
+    """(min_lng, min_lat, max_lng, max_lat) of a tile"""
+    n = 1 << zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, latitude(y + 1), (x + 1) / n * 360 - 180, latitude(y)
+
+
+def quadkey(x, y, zoom):
+    """Bing-style quadkey of a tile: one base-4 digit per zoom level"""
+    digits = []
+    for level in range(zoom, 0, -1):
+        mask = 1 << (level - 1)
+        digits.append(str((1 if x & mask else 0) + (2 if y & mask else 0)))
+    return ''.join(digits)
+
+
+def tile_range(bounds, zoom):
+    """Inclusive (x0, y0, x1, y1) range of the tiles covering a bounding box"""
+    min_lng, min_lat, max_lng, max_lat = bounds
+    x0, y0 = tile_xy(min_lng, max_lat, zoom)
+    x1, y1 = tile_xy(max_lng, min_lat, zoom)
+    return x0, y0, x1, y1
+
+
+def tiles_in_range(tiles):
+    x0, y0, x1, y1 = tiles
+    return [(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+
+def _geo_filter(tiles, zoom):
+    """
+    $geoWithin filter covering a tile range, or None when the range is too large for
+    a GeoJSON polygon (MongoDB polygons must fit in a hemisphere). Horizontal edges
+    get extra vertices because polygon edges are geodesics, not parallels; the exact
+    tile range is applied after binning anyway.
+    """
+    x0, y0, x1, y1 = tiles
+    min_lng, min_lat = tile_bounds(x0, y1, zoom)[:2]
+    max_lng, max_lat = tile_bounds(x1, y0, zoom)[2:]
+    if max_lng - min_lng >= 180 or max_lat - min_lat >= 90:
+        return None
+    min_lng, max_lng = max(-180.0, min_lng - EDGE_MARGIN_DEGREES), min(180.0, max_lng + EDGE_MARGIN_DEGREES)
+    min_lat, max_lat = max(-90.0, min_lat - EDGE_MARGIN_DEGREES), min(90.0, max_lat + EDGE_MARGIN_DEGREES)
+    steps = max(1, int(math.ceil((max_lng - min_lng) / EDGE_STEP_DEGREES)))
+    bottom = [[min_lng + (max_lng - min_lng) * i / steps, min_lat] for i in range(steps + 1)]
+    top = [[max_lng - (max_lng - min_lng) * i / steps, max_lat] for i in range(steps + 1)]
+    ring = bottom + top + [[min_lng, min_lat]]
+    return {GEO_FIELD: {'$geoWithin': {'$geometry': {'type': 'Polygon', 'coordinates': [ring]}}}}
+
+
+def heatmap_pipeline(tiles, zoom, cell_zoom, match):
+    """
+    Count the documents matching `match` in every cell (tile at `cell_zoom`) of a tile
+    range at `zoom`. Cell coordinates are computed server side with the Web Mercator
+    formulas, so only one document per non-empty cell comes back.
+    """
+    n = 1 << cell_zoom
+    scale = 1 << (cell_zoom - zoom)
+    x0, y0, x1, y1 = tiles
+    lat_radians = {'$degreesToRadians': '$lat'}
+    mercator_y = {'$ln': {'$add': [{'$tan': lat_radians}, {'$divide': [1, {'$cos': lat_radians}]}]}}
+    geo_filter = _geo_filter(tiles, zoom) or {GEO_FIELD: {'$exists': True}}
+    return [
+        {'$match': {**match, **geo_filter}},
+        {'$project': {
+            '_id': 0,
+            'lng': {'$arrayElemAt': [f'${GEO_FIELD}.coordinates', 0]},
+            'lat': {'$max': [-MAX_LATITUDE, {'$min': [MAX_LATITUDE, {'$arrayElemAt': [f'${GEO_FIELD}.coordinates', 1]}]}]},
+            'reports': {'$ifNull': ['$reportCount', 1]},
+        }},
+        {'$addFields': {
+            'x': {'$min': [n - 1, {'$max': [0, {'$floor': {'$multiply': [{'$divide': [{'$add': ['$lng', 180]}, 360]}, n]}}]}]},
+            'y': {'$min': [n - 1, {'$max': [0, {'$floor': {'$multiply': [
+                {'$divide': [{'$subtract': [1, {'$divide': [mercator_y, math.pi]}]}, 2]}, n
+            ]}}]}]},
+        }},
+        {'$match': {'x': {'$gte': x0 * scale, '$lt': (x1 + 1) * scale},
+                    'y': {'$gte': y0 * scale, '$lt': (y1 + 1) * scale}}},
+        {'$group': {
+            '_id': {'x': '$x', 'y': '$y'},
+            'count': {'$sum': 1},
+            'reports': {'$sum': '$reports'},
+            'lat': {'$avg': '$lat'},
+            'lng': {'$avg': '$lng'},
+        }},
+    ]
+
+
+def cells_by_tile(groups, zoom, cell_zoom):
+    """Turn $group results into {(tile x, tile y): [cell, ...]}"""
+    shift = cell_zoom - zoom
+    tiles = {}
+    for group in groups:
+        x, y = int(group['_id']['x']), int(group['_id']['y'])
+        tiles.setdefault((x >> shift, y >> shift), []).append({
+            'quadkey': quadkey(x, y, cell_zoom),
+            'lat': round(group['lat'], 6),
+            'lng': round(group['lng'], 6),
+            'count': group['count'],
+            'reports': group['reports'],
+        })
+    return tiles
+
+
+class HeatmapTiles:
+    """
+    In-process LRU of heatmap cells per (zoom, tile, filters).
+    Writes made by this process evict just the tiles containing the changed points.
+    Writes from other workers are noticed through the collection's version counter,
+    checked at most once every `refresh_interval` seconds, and clear the whole cache.
+    A generation counter keeps results computed before an eviction out of the cache.
+    """
+
+    def __init__(self, versions, collection_name, max_tiles=4096, refresh_interval=5):
+        self.versions = versions
+        self.collection_name = collection_name
+        self.max_tiles = max_tiles
+        self.refresh_interval = refresh_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _clear(self):
+        self._entries.clear()
+        self._generation += 1
+
+    def _sync(self):
+        if self._version is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        version = self.versions.current(self.collection_name)
+        with self._lock:
+            if version != self._version:
+                self._clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def lookup(self, zoom, tiles, variant):
+        """Return ({tile: cells} for the cached tiles, generation to pass to store())"""
+        self._sync()
+        found = {}
+        with self._lock:
+            for tile in tiles:
+                key = (zoom, tile[0], tile[1], variant)
+                cells = self._entries.get(key)
+                if cells is not None:
+                    self._entries.move_to_end(key)
+                    found[tile] = cells
+            self.hits += len(found)
+            self.misses += len(tiles) - len(found)
+            return found, self._generation
+
+    def store(self, zoom, cells_for_tiles, variant, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            for (x, y), cells in cells_for_tiles.items():
+                self._entries[(zoom, x, y, variant)] = cells
+                self._entries.move_to_end((zoom, x, y, variant))
+            while len(self._entries) > self.max_tiles:
+                self._entries.popitem(last=False)
+
+    def points_changed(self, docs, bumps=1):
+        """
+        Call after this process wrote the given documents (before and/or after the
+        write) and bumped the collection version `bumps` times.
+        """
+        stale = set()
+        for doc in docs:
+            geo = (doc or {}).get(GEO_FIELD)
+            if not geo:
+                continue
+            lng, lat = geo['coordinates']
+            for zoom in range(MAX_ZOOM + 1):
+                stale.add((zoom,) + tile_xy(lng, lat, zoom))
+        version = self.versions.current(self.collection_name)
+        with self._lock:
+            if stale:
+                for key in [key for key in self._entries if key[:3] in stale]:
+                    del self._entries[key]
+                self._generation += 1
+            # Adopt the new version if our own writes were the only ones since the last sync
+            if self._version is not None and version == (self._version[0], self._version[1] + bumps):
+                self._version = version
+            else:
+                self._clear()
+                self._version = None
+
+    def invalidate(self):
+        """Drop every tile (e.g. after bulk writes)"""
+        with self._lock:
+            self._clear()
+            self._version = None
+
+    def stats(self):
+        with self._lock:
+            return {'tiles': len(self._entries), 'maxTiles': self.max_tiles, 'hits': self.hits, 'misses': self.misses}
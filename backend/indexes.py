@@ -0,0 +1,117 @@
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from sync import TOMBSTONE_RETENTION, WATERMARK_FIELD
+
+SYNC_WATERMARK = IndexModel([(WATERMARK_FIELD, ASCENDING)], name='syncedAt')
+
+
+def text_index(weights):
+    """Weighted text index; a collection can only have one"""
+    return IndexModel([(field, TEXT) for field in weights], name='text_search', weights=weights)
+
+# Declared indexes per collection. Each entry backs a query shape used by app.py:
+#  - users.username: login lookup
+#  - status/severity/type: list endpoint filters and analytics counts
+#  - messages.timestamp: newest-first listing, keyset pagination and ?from=/?to=
+#  - createdAt / lastUpdated: ?from=/?to= time range filters on list endpoints
+#  - geo: GeoJSON point derived from coordinates ($geoNear lookups and ?bbox=)
+#  - weather.fetchedAt: expires cached weather snapshots after a day
+#  - text_search: weighted full-text search (/api/search)
+#  - resource_allocations: per resource ledger, newest first
+#  - syncedAt / tombstones: delta sync watermark lookups (/api/sync)
+INDEXES = {
+    'users': [
+        IndexModel([('username', ASCENDING)], name='username_unique', unique=True),
+    ],
+    'alerts': [
+        IndexModel([('status', ASCENDING), ('severity', ASCENDING)], name='status_severity'),
+        IndexModel([('type', ASCENDING)], name='type'),
+        IndexModel([('createdAt', ASCENDING)], name='createdAt'),
+        text_index({'title': 10, 'location': 5, 'description': 2}),
+        SYNC_WATERMARK,
+    ],
+    'incidents': [
+        IndexModel([('status', ASCENDING), ('severity', ASCENDING)], name='status_severity'),
+        IndexModel([('type', ASCENDING)], name='type'),
+        IndexModel([('createdAt', ASCENDING)], name='createdAt'),
+        IndexModel([('geo', GEOSPHERE)], name='geo_2dsphere'),
+        text_index({'title': 10, 'type': 5, 'location': 5, 'description': 2}),
+        SYNC_WATERMARK,
+    ],
+    'resources': [
+        IndexModel([('status', ASCENDING), ('type', ASCENDING)], name='status_type'),
+        IndexModel([('lastUpdated', ASCENDING)], name='lastUpdated'),
+        IndexModel([('geo', GEOSPHERE)], name='geo_2dsphere'),
+        SYNC_WATERMARK,
+    ],
+    'teams': [
+        IndexModel([('status', ASCENDING), ('type', ASCENDING)], name='status_type'),
+        IndexModel([('geo', GEOSPHERE)], name='geo_2dsphere'),
+        SYNC_WATERMARK,
+    ],
+    'evacuation_plans': [
+        IndexModel([('status', ASCENDING)], name='status'),
+        IndexModel([('lastUpdated', ASCENDING)], name='lastUpdated'),
+    ],
+    'messages': [
+        IndexModel([('timestamp', DESCENDING), ('_id', DESCENDING)], name='timestamp_desc'),
+        text_index({'subject': 10, 'content': 3, 'from': 2}),
+        SYNC_WATERMARK,
+    ],
+    'resource_allocations': [
+        IndexModel([('resourceId', ASCENDING), ('at', DESCENDING), ('_id', DESCENDING)], name='resourceId_at'),
+    ],
+    'tombstones': [
+        IndexModel([('collection', ASCENDING), ('deletedAt', ASCENDING)], name='collection_deletedAt'),
+        IndexModel([('deletedAt', ASCENDING)], name='deletedAt_ttl',
+                   expireAfterSeconds=int(TOMBSTONE_RETENTION.total_seconds())),
+    ],
+    'weather': [
+        IndexModel([('fetchedAt', ASCENDING)], name='fetchedAt_ttl', expireAfterSeconds=86400),
+    ],
+}
+
+
+def ensure_indexes(db, registry=INDEXES):
+    """
+    Create every declared index. create_indexes is a no-op for indexes that
+    already exist with the same spec, so this is safe to run on every startup.
+    Returns a dict of {collection: [index names]} plus any errors.
+    """
+    created = {}
+    errors = {}
+    for collection_name, models in registry.items():
+        try:
+            created[collection_name] = db[collection_name].create_indexes(models)
+        except OperationFailure as e:
+            # Typically an existing index with the same name but different options
+            errors[collection_name] = str(e)
+    return {'created': created, 'errors': errors}
+
+
+def index_report(db, registry=INDEXES):
+    """
+    Compare declared indexes with what exists on the server.
+    For each collection reports indexes that are missing, present but not declared,
+    and present but never used since the server started (from $indexStats).
+    """
+    report = {}
+    for collection_name, models in registry.items():
+        collection = db[collection_name]
+        declared = [model.document['name'] for model in models]
+        existing = set(collection.index_information().keys())
+
+        usage = {}
+        try:
+            for stat in collection.aggregate([{'$indexStats': {}}]):
+                usage[stat['name']] = stat['accesses']['ops']
+        except OperationFailure:
+            # $indexStats needs clusterMonitor privileges; skip usage data without them
+            pass
+
+        report[collection_name] = {
+            'missing': [name for name in declared if name not in existing],
+            'undeclared': sorted(name for name in existing if name != '_id_' and name not in declared),
+            'unused': sorted(name for name, ops in usage.items() if name != '_id_' and ops == 0),
+        }
+    return report
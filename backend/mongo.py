@@ -0,0 +1,162 @@
+import os
+import threading
+from pymongo import MongoClient, ReadPreference
+from pymongo.errors import OperationFailure
+
+# MongoClient keyword arguments settable through MONGO_* configuration keys, with their types
+CLIENT_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': ('maxPoolSize', int),
+    'MONGO_MIN_POOL_SIZE': ('minPoolSize', int),
+    'MONGO_MAX_IDLE_TIME_MS': ('maxIdleTimeMS', int),
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': ('waitQueueTimeoutMS', int),
+    'MONGO_CONNECT_TIMEOUT_MS': ('connectTimeoutMS', int),
+    'MONGO_SOCKET_TIMEOUT_MS': ('socketTimeoutMS', int),
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': ('serverSelectionTimeoutMS', int),
+    'MONGO_READ_PREFERENCE': ('readPreference', str),
+    'MONGO_WRITE_CONCERN': ('w', str),
+    'MONGO_WRITE_CONCERN_TIMEOUT_MS': ('wTimeoutMS', int),
+    'MONGO_APP_NAME': ('appname', str),
+}
+
+
+def _write_concern(value):
+    """'majority' / tag sets stay strings, node counts become integers"""
+    return int(value) if value.isdigit() else value
+
+
+def client_options(config):
+    """MongoClient keyword arguments from a mapping of MONGO_* settings (unset keys are left out)"""
+    options = {}
+    for key, (option, kind) in CLIENT_OPTIONS.items():
+        value = config.get(key)
+        if value is None or value == '':
+            continue
+        try:
+            value = kind(value)
+        except ValueError:
+            raise ValueError(f'{key} must be an integer')
+        options[option] = _write_concern(value) if option == 'w' else value
+    return options
+
+
+def options_from_env():
+    """The MONGO_* settings present in the environment"""
+    return {key: os.environ[key] for key in CLIENT_OPTIONS if os.environ.get(key)}
+
+
+class LazyMongo:
+    """
+    MongoClient created on first use in each process.
+    Nothing connects at import time, and a client inherited through fork() (e.g. from
+    a gunicorn --preload master) is never used: a process whose pid differs from the
+    one that created the client builds its own, with its own pool and monitor threads.
+    """
+
+    def __init__(self, uri='mongodb://localhost:27017/', database='disaster_management', **options):
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+        self.configure(uri, database, **options)
+
+    def configure(self, uri, database, **options):
+        """Change the connection settings; the next use connects with them"""
+        with self._lock:
+            self.uri = uri
+            self.database_name = database
+            self.options = options
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+    @property
+    def client(self):
+        client = self._client
+        if client is not None and self._pid == os.getpid():
+            return client
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                # Never close an inherited client: its sockets belong to the parent
+                self._client = MongoClient(self.uri, **self.options)
+                self._pid = os.getpid()
+            return self._client
+
+    @property
+    def connected(self):
+        return self._client is not None and self._pid == os.getpid()
+
+    def database(self):
+        return self.client[self.database_name]
+
+    def run_in_transaction(self, callback):
+        """
+        Call `callback(session)` in a multi-document transaction and return (result, True).
+        Standalone servers do not support transactions; there `callback(None)` is called
+        and (result, False) returned, so the callback must undo partial writes itself.
+        Exceptions raised by the callback abort the transaction and propagate.
+        """
+        try:
+            with self.client.start_session() as session:
+                # Transactions must read from the primary whatever MONGO_READ_PREFERENCE says
+                return session.with_transaction(callback, read_preference=ReadPreference.PRIMARY), True
+        except OperationFailure as e:
+            # IllegalOperation: transactions need a replica set or sharded cluster
+            if e.code != 20:
+                raise
+        return callback(None), False
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+    def stats(self):
+        return {'database': self.database_name, 'connected': self.connected,
+                'options': dict(self.options)}
+
+
+class LazyCollection:
+    """
+    Stand-in for a pymongo Collection that resolves the real one through LazyMongo,
+    so module-level collection handles can be created before any connection exists.
+    """
+
+    def __init__(self, mongo, name):
+        self._mongo = mongo
+        self.name = name
+        self._client = None
+        self._collection = None
+
+    def _resolve(self):
+        client = self._mongo.client
+        if client is not self._client:
+            self._collection = client[self._mongo.database_name][self.name]
+            self._client = client
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self):
+        return f'LazyCollection({self.name!r})'
+
+
+class LazyDatabase:
+    """Stand-in for a pymongo Database handing out LazyCollections"""
+
+    def __init__(self, mongo):
+        self._mongo = mongo
+        self._collections = {}
+
+    @property
+    def name(self):
+        return self._mongo.database_name
+
+    def __getitem__(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections.setdefault(name, LazyCollection(self._mongo, name))
+        return collection
+
+    def __getattr__(self, attr):
+        return getattr(self._mongo.database(), attr)
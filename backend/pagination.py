@@ -0,0 +1,140 @@
+import base64
+import os
+from bson import ObjectId, json_util
+from pymongo import ASCENDING
+from geo import parse_bbox
+from timestamps import parse_timestamp
+
+# Page size limits for list endpoints
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 1000))
+
+# Query string parameters that map directly to equality/$in filters
+FILTER_FIELDS = ('status', 'severity', 'type')
+
+
+def parse_limit(value, default=None, maximum=MAX_PAGE_SIZE):
+    """Parse a ?limit= parameter capped at `maximum`; `default` when absent (None means no limit)"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, maximum)
+
+
+def parse_projection(fields, sort_field='_id'):
+    """Turn ?fields=a,b,c into a Mongo projection (None means all fields)"""
+    if not fields:
+        return None
+    projection = {name.strip(): 1 for name in fields.split(',') if name.strip()}
+    if not projection:
+        return None
+    # The id and the sort key are always needed to build the response and the next cursor
+    projection.pop('id', None)
+    projection['_id'] = 1
+    projection[sort_field] = 1
+    return projection
+
+
+def parse_filters(args, filter_fields=FILTER_FIELDS):
+    """Build a Mongo filter from ?status=, ?severity=, ?type= (comma separated values use $in)"""
+    query = {}
+    for field in filter_fields:
+        value = args.get(field)
+        if not value:
+            continue
+        values = [v.strip() for v in value.split(',') if v.strip()]
+        if len(values) == 1:
+            query[field] = values[0]
+        elif values:
+            query[field] = {'$in': values}
+    return query
+
+
+def parse_time_range(args, range_field):
+    """Build a filter from ?from= (inclusive) and ?to= (exclusive) ISO 8601 timestamps"""
+    bounds = {}
+    for param, op in (('from', '$gte'), ('to', '$lt')):
+        value = args.get(param)
+        if not value:
+            continue
+        if not range_field:
+            raise ValueError(f'{param} is not supported on this endpoint')
+        try:
+            bounds[op] = parse_timestamp(value)
+        except ValueError:
+            raise ValueError(f'{param} must be an ISO 8601 timestamp')
+    return {range_field: bounds} if bounds else {}
+
+
+def encode_payload(payload):
+    """Opaque, URL-safe token for a dict of BSON values (ObjectIds and dates survive the round trip)"""
+    raw = json_util.dumps(payload).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_payload(token, validate=None, error='Invalid cursor'):
+    """Dict encoded by encode_payload(); raises ValueError(error) if it is malformed or fails `validate`"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError(error)
+    if not isinstance(payload, dict) or (validate and not validate(payload)):
+        raise ValueError(error)
+    return payload
+
+
+def encode_cursor(doc, sort_field='_id'):
+    """Encode the keyset position of a document as an opaque, URL-safe token"""
+    payload = {'id': doc['_id']}
+    if sort_field != '_id':
+        payload['v'] = doc.get(sort_field)
+    return encode_payload(payload)
+
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor"""
+    return decode_payload(token, lambda payload: isinstance(payload.get('id'), ObjectId))
+
+
+def keyset_condition(cursor, sort_field='_id', direction=ASCENDING):
+    """Filter matching documents strictly after the cursor position"""
+    op = '$gt' if direction == ASCENDING else '$lt'
+    if sort_field == '_id':
+        return {'_id': {op: cursor['id']}}
+    # Ties on the sort key are broken by _id
+    return {'$or': [
+        {sort_field: {op: cursor.get('v')}},
+        {sort_field: cursor.get('v'), '_id': {op: cursor['id']}}
+    ]}
+
+
+def build_list_query(args, sort_field='_id', direction=ASCENDING, filter_fields=FILTER_FIELDS, range_field=None,
+                     geo=False):
+    """
+    Translate list endpoint query parameters into find() arguments.
+    `range_field` is the timestamp filtered by ?from= / ?to=; `geo` enables ?bbox=.
+    Returns (query, projection, sort, limit).
+    """
+    query = parse_filters(args, filter_fields)
+    query.update(parse_time_range(args, range_field))
+    if args.get('bbox'):
+        if not geo:
+            raise ValueError('bbox is not supported on this endpoint')
+        query.update(parse_bbox(args['bbox']))
+    after = args.get('after')
+    if after:
+        condition = keyset_condition(decode_cursor(after), sort_field, direction)
+        query = {'$and': [query, condition]} if query else condition
+
+    projection = parse_projection(args.get('fields'), sort_field)
+    limit = parse_limit(args.get('limit'))
+
+    sort = [(sort_field, direction)]
+    if sort_field != '_id':
+        sort.append(('_id', direction))
+    return query, projection, sort, limit
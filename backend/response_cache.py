@@ -0,0 +1,177 @@
+import threading
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # Optional, only needed for the redis backend
+    redis = None
+
+try:
+    import fakeredis
+except ImportError:  # Optional, in-process stand-in for fakeredis:// URLs
+    fakeredis = None
+
+
+class MemoryCacheBackend:
+    """In-process LRU bounded by the total size of the stored bytes"""
+
+    name = 'memory'
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._size -= len(self._entries.pop(key))
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size,
+                    'maxBytes': self.max_bytes, 'evictions': self.evictions}
+
+
+class RedisCacheBackend:
+    """
+    Cache shared between workers through any Redis-compatible server.
+    Memory is bounded by the server (maxmemory + an LRU eviction policy) and by `ttl`.
+    A fakeredis:// URL runs against an in-process fakeredis server instead, for
+    development without a Redis server (entries are then not shared between processes).
+    """
+
+    name = 'redis'
+
+    def __init__(self, url='redis://localhost:6379/0', ttl=300, namespace='dms:response:', client=None):
+        if client is None:
+            client = self._connect(url)
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+
+    @staticmethod
+    def _connect(url):
+        if url.startswith('fakeredis://'):
+            if fakeredis is None:
+                raise RuntimeError('The fakeredis package is required for fakeredis:// cache URLs')
+            return fakeredis.FakeRedis()
+        if redis is None:
+            raise RuntimeError('The redis package is required for RESPONSE_CACHE_BACKEND=redis')
+        return redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(self.namespace + key)
+
+    def set(self, key, value):
+        self.client.set(self.namespace + key, value, ex=self.ttl)
+
+    def invalidate(self, prefix):
+        # Keys are versioned, so entries for an old version can no longer be reached
+        # from any worker; leave them to expire instead of scanning on every write
+        pass
+
+    def stats(self):
+        stats = {'keys': self.client.dbsize()}
+        try:
+            info = self.client.info('memory')
+        except redis.ResponseError:
+            # Stand-ins such as fakeredis do not implement INFO
+            return stats
+        return {**stats, 'usedMemory': info.get('used_memory'), 'maxMemory': info.get('maxmemory')}
+
+
+class ResponseCache:
+    """
+    Read-through cache of serialized list responses.
+    Keys embed the collection's version ETag, so a write from any worker makes old
+    entries unreachable; invalidate() also frees them right away in the memory backend.
+    """
+
+    def __init__(self, backend, collections):
+        self.backend = backend
+        self.collections = set(collections)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def enabled_for(self, collection_name):
+        return self.backend is not None and collection_name in self.collections
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, collection_name, etag):
+        """Return (body bytes, next cursor) or None"""
+        try:
+            value = self.backend.get(f'{collection_name}:{etag}')
+        except Exception as e:
+            self._count('errors')
+            print(f"Response cache read failed: {e}")
+            return None
+        if value is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        next_cursor, _, body = value.partition(b'\n')
+        return body, next_cursor.decode('ascii') or None
+
+    def set(self, collection_name, etag, body, next_cursor=None):
+        try:
+            self.backend.set(f'{collection_name}:{etag}', (next_cursor or '').encode('ascii') + b'\n' + body)
+        except Exception as e:
+            self._count('errors')
+            print(f"Response cache write failed: {e}")
+
+    def invalidate(self, collection_name):
+        if not self.enabled_for(collection_name):
+            return
+        try:
+            self.backend.invalidate(f'{collection_name}:')
+        except Exception as e:
+            self._count('errors')
+            print(f"Response cache invalidation failed: {e}")
+
+    def stats(self):
+        if self.backend is None:
+            return {'backend': 'none'}
+        stats = {'backend': self.backend.name, 'hits': self.hits, 'misses': self.misses, 'errors': self.errors}
+        try:
+            stats.update(self.backend.stats())
+        except Exception as e:
+            stats['backendError'] = str(e)
+        return stats
+
+
+def create_backend(kind, max_bytes=32 * 1024 * 1024, url=None, ttl=300):
+    """Build the configured backend ('memory', 'redis' or 'none')"""
+    if kind == 'none':
+        return None
+    if kind == 'redis':
+        return RedisCacheBackend(url or 'redis://localhost:6379/0', ttl=ttl)
+    return MemoryCacheBackend(max_bytes=max_bytes)
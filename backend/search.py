@@ -0,0 +1,80 @@
+import os
+from bson import ObjectId
+from pagination import decode_payload, encode_payload
+from sync import WATERMARK_FIELD
+
+# Upper bound for ?limit= on /api/search
+MAX_SEARCH_RESULTS = int(os.getenv('MAX_SEARCH_RESULTS', 100))
+# Longest accepted search string
+MAX_QUERY_LENGTH = 200
+
+
+def parse_query(value):
+    text = ' '.join((value or '').split())
+    if not text:
+        raise ValueError('q is required')
+    if len(text) > MAX_QUERY_LENGTH:
+        raise ValueError(f'q must be at most {MAX_QUERY_LENGTH} characters')
+    return text
+
+
+def encode_search_cursor(result):
+    """Opaque token for the position of the last returned result"""
+    return encode_payload({'s': result['score'], 'c': result['collection'], 'id': result['_id']})
+
+
+def decode_search_cursor(token):
+    payload = decode_payload(token, lambda payload: isinstance(payload.get('id'), ObjectId)
+                             and isinstance(payload.get('c'), str))
+    return payload['s'], payload['c'], payload['id']
+
+
+def after_condition(cursor, collection_name):
+    """
+    Results strictly after the cursor in (score desc, collection, _id) order, expressed
+    for one collection: other collections only compare on the score.
+    """
+    if cursor is None:
+        return None
+    score, cursor_collection, cursor_id = cursor
+    if collection_name > cursor_collection:
+        return {'score': {'$lte': score}}
+    if collection_name < cursor_collection:
+        return {'score': {'$lt': score}}
+    return {'$or': [{'score': {'$lt': score}}, {'score': score, '_id': {'$gt': cursor_id}}]}
+
+
+def search_pipeline(text, filters, collection_name, cursor=None, limit=20):
+    """
+    Text search over one collection, best matches first. $text must be the first
+    $match so the text index drives the scan; only matching documents are scored
+    and the top `limit + 1` are kept (the extra one tells whether more exist).
+    """
+    pipeline = [
+        {'$match': {'$text': {'$search': text}, **filters}},
+        {'$addFields': {'score': {'$meta': 'textScore'}}},
+    ]
+    condition = after_condition(cursor, collection_name)
+    if condition:
+        pipeline.append({'$match': condition})
+    pipeline += [
+        {'$sort': {'score': -1, '_id': 1}},
+        {'$limit': limit + 1},
+        {'$project': {WATERMARK_FIELD: 0}},
+    ]
+    return pipeline
+
+
+def merge_results(results_by_collection, limit):
+    """
+    Merge per-collection result lists into one ranking.
+    Returns (page, next cursor or None); each item carries 'collection' and 'score'.
+    """
+    merged = []
+    for collection_name, docs in results_by_collection.items():
+        for doc in docs:
+            merged.append({'collection': collection_name, 'score': doc.pop('score'), '_id': doc['_id'], 'document': doc})
+    merged.sort(key=lambda item: (-item['score'], item['collection'], item['_id']))
+    page = merged[:limit]
+    next_cursor = encode_search_cursor(page[-1]) if len(merged) > limit else None
+    return page, next_cursor
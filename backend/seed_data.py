@@ -2,6 +2,7 @@ from pymongo import MongoClient
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
+from geo import with_geo_point
 
 # Load environment variables
 load_dotenv()
@@ -21,12 +22,17 @@ db.evacuation_plans.delete_many({})
 db.messages.delete_many({})
 db.users.delete_many({})
 db.weather.delete_many({})
+db.resource_allocations.delete_many({})
+# Derived state (analytics rollup, list ETag counters, sync tombstones) is rebuilt from the new data
+db.analytics.delete_many({})
+db.collection_versions.delete_many({})
+db.tombstones.delete_many({})
 
 print("Seeding database with initial data...")
 
-# Helper function to get ISO timestamp
+# Helper function to get a timestamp (stored as a BSON date)
 def get_timestamp(days_ago=0, hours_ago=0):
-    return (datetime.utcnow() - timedelta(days=days_ago, hours=hours_ago)).isoformat() + 'Z'
+    return datetime.utcnow() - timedelta(days=days_ago, hours=hours_ago)
 
 # Seed Alerts
 alerts = [
@@ -82,6 +88,7 @@ resources = [
         'quantity': 45,
         'available': 32,
         'location': 'Multiple Locations',
+        'coordinates': {'lat': 28.6139, 'lng': 77.209},
         'status': 'available'
     },
     {
@@ -90,6 +97,7 @@ resources = [
         'quantity': 8,
         'available': 5,
         'location': 'Delhi, Mumbai, Chennai',
+        'coordinates': {'lat': 19.0896, 'lng': 72.8656},
         'status': 'available'
     },
     {
@@ -98,6 +106,7 @@ resources = [
         'quantity': 500,
         'available': 350,
         'location': 'State Warehouses',
+        'coordinates': {'lat': 18.5204, 'lng': 73.8567},
         'status': 'available'
     },
     {
@@ -106,6 +115,7 @@ resources = [
         'quantity': 25,
         'available': 18,
         'location': 'Coastal States',
+        'coordinates': {'lat': 13.0827, 'lng': 80.2707},
         'status': 'available'
     },
     {
@@ -114,6 +124,7 @@ resources = [
         'quantity': 30,
         'available': 22,
         'location': 'Multiple Cities',
+        'coordinates': {'lat': 19.076, 'lng': 72.8777},
         'status': 'available'
     },
     {
@@ -122,6 +133,7 @@ resources = [
         'quantity': 15,
         'available': 10,
         'location': 'Fire Stations',
+        'coordinates': {'lat': 12.9716, 'lng': 77.5946},
         'status': 'available'
     },
     {
@@ -130,6 +142,7 @@ resources = [
         'quantity': 200,
         'available': 180,
         'location': 'Emergency Warehouses',
+        'coordinates': {'lat': 28.4595, 'lng': 77.0266},
         'status': 'available'
     },
     {
@@ -138,10 +151,11 @@ resources = [
         'quantity': 50,
         'available': 45,
         'location': 'Regional Centers',
+        'coordinates': {'lat': 22.5726, 'lng': 88.3639},
         'status': 'available'
     }
 ]
-result = db.resources.insert_many(resources)
+result = db.resources.insert_many([with_geo_point(resource) for resource in resources])
 print(f"✓ Seeded {len(result.inserted_ids)} resources")
 
 # Seed Incidents
@@ -197,7 +211,7 @@ incidents = [
         'updatedAt': get_timestamp(hours_ago=12)
     }
 ]
-result = db.incidents.insert_many(incidents)
+result = db.incidents.insert_many([with_geo_point(incident) for incident in incidents])
 print(f"✓ Seeded {len(result.inserted_ids)} incidents")
 
 # Seed Teams
@@ -209,6 +223,7 @@ teams = [
         'members': ['Inspector A. Sharma', 'Inspector B. Singh', 'Head Constable C. Verma', 'Constable D. Patel', 'Constable E. Yadav'],
         'status': 'deployed',
         'location': 'Mumbai',
+        'coordinates': {'lat': 19.076, 'lng': 72.8777},
         'equipment': ['Rescue Equipment', 'Medical Supplies', 'Communication Devices'],
         'contact': '+91-9876543210'
     },
@@ -219,6 +234,7 @@ teams = [
         'members': ['Fire Officer D. Kumar', 'Fire Officer E. Yadav', 'Driver F. Shah'],
         'status': 'deployed',
         'location': 'Pune',
+        'coordinates': {'lat': 18.5204, 'lng': 73.8567},
         'equipment': ['Fire Trucks', 'Ladders', 'Breathing Apparatus'],
         'contact': '+91-9876543211'
     },
@@ -229,6 +245,7 @@ teams = [
         'members': ['Dr. K. Reddy', 'Nurse L. Singh', 'Paramedic M. Khan'],
         'status': 'available',
         'location': 'Delhi',
+        'coordinates': {'lat': 28.6139, 'lng': 77.209},
         'equipment': ['Ambulances', 'Medical Kits', 'Defibrillators'],
         'contact': '+91-9876543212'
     },
@@ -239,11 +256,12 @@ teams = [
         'members': ['Inspector O. Gupta', 'Sub-Inspector P. Joshi', 'Constable Q. Rao'],
         'status': 'available',
         'location': 'Bangalore',
+        'coordinates': {'lat': 12.9716, 'lng': 77.5946},
         'equipment': ['Patrol Vehicles', 'Communication Equipment', 'First Aid Kits'],
         'contact': '+91-9876543213'
     }
 ]
-result = db.teams.insert_many(teams)
+result = db.teams.insert_many([with_geo_point(team) for team in teams])
 print(f"✓ Seeded {len(result.inserted_ids)} teams")
 
 # Seed Evacuation Plans
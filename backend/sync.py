@@ -0,0 +1,59 @@
+import os
+from datetime import datetime, timedelta
+from pagination import decode_payload, encode_payload
+
+# Field stamped on every write to a synced collection
+WATERMARK_FIELD = 'syncedAt'
+# Writes from other workers may land slightly out of clock order; re-send this window
+SYNC_OVERLAP = timedelta(seconds=int(os.getenv('SYNC_OVERLAP_SECONDS', 5)))
+# Tombstones are kept this long; older tokens get a full snapshot instead of a delta
+TOMBSTONE_RETENTION = timedelta(days=int(os.getenv('SYNC_TOMBSTONE_DAYS', 7)))
+
+
+def touch(data, now=None):
+    """Stamp the sync watermark on a document or a $set payload"""
+    data[WATERMARK_FIELD] = now or datetime.utcnow()
+    return data
+
+
+def tombstones_for(collection_name, ids, now=None):
+    """Tombstone documents recording deleted ids for delta sync"""
+    now = now or datetime.utcnow()
+    return [{'collection': collection_name, 'docId': str(doc_id), 'deletedAt': now} for doc_id in ids]
+
+
+def encode_token(moment):
+    return encode_payload({'t': moment})
+
+
+def decode_token(token):
+    payload = decode_payload(token, lambda payload: isinstance(payload.get('t'), datetime), 'Invalid sync token')
+    return payload['t'].replace(tzinfo=None)
+
+
+def collect_changes(collections, tombstones_collection, since=None, now=None):
+    """
+    Gather documents changed and deleted since the `since` watermark.
+    `collections` maps response names to pymongo collections. Without a watermark
+    (or one older than the tombstone retention) a full snapshot is returned with
+    reset=True so the client replaces its local state.
+    Returns (changes, reset, token).
+    """
+    now = now or datetime.utcnow()
+    reset = since is None or since < now - TOMBSTONE_RETENTION
+    changes = {}
+    for name, collection in collections.items():
+        if reset:
+            upserted = collection.find({})
+            deleted = []
+        else:
+            threshold = since - SYNC_OVERLAP
+            upserted = collection.find({WATERMARK_FIELD: {'$gte': threshold}})
+            deleted = [
+                stone['docId'] for stone in tombstones_collection.find(
+                    {'collection': collection.name, 'deletedAt': {'$gte': threshold}},
+                    {'docId': 1}
+                )
+            ]
+        changes[name] = {'upserted': upserted, 'deleted': deleted}
+    return changes, reset, encode_token(now)
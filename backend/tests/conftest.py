@@ -0,0 +1,27 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import mongo  # noqa: E402
+
+
+@pytest.fixture
+def api(monkeypatch, request):
+    """The app module, configured against an in-memory mongomock database of its own"""
+    monkeypatch.setattr(mongo, 'MongoClient', mongomock.MongoClient)
+    import app as api_module
+    flask_app = api_module.create_app({'MONGO_URI': 'mongodb://localhost:27017/',
+                                       'MONGO_DB': f'test_{request.node.name}'[:60],
+                                       'JSON_ENCODER': 'json'})
+    api_module.flask_app = flask_app
+    yield api_module
+    api_module.mongo.close()
+
+
+@pytest.fixture
+def client(api):
+    return api.flask_app.test_client()
@@ -0,0 +1,144 @@
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from allocations import AllocationConflict, release, reserve
+
+QUANTITY = 20
+
+
+class Interleaved:
+    """
+    Runs `competitor` right before the next find_one_and_update reaches the collection,
+    as a request handled by another worker could. Whatever the competitor changes is
+    only caught by the guard inside the update itself, not by an earlier read.
+    """
+
+    def __init__(self, collection, competitor):
+        self._collection = collection
+        self._competitor = competitor
+
+    def find_one_and_update(self, *args, **kwargs):
+        competitor, self._competitor = self._competitor, None
+        if competitor:
+            competitor()
+        return self._collection.find_one_and_update(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self._collection, attr)
+
+
+class FailingLedger:
+    def insert_one(self, document, session=None):
+        raise PyMongoError('ledger unavailable')
+
+
+@pytest.fixture
+def store():
+    db = mongomock.MongoClient()['allocations']
+    return db['resources'], db['resource_allocations']
+
+
+@pytest.fixture
+def mongodb_store():
+    """Collections on the real server at TEST_MONGO_URI; skipped when it is not set or reachable"""
+    uri = os.getenv('TEST_MONGO_URI')
+    if not uri:
+        pytest.skip('TEST_MONGO_URI is not set')
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000, maxPoolSize=16)
+    try:
+        client.admin.command('ping')
+    except PyMongoError as e:
+        pytest.skip(f'MongoDB not reachable: {e}')
+    db = client['disaster_management_test_allocations']
+    yield db['resources'], db['resource_allocations']
+    client.drop_database(db.name)
+    client.close()
+
+
+def hammer(resources, ledger, threads=16, operations=300):
+    """Reserve and release random amounts from a thread pool; returns (applied, observed available counts)"""
+    resource_id = str(resources.insert_one({'name': 'Ambulances', 'quantity': QUANTITY,
+                                            'available': QUANTITY}).inserted_id)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        observed = []
+        for _ in range(operations):
+            operation = reserve if rng.random() < 0.55 else release
+            try:
+                before, after, _ = operation(resources, ledger, resource_id, {'quantity': rng.randint(1, 3)})
+            except AllocationConflict:
+                continue
+            observed += [before['available'], after['available']]
+        return observed
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(worker, range(threads)))
+    return resource_id, sum(len(observed) // 2 for observed in results), [n for observed in results for n in observed]
+
+
+def check_ledger(resources, ledger, resource_id, applied, observed):
+    assert applied > 0
+    assert all(0 <= available <= QUANTITY for available in observed)
+    entries = list(ledger.find({'resourceId': ObjectId(resource_id)}))
+    assert len(entries) == applied
+    assert all(0 <= entry['availableAfter'] <= QUANTITY for entry in entries)
+    net_reserved = sum(entry['quantity'] if entry['action'] == 'reserve' else -entry['quantity'] for entry in entries)
+    available = resources.find_one({'_id': ObjectId(resource_id)})['available']
+    assert available == QUANTITY - net_reserved
+    assert 0 <= available <= QUANTITY
+
+
+def test_reserve_guard_holds_against_an_interleaved_reservation(store):
+    resources, ledger = store
+    resource_id = str(resources.insert_one({'quantity': 3, 'available': 2}).inserted_id)
+    racing = Interleaved(resources, lambda: reserve(resources, ledger, resource_id, {'quantity': 2, 'note': 'other'}))
+    with pytest.raises(AllocationConflict, match='only 0 available'):
+        reserve(racing, ledger, resource_id, {'quantity': 2})
+    assert resources.find_one()['available'] == 0
+    assert [entry['note'] for entry in ledger.find()] == ['other']
+
+
+def test_release_guard_holds_against_an_interleaved_release(store):
+    resources, ledger = store
+    resource_id = str(resources.insert_one({'quantity': 3, 'available': 1}).inserted_id)
+    racing = Interleaved(resources, lambda: release(resources, ledger, resource_id, {'quantity': 1}))
+    with pytest.raises(AllocationConflict, match='2 of 3 already available'):
+        release(racing, ledger, resource_id, {'quantity': 2})
+    assert resources.find_one()['available'] == 2
+    assert ledger.count_documents({}) == 1
+
+
+def test_concurrent_reserve_and_release_on_mongodb(mongodb_store):
+    resources, ledger = mongodb_store
+    check_ledger(resources, ledger, *hammer(resources, ledger))
+
+
+def test_conflicts_leave_no_ledger_entry(store):
+    resources, ledger = store
+    resource_id = str(resources.insert_one({'quantity': 3, 'available': 1}).inserted_id)
+    with pytest.raises(AllocationConflict):
+        reserve(resources, ledger, resource_id, {'quantity': 2})
+    with pytest.raises(AllocationConflict):
+        release(resources, ledger, resource_id, {'quantity': 3})
+    assert ledger.count_documents({}) == 0
+    assert resources.find_one()['available'] == 1
+
+
+def test_failed_ledger_insert_undoes_the_change(store):
+    resources, _ = store
+    resource_id = str(resources.insert_one({'quantity': 5, 'available': 5}).inserted_id)
+    with pytest.raises(PyMongoError):
+        reserve(resources, FailingLedger(), resource_id, {'quantity': 2})
+    assert resources.find_one()['available'] == 5
+    reserve(resources, mongomock.MongoClient()['allocations']['ledger'], resource_id, {'quantity': 2})
+    with pytest.raises(PyMongoError):
+        release(resources, FailingLedger(), resource_id, {'quantity': 1})
+    assert resources.find_one()['available'] == 3
@@ -0,0 +1,20 @@
+def test_bulk_update_reports_bare_ids_per_item(api, client):
+    created = client.post('/api/resources/bulk', json=[{'name': 'Water', 'quantity': 10},
+                                                        {'name': 'Tents', 'quantity': 4}]).get_json()
+    first, second = (item['id'] for item in created['results'])
+
+    response = client.put('/api/resources/bulk', json=[{'id': first, 'quantity': 8}, second, 'not-an-id'])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['succeeded'] == 1 and body['failed'] == 2
+    assert body['results'][0]['status'] == 'updated'
+    assert body['results'][1] == {'index': 1, 'status': 'error', 'error': 'Item must be a JSON object with an id'}
+    assert body['results'][2]['error'] == 'Invalid id'
+    assert api.resources_collection.find_one({'name': 'Water'})['quantity'] == 8
+
+
+def test_bulk_delete_accepts_bare_ids(api, client):
+    created = client.post('/api/resources/bulk', json=[{'name': 'Water', 'quantity': 10}]).get_json()
+    response = client.delete('/api/resources/bulk', json=[created['results'][0]['id']])
+    assert response.get_json()['results'][0]['status'] == 'deleted'
+    assert api.resources_collection.count_documents({}) == 0
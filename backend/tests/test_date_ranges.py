@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from pagination import parse_time_range
+
+
+def test_parse_time_range_bounds():
+    query = parse_time_range(MultiDict({'from': '2024-06-01', 'to': '2024-06-02T12:00:00Z'}), 'createdAt')
+    assert query == {'createdAt': {'$gte': datetime(2024, 6, 1), '$lt': datetime(2024, 6, 2, 12)}}
+    assert parse_time_range(MultiDict(), 'createdAt') == {}
+
+
+def test_parse_time_range_errors():
+    with pytest.raises(ValueError, match='from must be an ISO 8601 timestamp'):
+        parse_time_range(MultiDict({'from': 'yesterday'}), 'createdAt')
+    with pytest.raises(ValueError, match='to is not supported'):
+        parse_time_range(MultiDict({'to': '2024-06-01'}), None)
+
+
+def test_resource_writes_stamp_last_updated(api, client):
+    created = client.post('/api/resources', json={'name': 'Water', 'quantity': 10}).get_json()
+    stamped = api.resources_collection.find_one({'name': 'Water'})['lastUpdated']
+    assert isinstance(stamped, datetime)
+
+    client.put(f"/api/resources/{created['id']}", json={'quantity': 8})
+    assert api.resources_collection.find_one({'name': 'Water'})['lastUpdated'] >= stamped
+
+    client.post('/api/resources/bulk', json=[{'name': 'Tents', 'quantity': 4}])
+    tents = api.resources_collection.find_one({'name': 'Tents'})
+    assert isinstance(tents['lastUpdated'], datetime)
+    client.put('/api/resources/bulk', json=[{'id': str(tents['_id']), 'quantity': 3}])
+    assert api.resources_collection.find_one({'name': 'Tents'})['lastUpdated'] >= tents['lastUpdated']
+
+
+def test_list_filters_on_range_field(api, client):
+    api.resources_collection.insert_many([
+        {'name': 'Old', 'lastUpdated': datetime(2024, 5, 31, 23)},
+        {'name': 'Start', 'lastUpdated': datetime(2024, 6, 1)},
+        {'name': 'End', 'lastUpdated': datetime(2024, 6, 2)},
+    ])
+    response = client.get('/api/resources?from=2024-06-01&to=2024-06-02')
+    assert response.status_code == 200
+    assert [doc['name'] for doc in response.get_json()] == ['Start']
+
+    response = client.get('/api/resources?from=2024-06-01T00:00:00Z')
+    assert [doc['name'] for doc in response.get_json()] == ['Start', 'End']
+
+    response = client.get('/api/resources?to=not-a-date')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'to must be an ISO 8601 timestamp'
+
+
+def test_range_filter_rejected_without_range_field(client):
+    response = client.get('/api/teams?from=2024-06-01')
+    assert response.status_code == 400
@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from dedup import TYPE_MATCH_BONUS, IncidentDeduplicator, IncidentIndexSync, similarity, title_tokens
+
+NOW = datetime(2024, 7, 1, 12, 0)
+
+
+def test_same_type_and_place_with_unrelated_titles_is_not_a_duplicate():
+    index = IncidentDeduplicator(radius_m=500, window=6 * 3600, threshold=0.5)
+    index.add('a', 19.076, 72.8777, NOW, 'medical', 'Gas cylinder explosion in market')
+    assert index.find(19.0761, 72.8778, NOW + timedelta(minutes=5), 'medical', 'Child drowning at lake') is None
+
+
+def test_partly_overlapping_titles_of_the_same_type_are_different_incidents():
+    index = IncidentDeduplicator(radius_m=500, window=6 * 3600, threshold=0.5)
+    index.add('a', 19.0760, 72.8777, NOW, 'collapse', 'Building collapse at Dadar station')
+    # About 260 m away, one shared word out of seven
+    assert index.find(19.0783, 72.8782, NOW + timedelta(minutes=20), 'collapse', 'Wall collapse near Kurla school') is None
+
+
+def test_type_match_is_a_small_bonus():
+    assert similarity(title_tokens('Dadar market fire'), 'fire', title_tokens('Fire at Dadar market'), 'fire') == 1.0
+    assert similarity(title_tokens('Wall collapse'), 'collapse', title_tokens('Roof collapse'), 'collapse') == \
+        pytest.approx(1 / 3 + TYPE_MATCH_BONUS)
+    assert similarity(title_tokens('Child drowning'), 'medical', title_tokens('Gas explosion'), 'medical') == 0
+
+
+def test_same_type_and_overlapping_titles_is_a_duplicate():
+    index = IncidentDeduplicator(radius_m=500, window=6 * 3600, threshold=0.5)
+    index.add('a', 19.076, 72.8777, NOW, 'fire', 'Fire at Dadar market')
+    match = index.find(19.0762, 72.8775, NOW + timedelta(minutes=10), 'fire', 'Dadar market fire spreading')
+    assert match is not None and match[0] == 'a'
+
+
+def test_far_or_late_reports_are_not_duplicates():
+    index = IncidentDeduplicator(radius_m=500, window=3600, threshold=0.5)
+    index.add('a', 19.076, 72.8777, NOW, 'fire', 'Fire at Dadar market')
+    assert index.find(19.09, 72.8777, NOW, 'fire', 'Fire at Dadar market') is None
+    assert index.find(19.076, 72.8777, NOW + timedelta(hours=2), 'fire', 'Fire at Dadar market') is None
+
+
+@pytest.fixture
+def fresh_dedup(api, monkeypatch):
+    """Empty deduplicator for the app, so incidents of other tests are not matched"""
+    index = IncidentDeduplicator(radius_m=500, window=6 * 3600, threshold=0.5)
+    monkeypatch.setattr(api, 'incident_dedup', index)
+    monkeypatch.setattr(api, 'incident_index_sync', IncidentIndexSync(api.incidents_collection, index))
+    return index
+
+
+@pytest.mark.parametrize('mode', ['link', 'merge'])
+def test_unrelated_report_of_same_type_creates_its_own_incident(api, client, fresh_dedup, monkeypatch, mode):
+    monkeypatch.setattr(api, 'INCIDENT_DEDUP_MODE', mode)
+    first = {'title': 'Gas cylinder explosion in market', 'type': 'medical', 'severity': 'high',
+             'coordinates': {'lat': 19.076, 'lng': 72.8777}}
+    second = {'title': 'Child drowning at lake', 'type': 'medical', 'severity': 'high',
+              'coordinates': {'lat': 19.0761, 'lng': 72.8778}}
+    assert client.post('/api/incidents', json=first).status_code == 201
+    response = client.post('/api/incidents', json=second)
+    assert response.status_code == 201
+    assert 'X-Duplicate-Of' not in response.headers
+    assert api.incidents_collection.count_documents({}) == 2
+    assert api.incidents_collection.count_documents({'duplicateOf': {'$exists': True}}) == 0
+
+
+def test_matching_report_is_linked(api, client, fresh_dedup, monkeypatch):
+    monkeypatch.setattr(api, 'INCIDENT_DEDUP_MODE', 'link')
+    first = {'title': 'Fire at Dadar market', 'type': 'fire', 'coordinates': {'lat': 19.076, 'lng': 72.8777}}
+    second = {'title': 'Dadar market fire', 'type': 'fire', 'coordinates': {'lat': 19.0762, 'lng': 72.8775}}
+    primary = client.post('/api/incidents', json=first).get_json()
+    assert client.post('/api/incidents', json=second).status_code == 201
+    linked = api.incidents_collection.find_one({'title': 'Dadar market fire'})
+    assert linked['duplicateOf'] == primary['id']
+
+
+def test_bulk_writes_keep_the_deduplicator_in_step(api, client, fresh_dedup):
+    reports = [{'title': 'Fire at Dadar market', 'type': 'fire', 'coordinates': {'lat': 19.076, 'lng': 72.8777}},
+               {'title': 'Flooding in Sion subway', 'type': 'flood', 'coordinates': {'lat': 19.04, 'lng': 72.86}},
+               {'title': 'Landslide on Ghatkopar hill', 'type': 'landslide',
+                'coordinates': {'lat': 19.09, 'lng': 72.91}}]
+    fire, flood, landslide = (client.post('/api/incidents', json=report).get_json()['id'] for report in reports)
+    assert len(fresh_dedup) == 3
+
+    client.put('/api/incidents/bulk', json=[{'id': fire, 'status': 'resolved'},
+                                            {'id': flood, 'coordinates': {'lat': 19.2, 'lng': 72.97}}])
+    now = datetime.utcnow()
+    assert fresh_dedup.find(19.076, 72.8777, now, 'fire', 'Fire at Dadar market') is None
+    assert fresh_dedup.find(19.04, 72.86, now, 'flood', 'Flooding in Sion subway') is None
+    assert fresh_dedup.find(19.2, 72.97, now, 'flood', 'Flooding in Sion subway')[0] == flood
+
+    client.delete('/api/incidents/bulk', json=[landslide])
+    assert fresh_dedup.find(19.09, 72.91, now, 'landslide', 'Landslide on Ghatkopar hill') is None
+    assert len(fresh_dedup) == 1
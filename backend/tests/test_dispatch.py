@@ -0,0 +1,98 @@
+from itertools import permutations
+
+import numpy as np
+import pytest
+from pymongo.errors import OperationFailure
+
+from dispatch import _hungarian, plan_dispatch, type_match_matrix
+
+
+def point(lat, lng):
+    return {'type': 'Point', 'coordinates': [lng, lat]}
+
+
+def test_hungarian_matches_brute_force():
+    rng = np.random.default_rng(3)
+    for n, m in ((3, 3), (3, 5), (4, 6)):
+        cost = rng.uniform(0, 100, size=(n, m))
+        rows, columns = _hungarian(cost)
+        best = min(sum(cost[r, c] for r, c in enumerate(p)) for p in permutations(range(m), n))
+        assert cost[rows, columns].sum() == pytest.approx(best)
+
+
+def test_team_types_are_compared_case_insensitively_and_may_be_missing():
+    matches = type_match_matrix(['Fire', None, 'medical', ''], ['Industrial Fire', 'Road accident'])
+    assert matches.tolist() == [[True, False], [False, False], [False, True], [False, False]]
+
+
+def test_typeless_team_is_planned_with_the_mismatch_penalty():
+    teams = [{'geo': point(19.007, 72.8)}, {'type': 'Fire', 'geo': point(19.009, 72.8)}]
+    incidents = [{'type': 'Fire', 'severity': 'high', 'geo': point(19.0, 72.8)}]
+    assignments, unassigned, idle = plan_dispatch(teams, incidents)
+    # The suited team is further away but the typeless one costs twice as much per km
+    assert [(team, incident, match) for team, incident, _, match in assignments] == [(1, 0, True)]
+    assert unassigned == [] and idle == [0]
+
+
+def test_pairs_beyond_max_distance_are_not_assigned():
+    teams = [{'type': 'rescue', 'geo': point(19.0, 72.8)}]
+    incidents = [{'type': 'flood', 'geo': point(19.05, 72.8)}, {'type': 'flood', 'severity': 'critical',
+                                                               'geo': point(28.6, 77.2)}]
+    assignments, unassigned, idle = plan_dispatch(teams, incidents, max_distance_km=50)
+    assert [(team, incident) for team, incident, _, _ in assignments] == [(0, 0)]
+    assert unassigned == [1] and idle == []
+    assert plan_dispatch(teams, incidents[1:], max_distance_km=50) == ([], [0], [0])
+
+
+@pytest.fixture
+def candidates(client):
+    def team(name, lat, lng, **extra):
+        return client.post('/api/teams', json={'name': name, 'status': 'available',
+                                               'coordinates': {'lat': lat, 'lng': lng}, **extra}).get_json()
+
+    def incident(title, lat, lng, **extra):
+        return client.post('/api/incidents?dedup=false', json={'title': title, 'status': 'reported',
+                                                               'coordinates': {'lat': lat, 'lng': lng},
+                                                               **extra}).get_json()
+
+    return {
+        'teams': [team('Volunteers', 19.007, 72.8), team('Fire Unit 4', 19.009, 72.8, type='Fire')],
+        'incidents': [incident('Warehouse fire', 19.0, 72.8, type='fire', severity='high'),
+                      incident('Flooded underpass', 28.6, 77.2, type='flood', severity='medium')],
+    }
+
+
+def test_plan_endpoint_with_a_typeless_team(client, candidates):
+    response = client.post('/api/dispatch/plan', json={})
+    assert response.status_code == 200
+    plan = response.get_json()
+    assert plan['applied'] is False
+    by_incident = {assignment['incidentId']: assignment for assignment in plan['assignments']}
+    fire, flood = (incident['id'] for incident in candidates['incidents'])
+    assert by_incident[fire]['teamName'] == 'Fire Unit 4' and by_incident[fire]['typeMatch'] is True
+    assert by_incident[flood]['teamName'] == 'Volunteers' and by_incident[flood]['teamType'] is None
+
+
+def test_plan_endpoint_max_distance(client, candidates):
+    plan = client.post('/api/dispatch/plan', json={'maxDistanceKm': 50}).get_json()
+    assert [assignment['incidentTitle'] for assignment in plan['assignments']] == ['Warehouse fire']
+    assert plan['unassignedIncidents'] == [candidates['incidents'][1]['id']]
+    assert len(plan['idleTeams']) == 1
+
+
+@pytest.mark.parametrize('body', [{'maxDistanceKm': 0}, {'maxDistanceKm': 'far'}, {'incidents': ['nope']}, [1]])
+def test_plan_endpoint_rejects_bad_options(client, body):
+    assert client.post('/api/dispatch/plan', json=body).status_code == 400
+
+
+def test_apply_without_transactions_assigns_teams(api, client, candidates, monkeypatch):
+    def standalone(*args, **kwargs):
+        raise OperationFailure('Transaction numbers are only allowed on a replica set member or mongos', code=20)
+
+    monkeypatch.setattr(api.mongo.client, 'start_session', standalone)
+    plan = client.post('/api/dispatch/plan', json={'apply': True, 'maxDistanceKm': 50}).get_json()
+    assert plan['applied'] is True and plan['atomic'] is False
+    fire = api.incidents_collection.find_one({'title': 'Warehouse fire'})
+    assert fire['assignedTeam'] == 'Fire Unit 4' and fire['status'] == 'responding'
+    assert api.teams_collection.find_one({'name': 'Fire Unit 4'})['status'] == 'deployed'
+    assert api.teams_collection.find_one({'name': 'Volunteers'})['status'] == 'available'
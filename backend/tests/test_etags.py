@@ -0,0 +1,53 @@
+from response_cache import MemoryCacheBackend, ResponseCache
+from versions import format_etag
+
+
+def test_format_etag_variants():
+    assert format_etag('alerts', 'e1', 3) == 'alerts-e1-3'
+    tagged = format_etag('alerts', 'e1', 3, 'limit=10')
+    assert tagged.startswith('alerts-e1-3-') and len(tagged) == len('alerts-e1-3-') + 24
+    assert tagged == format_etag('alerts', 'e1', 3, 'limit=10')
+    assert tagged != format_etag('alerts', 'e1', 3, 'limit=11')
+    assert tagged != format_etag('alerts', 'e1', 4, 'limit=10')
+
+
+def test_matching_if_none_match_is_answered_with_304(client):
+    client.post('/api/alerts', json={'title': 'Flood warning', 'severity': 'high'})
+    first = client.get('/api/alerts')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    cached = client.get('/api/alerts', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b''
+    assert cached.headers['ETag'] == etag
+
+    # Another query shape has its own ETag
+    other = client.get('/api/alerts?limit=1', headers={'If-None-Match': etag})
+    assert other.status_code == 200 and other.headers['ETag'] != etag
+
+    # A write changes the ETag, so the stale validator gets the new list
+    client.post('/api/alerts', json={'title': 'Cyclone watch', 'severity': 'critical'})
+    fresh = client.get('/api/alerts', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert len(fresh.get_json()) == 2
+
+
+def test_writes_invalidate_cached_responses(api, client, monkeypatch):
+    backend = MemoryCacheBackend()
+    cache = ResponseCache(backend, collections=('resources',))
+    monkeypatch.setattr(api, 'response_cache', cache)
+    created = client.post('/api/resources', json={'name': 'Water', 'quantity': 10}).get_json()
+
+    assert client.get('/api/resources').get_json()[0]['quantity'] == 10
+    assert client.get('/api/resources').get_json()[0]['quantity'] == 10
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert backend.stats()['entries'] == 1
+
+    client.put(f"/api/resources/{created['id']}", json={'quantity': 8})
+    assert backend.stats()['entries'] == 0
+    assert client.get('/api/resources').get_json()[0]['quantity'] == 8
+    assert cache.misses == 2
+
+    # Collections without caching still get ETags but never touch the cache
+    client.get('/api/incidents')
+    assert (cache.misses, cache.hits) == (2, 1)
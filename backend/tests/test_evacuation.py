@@ -0,0 +1,54 @@
+import pytest
+from bson import ObjectId
+
+from evacuation import RouteGraph
+
+
+def plan(*routes, plan_id=None):
+    return {'_id': plan_id or ObjectId(), 'status': 'active',
+            'routes': [{'from': source, 'to': target, 'distance': '2 km', **extra} for source, target, extra in routes]}
+
+
+def test_removed_plan_leaves_no_unreachable_places():
+    graph = RouteGraph()
+    coast = plan(('Marine Drive', 'Azad Maidan', {}))
+    inland = plan(('Azad Maidan', 'Shivaji Park', {}))
+    graph.load([coast, inland])
+    assert len(graph.shortest_path('Marine Drive', 'Shivaji Park')) == 2
+
+    graph.remove_plan(coast['_id'])
+    with pytest.raises(LookupError, match='Unknown place: Marine Drive'):
+        graph.shortest_path('Marine Drive', 'Shivaji Park')
+    # Places still served by another plan stay
+    assert len(graph.shortest_path('Azad Maidan', 'Shivaji Park')) == 1
+    assert graph.stats() == {'places': 2, 'routes': 2, 'plans': 1}
+
+    graph.remove_plan(inland['_id'])
+    assert graph.stats() == {'places': 0, 'routes': 0, 'plans': 0}
+
+
+def test_updated_plan_drops_its_old_endpoints():
+    graph = RouteGraph()
+    plan_id = ObjectId()
+    graph.update_plan(plan(('School', 'Stadium', {}), plan_id=plan_id))
+    graph.update_plan(plan(('School', 'Hospital', {}), plan_id=plan_id))
+    with pytest.raises(LookupError, match='Unknown place: Stadium'):
+        graph.shortest_path('School', 'Stadium')
+    assert [edge.target for edge in graph.shortest_path('School', 'Hospital')] == ['Hospital']
+
+
+def test_one_way_destination_is_kept_while_a_route_leads_to_it():
+    graph = RouteGraph()
+    one_way = plan(('Harbour', 'Shelter', {'oneWay': True}))
+    other = plan(('Depot', 'Shelter', {'oneWay': True}))
+    graph.load([one_way, other])
+    graph.remove_plan(one_way['_id'])
+    assert len(graph.shortest_path('Depot', 'Shelter')) == 1
+    with pytest.raises(LookupError, match='Unknown place: Harbour'):
+        graph.shortest_path('Harbour', 'Shelter')
+
+
+def test_blocked_routes_still_know_their_places():
+    graph = RouteGraph()
+    graph.update_plan(plan(('Bridge', 'Camp', {'status': 'blocked'})))
+    assert graph.shortest_path('Bridge', 'Camp') is None
@@ -0,0 +1,88 @@
+import pytest
+
+from heatmap import HeatmapTiles, parse_zoom, quadkey, tile_bounds, tile_range, tile_xy, tiles_in_range
+
+MUMBAI = (72.8777, 19.076)
+DELHI = (77.209, 28.6139)
+
+
+class Versions:
+    """Stand-in for CollectionVersions with a counter bumped by the test"""
+
+    def __init__(self):
+        self.version = 0
+
+    def current(self, name):
+        return 'epoch', self.version
+
+
+def point(lng, lat):
+    return {'geo': {'type': 'Point', 'coordinates': [lng, lat]}}
+
+
+@pytest.fixture
+def tiles():
+    return HeatmapTiles(Versions(), 'incidents', refresh_interval=60)
+
+
+def fill(cache, zoom=6, variant=''):
+    wanted = [tile_xy(*MUMBAI, zoom), tile_xy(*DELHI, zoom)]
+    found, generation = cache.lookup(zoom, wanted, variant)
+    assert found == {}
+    cache.store(zoom, {tile: [{'count': 1}] for tile in wanted}, variant, generation)
+    return wanted
+
+
+def test_tile_math():
+    x, y = tile_xy(*MUMBAI, 6)
+    west, south, east, north = tile_bounds(x, y, 6)
+    assert west <= MUMBAI[0] < east and south <= MUMBAI[1] < north
+    assert tile_xy(0, 0, 0) == (0, 0)
+    assert quadkey(3, 5, 3) == '213'
+    assert tiles_in_range(tile_range((72.7, 18.9, 73.0, 19.3), 10)) == [(718, 456), (719, 456), (718, 457), (719, 457)]
+    with pytest.raises(ValueError):
+        parse_zoom('25')
+
+
+def test_own_write_evicts_only_the_tiles_containing_the_point(tiles):
+    mumbai, delhi = fill(tiles)
+    tiles.versions.version += 1
+    tiles.points_changed([point(*MUMBAI)])
+    found, _ = tiles.lookup(6, [mumbai, delhi], '')
+    assert list(found) == [delhi]
+    assert tiles.stats()['tiles'] == 1
+
+
+def test_writes_from_other_workers_clear_every_tile(tiles):
+    mumbai, delhi = fill(tiles)
+    # Our write plus one made elsewhere: the tile eviction alone cannot be trusted
+    tiles.versions.version += 2
+    tiles.points_changed([point(*MUMBAI)])
+    assert tiles.lookup(6, [mumbai, delhi], '')[0] == {}
+
+
+def test_version_change_is_noticed_on_refresh(tiles):
+    mumbai, delhi = fill(tiles)
+    tiles.versions.version += 1
+    assert len(tiles.lookup(6, [mumbai, delhi], '')[0]) == 2
+    tiles.refresh_interval = 0
+    assert tiles.lookup(6, [mumbai, delhi], '')[0] == {}
+
+
+def test_results_computed_before_an_eviction_are_not_stored(tiles):
+    wanted = [tile_xy(*MUMBAI, 6)]
+    _, generation = tiles.lookup(6, wanted, '')
+    tiles.versions.version += 1
+    tiles.points_changed([point(*MUMBAI)])
+    tiles.store(6, {wanted[0]: [{'count': 1}]}, '', generation)
+    assert tiles.stats()['tiles'] == 0
+
+
+def test_invalidate_and_size_cap(tiles):
+    fill(tiles, variant='status=reported')
+    tiles.invalidate()
+    assert tiles.stats()['tiles'] == 0
+    tiles.max_tiles = 3
+    for zoom in (4, 5):
+        fill(tiles, zoom)
+    assert tiles.stats()['tiles'] == 3
@@ -0,0 +1,18 @@
+def test_update_records_the_first_response_once(api, client, monkeypatch):
+    created = client.post('/api/incidents', json={'title': 'Bridge collapse', 'type': 'collapse',
+                                                  'lat': 19.0, 'lng': 72.8}).get_json()
+    url = f"/api/incidents/{created['id']}"
+
+    def second_write(*args, **kwargs):
+        raise AssertionError('respondedAt must be set by the update itself')
+    monkeypatch.setattr(api.incidents_collection, 'update_one', second_write)
+
+    client.put(url, json={'severity': 'high'})
+    assert 'respondedAt' not in api.incidents_collection.find_one()
+
+    assert client.put(url, json={'status': 'responding'}).status_code == 200
+    responded = api.incidents_collection.find_one()['respondedAt']
+    assert responded == api.incidents_collection.find_one()['updatedAt']
+
+    assert client.put(url, json={'status': 'resolved'}).status_code == 200
+    assert api.incidents_collection.find_one()['respondedAt'] == responded
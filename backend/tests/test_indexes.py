@@ -0,0 +1,67 @@
+import pytest
+from pymongo import TEXT
+from pymongo.errors import OperationFailure
+
+from indexes import INDEXES, ensure_indexes, index_report
+
+
+class FakeCollection:
+    def __init__(self, existing=(), usage=None, fail=False):
+        self.existing = {'_id_': {}, **{name: {} for name in existing}}
+        self.usage = usage
+        self.fail = fail
+        self.created = []
+
+    def create_indexes(self, models):
+        if self.fail:
+            raise OperationFailure('Index with name: status already exists with different options')
+        names = [model.document['name'] for model in models]
+        self.created += names
+        return names
+
+    def index_information(self):
+        return self.existing
+
+    def aggregate(self, pipeline):
+        if self.usage is None:
+            raise OperationFailure('not authorized to execute $indexStats')
+        return [{'name': name, 'accesses': {'ops': ops}} for name, ops in self.usage.items()]
+
+
+def leading_keys(collection_name):
+    return {next(iter(model.document['key'])) for model in INDEXES[collection_name]}
+
+
+def test_declared_indexes_are_well_formed():
+    for collection_name, models in INDEXES.items():
+        names = [model.document['name'] for model in models]
+        assert len(names) == len(set(names)), collection_name
+        text_indexes = [model for model in models if TEXT in model.document['key'].values()]
+        assert len(text_indexes) <= 1, collection_name
+
+
+@pytest.mark.parametrize('collection_name, field', [
+    ('alerts', 'createdAt'), ('incidents', 'createdAt'), ('resources', 'lastUpdated'),
+    ('evacuation_plans', 'lastUpdated'), ('messages', 'timestamp'), ('incidents', 'geo'), ('resources', 'geo'),
+    ('teams', 'geo'), ('alerts', 'syncedAt'), ('users', 'username'), ('resource_allocations', 'resourceId'),
+])
+def test_list_and_lookup_fields_lead_an_index(collection_name, field):
+    assert field in leading_keys(collection_name)
+
+
+def test_ensure_indexes_reports_conflicts_per_collection():
+    db = {'alerts': FakeCollection(), 'incidents': FakeCollection(fail=True)}
+    registry = {name: INDEXES[name] for name in db}
+    result = ensure_indexes(db, registry)
+    assert result['created'] == {'alerts': [model.document['name'] for model in INDEXES['alerts']]}
+    assert list(result['errors']) == ['incidents']
+
+
+def test_index_report_lists_missing_undeclared_and_unused():
+    db = {'teams': FakeCollection(existing=('status_type', 'name_1'), usage={'_id_': 0, 'status_type': 0}),
+          'users': FakeCollection()}
+    report = index_report(db, {name: INDEXES[name] for name in db})
+    assert report['teams'] == {'missing': ['geo_2dsphere', 'syncedAt'], 'undeclared': ['name_1'],
+                               'unused': ['status_type']}
+    # Without $indexStats privileges the usage data is skipped
+    assert report['users'] == {'missing': ['username_unique'], 'undeclared': [], 'unused': []}
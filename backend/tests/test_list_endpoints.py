@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+
+def test_keyset_pagination_walks_every_document_once(api, client):
+    api.alerts_collection.insert_many([{'title': f'Alert {i}', 'severity': 'high'} for i in range(5)])
+    titles, url = [], '/api/alerts?limit=2'
+    while True:
+        response = client.get(url)
+        assert response.status_code == 200
+        titles += [alert['title'] for alert in response.get_json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+        url = f'/api/alerts?limit=2&after={cursor}'
+    assert titles == [f'Alert {i}' for i in range(5)]
+
+
+def test_pagination_on_a_descending_sort_key(api, client):
+    start = datetime(2024, 6, 1)
+    api.messages_collection.insert_many([{'subject': f'Message {i}', 'timestamp': start + timedelta(minutes=i % 3)}
+                                         for i in range(6)])
+    first = client.get('/api/messages?limit=4')
+    second = client.get(f"/api/messages?limit=4&after={first.headers['X-Next-Cursor']}")
+    assert 'X-Next-Cursor' not in second.headers
+    docs = first.get_json() + second.get_json()
+    assert len({doc['id'] for doc in docs}) == 6
+    assert [doc['timestamp'] for doc in docs] == sorted((doc['timestamp'] for doc in docs), reverse=True)
+
+
+def test_fields_projection_keeps_the_id(api, client):
+    api.resources_collection.insert_one({'name': 'Water', 'quantity': 10, 'location': 'Dadar'})
+    assert client.get('/api/resources?fields=name,id').get_json() == [
+        {'id': str(api.resources_collection.find_one()['_id']), 'name': 'Water'}]
+
+
+def test_status_and_severity_filters(api, client):
+    api.incidents_collection.insert_many([
+        {'title': 'Fire', 'status': 'reported', 'severity': 'high'},
+        {'title': 'Flood', 'status': 'responding', 'severity': 'critical'},
+        {'title': 'Leak', 'status': 'resolved', 'severity': 'low'},
+    ])
+    titles = [doc['title'] for doc in client.get('/api/incidents?status=reported,responding').get_json()]
+    assert titles == ['Fire', 'Flood']
+    assert [doc['title'] for doc in client.get('/api/incidents?severity=low').get_json()] == ['Leak']
+
+
+def test_invalid_list_parameters_are_rejected(client):
+    for query, error in (('limit=-1', 'limit must be a positive integer'), ('after=bogus', 'Invalid cursor'),
+                         ('bbox=72,18,73,19', 'bbox is not supported on this endpoint')):
+        response = client.get(f'/api/alerts?{query}')
+        assert response.status_code == 400
+        assert response.get_json()['error'] == error
@@ -0,0 +1,120 @@
+import mongomock
+import pytest
+from pymongo import ReadPreference
+from pymongo.errors import OperationFailure
+
+import mongo as mongo_module
+from mongo import LazyMongo
+
+
+class FakeSession:
+    def __init__(self, error=None):
+        self.error = error
+        self.read_preference = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def with_transaction(self, callback, read_preference=None):
+        if self.error:
+            raise self.error
+        self.read_preference = read_preference
+        return callback(self)
+
+
+def lazy_mongo(monkeypatch, session):
+    monkeypatch.setattr(mongo_module, 'MongoClient', mongomock.MongoClient)
+    mongo = LazyMongo('mongodb://localhost:27017/', 'test')
+    monkeypatch.setattr(mongo.client, 'start_session', lambda: session)
+    return mongo
+
+
+def test_run_in_transaction_uses_a_session_on_the_primary(monkeypatch):
+    session = FakeSession()
+    mongo = lazy_mongo(monkeypatch, session)
+    assert mongo.run_in_transaction(lambda s: s) == (session, True)
+    assert session.read_preference == ReadPreference.PRIMARY
+
+
+def test_run_in_transaction_falls_back_without_transaction_support(monkeypatch):
+    mongo = lazy_mongo(monkeypatch, FakeSession(OperationFailure('Transaction numbers are only allowed on a replica set',
+                                                                 code=20)))
+    assert mongo.run_in_transaction(lambda s: s) == (None, False)
+
+
+def test_run_in_transaction_raises_other_failures(monkeypatch):
+    mongo = lazy_mongo(monkeypatch, FakeSession(OperationFailure('WriteConflict', code=112)))
+    with pytest.raises(OperationFailure):
+        mongo.run_in_transaction(lambda s: s)
+
+
+class RecordingClient(mongomock.MongoClient):
+    created = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.options = kwargs
+        self.closed = False
+        RecordingClient.created.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def recording_client(monkeypatch):
+    RecordingClient.created = []
+    monkeypatch.setattr(mongo_module, 'MongoClient', RecordingClient)
+    return RecordingClient
+
+
+def test_client_is_created_on_first_use_and_reused(recording_client):
+    mongo = LazyMongo('mongodb://localhost:27017/', 'test', maxPoolSize=5)
+    assert recording_client.created == [] and not mongo.connected
+    client = mongo.client
+    assert mongo.client is client and recording_client.created == [client]
+    assert client.options == {'maxPoolSize': 5}
+    assert mongo.stats() == {'database': 'test', 'connected': True, 'options': {'maxPoolSize': 5}}
+
+
+def test_forked_process_builds_its_own_client(recording_client, monkeypatch):
+    mongo = LazyMongo('mongodb://localhost:27017/', 'test')
+    parent = mongo.client
+    monkeypatch.setattr(mongo_module.os, 'getpid', lambda: -1)
+    assert not mongo.connected
+    child = mongo.client
+    assert child is not parent
+    # The inherited client's sockets belong to the parent: it is left alone
+    mongo.close()
+    assert not parent.closed and child.closed
+
+
+def test_lazy_collections_follow_the_current_client(recording_client, monkeypatch):
+    mongo = LazyMongo('mongodb://localhost:27017/', 'test')
+    alerts = mongo_module.LazyDatabase(mongo)['alerts']
+    alerts.insert_one({'title': 'Flood warning'})
+    monkeypatch.setattr(mongo_module.os, 'getpid', lambda: -1)
+    # A new process gets a new client (a fresh mongomock store here)
+    assert alerts.count_documents({}) == 0
+    assert len(recording_client.created) == 2
+
+
+def test_client_options_from_configuration():
+    options = mongo_module.client_options({'MONGO_MAX_POOL_SIZE': '50', 'MONGO_WRITE_CONCERN': 'majority',
+                                           'MONGO_APP_NAME': '', 'MONGO_READ_PREFERENCE': 'secondaryPreferred'})
+    assert options == {'maxPoolSize': 50, 'w': 'majority', 'readPreference': 'secondaryPreferred'}
+    assert mongo_module.client_options({'MONGO_WRITE_CONCERN': '2'}) == {'w': 2}
+    with pytest.raises(ValueError, match='MONGO_MAX_POOL_SIZE must be an integer'):
+        mongo_module.client_options({'MONGO_MAX_POOL_SIZE': 'many'})
+
+
+def test_create_app_configures_without_connecting(api, recording_client):
+    app = api.create_app({'MONGO_URI': 'mongodb://db.example:27017/', 'MONGO_DB': 'factory_test',
+                          'MONGO_MAX_POOL_SIZE': '7', 'JSON_ENCODER': 'json'})
+    assert recording_client.created == []
+    assert (api.mongo.uri, api.mongo.database_name) == ('mongodb://db.example:27017/', 'factory_test')
+    assert api.mongo.options == {'maxPoolSize': 7}
+    assert app.json.encoder.name == 'json'
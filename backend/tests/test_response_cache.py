@@ -0,0 +1,43 @@
+import fakeredis
+from werkzeug.http import unquote_etag
+
+from response_cache import RedisCacheBackend, ResponseCache, create_backend
+
+
+def redis_cache(server):
+    return ResponseCache(RedisCacheBackend(client=fakeredis.FakeRedis(server=server)), collections=('alerts',))
+
+
+def test_fakeredis_url_uses_the_redis_backend():
+    backend = create_backend('redis', url='fakeredis://')
+    backend.set('alerts:v1', b'\n[]')
+    assert backend.name == 'redis'
+    assert backend.get('alerts:v1') == b'\n[]'
+    assert backend.stats() == {'keys': 1}
+
+
+def test_redis_backend_entries_are_invalidated_by_version(api, client, monkeypatch):
+    server = fakeredis.FakeServer()
+    cache = redis_cache(server)
+    monkeypatch.setattr(api, 'response_cache', cache)
+    client.post('/api/alerts', json={'title': 'Flood warning', 'severity': 'high'})
+
+    first = client.get('/api/alerts')
+    second = client.get('/api/alerts')
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert second.get_json() == first.get_json()
+    assert second.headers['ETag'] == first.headers['ETag']
+
+    # The write bumps the collection version; the old entry stays in Redis but is unreachable
+    client.post('/api/alerts', json={'title': 'Cyclone watch', 'severity': 'critical'})
+    third = client.get('/api/alerts')
+    assert third.headers['ETag'] != first.headers['ETag']
+    assert sorted(alert['title'] for alert in third.get_json()) == ['Cyclone watch', 'Flood warning']
+    assert cache.misses == 2
+    assert len(fakeredis.FakeRedis(server=server).keys('dms:response:alerts:*')) == 2
+
+    # Another worker on the same server finds the entry for the current version
+    other_worker = redis_cache(server)
+    body, next_cursor = other_worker.get('alerts', unquote_etag(third.headers['ETag'])[0])
+    assert body == third.data
+    assert next_cursor is None
@@ -0,0 +1,126 @@
+import os
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from indexes import INDEXES
+from pagination import MAX_PAGE_SIZE, decode_cursor, decode_payload, encode_cursor, encode_payload, parse_limit
+from search import (MAX_SEARCH_RESULTS, after_condition, decode_search_cursor, encode_search_cursor, merge_results,
+                    search_pipeline)
+from sync import WATERMARK_FIELD, decode_token, encode_token
+
+
+def test_parse_limit_defaults_and_caps():
+    assert parse_limit(None) is None
+    assert parse_limit('', default=20) == 20
+    assert parse_limit('5', default=20, maximum=10) == 5
+    assert parse_limit(str(MAX_PAGE_SIZE + 1)) == MAX_PAGE_SIZE
+    assert parse_limit('500', default=20, maximum=MAX_SEARCH_RESULTS) == MAX_SEARCH_RESULTS
+    for value, message in (('ten', 'limit must be an integer'), ('0', 'limit must be a positive integer')):
+        with pytest.raises(ValueError, match=message):
+            parse_limit(value, default=20, maximum=10)
+
+
+def test_tokens_round_trip_and_reject_tampering():
+    object_id = ObjectId()
+    assert decode_payload(encode_payload({'id': object_id, 'n': 1})) == {'id': object_id, 'n': 1}
+    assert decode_cursor(encode_cursor({'_id': object_id, 'timestamp': 3}, 'timestamp')) == {'id': object_id, 'v': 3}
+    result = {'score': 1.5, 'collection': 'alerts', '_id': object_id}
+    assert decode_search_cursor(encode_search_cursor(result)) == (1.5, 'alerts', object_id)
+
+    for token in ('not a token', encode_payload({'id': 'abc'}), encode_payload([1])):
+        with pytest.raises(ValueError, match='Invalid cursor'):
+            decode_cursor(token)
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_search_cursor(encode_payload({'id': object_id}))
+    with pytest.raises(ValueError, match='Invalid sync token'):
+        decode_token(encode_payload({'id': object_id}))
+
+
+def test_sync_token_round_trip():
+    moment = datetime(2024, 6, 1, 12, 30, 15, 123000)
+    assert decode_token(encode_token(moment)) == moment
+
+
+def test_search_pipeline_starts_with_text_and_hides_the_watermark():
+    cursor = (2.0, 'incidents', ObjectId())
+    pipeline = search_pipeline('flood', {'status': 'active'}, 'alerts', cursor, limit=5)
+    assert pipeline[0] == {'$match': {'$text': {'$search': 'flood'}, 'status': 'active'}}
+    assert pipeline[1] == {'$addFields': {'score': {'$meta': 'textScore'}}}
+    assert pipeline[2] == {'$match': {'score': {'$lt': 2.0}}}
+    assert pipeline[-2:] == [{'$limit': 6}, {'$project': {WATERMARK_FIELD: 0}}]
+
+
+def test_after_condition_follows_the_merged_order():
+    cursor_id = ObjectId()
+    cursor = (2.0, 'incidents', cursor_id)
+    assert after_condition(None, 'alerts') is None
+    assert after_condition(cursor, 'messages') == {'score': {'$lte': 2.0}}
+    assert after_condition(cursor, 'alerts') == {'score': {'$lt': 2.0}}
+    assert after_condition(cursor, 'incidents') == {'$or': [{'score': {'$lt': 2.0}},
+                                                            {'score': 2.0, '_id': {'$gt': cursor_id}}]}
+
+
+def test_merge_results_ranks_across_collections():
+    ids = [ObjectId() for _ in range(4)]
+    results = {
+        'alerts': [{'_id': ids[0], 'score': 3.0}, {'_id': ids[1], 'score': 1.0}],
+        'incidents': [{'_id': ids[2], 'score': 2.0}, {'_id': ids[3], 'score': 1.0}],
+    }
+    page, next_cursor = merge_results(results, limit=3)
+    assert [(item['collection'], item['_id']) for item in page] == [('alerts', ids[0]), ('incidents', ids[2]),
+                                                                    ('alerts', ids[1])]
+    assert decode_search_cursor(next_cursor) == (1.0, 'alerts', ids[1])
+    assert merge_results({'alerts': [{'_id': ids[0], 'score': 3.0}]}, limit=3)[1] is None
+
+
+@pytest.mark.parametrize('query, error', [
+    ('', 'q is required'),
+    ('q=flood&collections=alerts,users', 'Unknown collections: users'),
+    ('q=flood&after=bogus', 'Invalid cursor'),
+    ('q=flood&limit=0', 'limit must be a positive integer'),
+])
+def test_search_endpoint_rejects_bad_parameters(client, query, error):
+    response = client.get(f'/api/search?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+
+
+@pytest.fixture
+def mongodb_alerts():
+    """Alerts collection with its text index on the server at TEST_MONGO_URI; skipped when unavailable"""
+    uri = os.getenv('TEST_MONGO_URI')
+    if not uri:
+        pytest.skip('TEST_MONGO_URI is not set')
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError as e:
+        pytest.skip(f'MongoDB not reachable: {e}')
+    db = client['disaster_management_test_search']
+    db['alerts'].create_indexes(INDEXES['alerts'])
+    yield db['alerts']
+    client.drop_database(db.name)
+    client.close()
+
+
+def test_text_search_pages_through_matches_on_mongodb(mongodb_alerts):
+    mongodb_alerts.insert_many([
+        {'title': 'Flood warning', 'description': 'River flood expected', WATERMARK_FIELD: 1},
+        {'title': 'Flood watch', 'location': 'Sion'},
+        {'title': 'Cyclone watch', 'description': 'Coastal flood possible'},
+        {'title': 'Heatwave advisory'},
+    ])
+    seen, cursor = [], None
+    while True:
+        docs = list(mongodb_alerts.aggregate(search_pipeline('flood', {}, 'alerts', cursor, limit=2)))
+        page, next_cursor = merge_results({'alerts': docs}, limit=2)
+        seen += [item['document']['title'] for item in page]
+        assert all(WATERMARK_FIELD not in item['document'] for item in page)
+        if not next_cursor:
+            break
+        cursor = decode_search_cursor(next_cursor)
+    assert len(seen) == 3 and seen[-1] == 'Cyclone watch'
@@ -0,0 +1,20 @@
+import importlib
+import sys
+
+import mongomock
+import pymongo
+
+
+def test_seeded_documents_have_geo_points(monkeypatch):
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(pymongo, 'MongoClient', lambda *args, **kwargs: client)
+    sys.modules.pop('seed_data', None)
+    importlib.import_module('seed_data')
+    db = client['disaster_management']
+    for name in ('resources', 'incidents', 'teams'):
+        docs = list(db[name].find())
+        assert docs
+        for doc in docs:
+            assert doc['geo'] == {'type': 'Point', 'coordinates': [doc['coordinates']['lng'], doc['coordinates']['lat']]}
+    # /api/resources/nearest only returns available resources
+    assert db.resources.count_documents({'status': 'available', 'geo': {'$exists': True}}) == db.resources.count_documents({})
@@ -0,0 +1,38 @@
+import json
+
+
+def test_stream_as_json_array(api, client):
+    api.resources_collection.insert_many([{'name': f'Kit {i}', 'syncedAt': i} for i in range(3)])
+    response = client.get('/api/resources?stream=1')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    body = json.loads(response.data)
+    assert [doc['name'] for doc in body] == ['Kit 0', 'Kit 1', 'Kit 2']
+    assert all('syncedAt' not in doc and 'id' in doc for doc in body)
+
+
+def test_stream_as_ndjson(api, client):
+    api.resources_collection.insert_many([{'name': f'Kit {i}'} for i in range(3)])
+    for url, headers in (('/api/resources?stream=ndjson', {}),
+                         ('/api/resources', {'Accept': 'application/x-ndjson'})):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+        lines = response.data.decode('utf-8').splitlines()
+        assert [json.loads(line)['name'] for line in lines] == ['Kit 0', 'Kit 1', 'Kit 2']
+
+
+def test_stream_honours_limit_and_empty_results(api, client):
+    assert client.get('/api/resources?stream=1').data == b'[]'
+    assert client.get('/api/resources?stream=ndjson').data == b''
+    api.resources_collection.insert_many([{'name': f'Kit {i}'} for i in range(3)])
+    response = client.get('/api/resources?stream=1&limit=2')
+    assert len(json.loads(response.data)) == 2
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_streamed_and_buffered_responses_have_their_own_etag(api, client):
+    api.resources_collection.insert_one({'name': 'Water'})
+    buffered = client.get('/api/resources')
+    streamed = client.get('/api/resources?stream=1', headers={'If-None-Match': buffered.headers['ETag']})
+    assert streamed.status_code == 200
+    assert streamed.headers['ETag'] != buffered.headers['ETag']
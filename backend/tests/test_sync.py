@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import mongomock
+
+from sync import SYNC_OVERLAP, TOMBSTONE_RETENTION, WATERMARK_FIELD, collect_changes, decode_token, tombstones_for
+
+NOW = datetime(2024, 6, 1, 12, 0)
+
+
+def sync_db():
+    db = mongomock.MongoClient()['sync']
+    alerts = db['alerts']
+    alerts.insert_many([{'title': 'Old', WATERMARK_FIELD: NOW - timedelta(hours=1)},
+                        {'title': 'Recent', WATERMARK_FIELD: NOW - SYNC_OVERLAP / 2}])
+    db['tombstones'].insert_many(tombstones_for('alerts', ['gone', 'long-gone'], NOW))
+    db['tombstones'].update_one({'docId': 'long-gone'}, {'$set': {'deletedAt': NOW - timedelta(hours=1)}})
+    return {'alerts': alerts}, db['tombstones']
+
+
+def test_delta_since_a_token_re_sends_the_overlap():
+    collections, tombstones = sync_db()
+    changes, reset, token = collect_changes(collections, tombstones, since=NOW, now=NOW + timedelta(minutes=1))
+    assert reset is False
+    assert [doc['title'] for doc in changes['alerts']['upserted']] == ['Recent']
+    assert changes['alerts']['deleted'] == ['gone']
+    assert decode_token(token) == NOW + timedelta(minutes=1)
+
+
+def test_first_sync_and_expired_tokens_get_a_snapshot():
+    collections, tombstones = sync_db()
+    for since in (None, NOW - TOMBSTONE_RETENTION - timedelta(seconds=1)):
+        changes, reset, _ = collect_changes(collections, tombstones, since=since, now=NOW)
+        assert reset is True
+        assert len(list(changes['alerts']['upserted'])) == 2 and changes['alerts']['deleted'] == []
+
+
+def test_sync_endpoint_returns_writes_and_deletes(api, client):
+    kept = client.post('/api/alerts', json={'title': 'Flood warning'}).get_json()['id']
+    removed = client.post('/api/alerts', json={'title': 'Cyclone watch'}).get_json()['id']
+    first = client.get('/api/sync?collections=alerts').get_json()
+    assert first['reset'] is True
+    assert sorted(doc['title'] for doc in first['changes']['alerts']['upserted']) == ['Cyclone watch', 'Flood warning']
+
+    client.delete(f'/api/alerts/{removed}')
+    client.put(f'/api/alerts/{kept}', json={'severity': 'high'})
+    delta = client.get(f"/api/sync?since={first['token']}&collections=alerts").get_json()
+    assert delta['reset'] is False
+    assert kept in [doc['id'] for doc in delta['changes']['alerts']['upserted']]
+    assert removed in delta['changes']['alerts']['deleted']
+    assert all(WATERMARK_FIELD not in doc for doc in delta['changes']['alerts']['upserted'])
+
+
+def test_sync_endpoint_rejects_bad_parameters(client):
+    assert client.get('/api/sync?since=bogus').get_json() == {'error': 'Invalid sync token'}
+    assert client.get('/api/sync?collections=users').status_code == 400
@@ -0,0 +1,179 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+from weather_cache import WeatherCache
+from weather_client import CircuitBreaker, CircuitOpenError, OpenWeatherClient
+
+BODIES = {
+    '/data/2.5/weather': {'name': 'Mumbai', 'coord': {'lat': 19.07, 'lon': 72.88}, 'main': {'temp': 31.2, 'humidity': 70},
+                          'wind': {'speed': 4.1}, 'visibility': 6000, 'weather': [{'main': 'Haze'}], 'timezone': 19800,
+                          'sys': {'sunrise': 1719794640, 'sunset': 1719842400}},
+    '/data/2.5/forecast': {'list': []},
+    '/data/2.5/air_pollution': {'list': [{'main': {'aqi': 3}, 'components': {'pm2_5': 40, 'pm10': 90}}]},
+}
+
+
+class StubOpenWeather(ThreadingHTTPServer):
+    """Local stand-in for api.openweathermap.org; `mode` is 'ok', 'error', 'ratelimit' or 'slow'"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.mode = 'ok'
+        self.delay = 0.6
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        if server.mode == 'slow':
+            time.sleep(server.delay)
+        path = urlparse(self.path).path
+        status = {'error': 500, 'ratelimit': 429}.get(server.mode, 200 if path in BODIES else 404)
+        body = json.dumps(BODIES[path] if status == 200 else {'cod': status}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = StubOpenWeather()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(stub, timeout=0.2, cooldown=0.3):
+    return OpenWeatherClient(base_url=stub.url, timeout=timeout, pool_size=4,
+                             breaker=CircuitBreaker(failure_rate=0.5, min_calls=4, window=10, cooldown=cooldown))
+
+
+def test_fetch_returns_all_three_bodies(stub):
+    client = make_client(stub)
+    timings = {}
+    weather, forecast, air = client.fetch('Mumbai', 'key', timings)
+    assert weather['name'] == 'Mumbai' and forecast == {'list': []} and air['list']
+    assert set(timings) == {'weather', 'forecast', 'air', 'total'}
+    assert client.breaker.snapshot()['state'] == CircuitBreaker.CLOSED
+
+
+def test_timeouts_fail_fast_and_count_as_failures(stub):
+    stub.mode = 'slow'
+    client = make_client(stub, timeout=0.2)
+    started = time.perf_counter()
+    assert client.fetch('Mumbai', 'key') == (None, None, None)
+    assert time.perf_counter() - started < stub.delay
+    assert client.breaker.snapshot()['failureRate'] == 1
+
+
+@pytest.mark.parametrize('mode', ['error', 'ratelimit', 'slow'])
+def test_circuit_opens_and_rejects_without_calling_upstream(stub, mode):
+    stub.mode = mode
+    client = make_client(stub)
+    client.fetch('Mumbai', 'key')
+    client.fetch('Mumbai', 'key')
+    assert client.breaker.snapshot()['state'] == CircuitBreaker.OPEN
+    calls = stub.requests
+    started = time.perf_counter()
+    with pytest.raises(CircuitOpenError):
+        client.fetch('Mumbai', 'key')
+    assert time.perf_counter() - started < 0.05
+    assert stub.requests == calls
+    assert client.breaker.snapshot()['rejectedCalls'] == 1
+
+
+def test_client_errors_do_not_open_the_circuit(stub):
+    client = make_client(stub)
+    for _ in range(5):
+        assert client._get('/data/2.5/onecall', {}, {}, 'weather') is None
+    assert client.breaker.snapshot()['state'] == CircuitBreaker.CLOSED
+
+
+def test_probe_after_cooldown_retries_the_upstream(stub):
+    stub.mode = 'error'
+    client = make_client(stub, cooldown=0.2)
+    client.fetch('Mumbai', 'key')
+    client.fetch('Mumbai', 'key')
+    assert client.breaker.snapshot()['state'] == CircuitBreaker.OPEN
+
+    # A failed probe opens the circuit again for another cooldown
+    time.sleep(0.25)
+    client.fetch('Mumbai', 'key')
+    assert client.breaker.snapshot()['state'] == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        client.fetch('Mumbai', 'key')
+
+    # A successful probe closes it
+    stub.mode = 'ok'
+    time.sleep(0.25)
+    weather, _, _ = client.fetch('Mumbai', 'key')
+    assert weather['name'] == 'Mumbai'
+    assert client.breaker.snapshot()['state'] == CircuitBreaker.CLOSED
+
+
+@pytest.fixture
+def weather_api(api, stub, monkeypatch):
+    monkeypatch.setenv('OPENWEATHER_API_KEY', 'test-key')
+    monkeypatch.setattr(api, 'weather_client', make_client(stub))
+    monkeypatch.setattr(api, 'weather_cache', WeatherCache(api.weather_collection, ttl=600, stale_ttl=1800))
+    return api
+
+
+def test_open_circuit_serves_fallback_data_immediately(weather_api, client, stub):
+    stub.mode = 'error'
+    for _ in range(2):
+        assert client.get('/api/weather/Pune').headers['X-Weather-Cache'] == 'bypass'
+    assert weather_api.weather_client.breaker.snapshot()['state'] == CircuitBreaker.OPEN
+
+    calls = stub.requests
+    response = client.get('/api/weather/Pune')
+    assert response.status_code == 200
+    assert response.headers['X-Weather-Cache'] == 'unavailable'
+    assert response.get_json() == weather_api.fallback_weather_report('Pune')
+    assert stub.requests == calls
+    assert client.get('/api/health').get_json()['weatherUpstream']['circuit']['state'] == CircuitBreaker.OPEN
+
+
+def test_open_circuit_serves_cached_report(weather_api, client, stub):
+    first = client.get('/api/weather/Mumbai')
+    assert first.headers['X-Weather-Cache'] == 'miss'
+    assert first.get_json()['location'] == 'Mumbai'
+
+    stub.mode = 'error'
+    weather_api.weather_client.breaker._open()
+    # Past the stale window the failed refresh falls back to the expired snapshot
+    weather_api.weather_cache.ttl = weather_api.weather_cache.stale_ttl = 0
+    response = client.get('/api/weather/Mumbai')
+    assert response.headers['X-Weather-Cache'] == 'expired'
+    assert response.get_json() == first.get_json()
+
+
+def test_batch_reports_expired_snapshots_as_stale(weather_api, client, stub):
+    client.get('/api/weather/Mumbai')
+    stub.mode = 'error'
+    weather_api.weather_client.breaker._open()
+    weather_api.weather_cache.ttl = weather_api.weather_cache.stale_ttl = 0
+
+    results = client.get('/api/weather?locations=Mumbai,Pune').get_json()['results']
+    assert [(item['location'], item['status'], item['cache']) for item in results] == [
+        ('Mumbai', 'stale', 'expired'), ('Pune', 'fallback', 'bypass')]
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+
+# Timestamp fields stored as BSON dates, per collection
+TIMESTAMP_FIELDS = {
+    'alerts': ('createdAt', 'updatedAt'),
+    'incidents': ('createdAt', 'updatedAt', 'respondedAt'),
+    'resources': ('lastUpdated',),
+    'evacuation_plans': ('lastUpdated',),
+    'messages': ('timestamp',),
+    'users': ('lastActive',),
+}
+
+
+def utc_now():
+    """Current UTC time truncated to the millisecond precision BSON dates keep"""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 string (or datetime) into a naive UTC datetime; raises ValueError"""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def migrate_timestamps(db, fields=TIMESTAMP_FIELDS, batch_size=1000):
+    """
+    Convert ISO string timestamps written by older versions into BSON dates.
+    Documents are streamed from a cursor and rewritten in unordered bulk batches, so
+    memory use stays flat regardless of collection size. Only documents that still
+    hold a string are touched, so the migration can be re-run safely.
+    Returns {collection: {'migrated': n, 'invalid': n}}.
+    """
+    results = {}
+    for collection_name, names in fields.items():
+        collection = db[collection_name]
+        query = {'$or': [{name: {'$type': 'string'}} for name in names]}
+        projection = {name: 1 for name in names}
+        migrated = invalid = 0
+        operations = []
+        for doc in collection.find(query, projection).batch_size(batch_size):
+            update = {}
+            for name in names:
+                value = doc.get(name)
+                if not isinstance(value, str):
+                    continue
+                try:
+                    update[name] = parse_timestamp(value)
+                except ValueError:
+                    invalid += 1
+            if update:
+                operations.append(UpdateOne({'_id': doc['_id']}, {'$set': update}))
+            if len(operations) >= batch_size:
+                migrated += collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            migrated += collection.bulk_write(operations, ordered=False).modified_count
+        results[collection_name] = {'migrated': migrated, 'invalid': invalid}
+    return results
+
+
+def coerce_timestamps(collection_name, data):
+    """Store client supplied ISO strings in a collection's timestamp fields as BSON dates"""
+    for name in TIMESTAMP_FIELDS.get(collection_name, ()):
+        value = data.get(name)
+        if isinstance(value, str):
+            try:
+                data[name] = parse_timestamp(value)
+            except ValueError:
+                pass
+    return data
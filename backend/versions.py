@@ -0,0 +1,68 @@
+import hashlib
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+
+def format_etag(name, epoch, version, variant=''):
+    # The response cache is keyed on the ETag, so variants must not collide: 96 bits of BLAKE2b
+    suffix = f'-{hashlib.blake2b(variant.encode("utf-8"), digest_size=12).hexdigest()}' if variant else ''
+    return f'{name}-{epoch}-{version}{suffix}'
+
+
+class CollectionVersions:
+    """
+    Per-collection version counters stored in MongoDB (shared by all workers).
+    Write handlers bump the counter of the collection they modify; list endpoints
+    derive their ETag from it, so a matching If-None-Match can be answered without
+    reading the collection itself. Each counter carries a random epoch so that
+    resetting the counters never reuses an old ETag.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def bump(self, name):
+        self.collection.update_one(
+            {'_id': name},
+            {'$inc': {'version': 1}, '$setOnInsert': {'epoch': str(ObjectId())}},
+            upsert=True
+        )
+
+    def current(self, name):
+        """Return (epoch, version) for a collection, creating the counter if needed"""
+        doc = self.collection.find_one({'_id': name})
+        if doc is None:
+            doc = self.collection.find_one_and_update(
+                {'_id': name},
+                {'$setOnInsert': {'version': 0, 'epoch': str(ObjectId())}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        return doc['epoch'], doc['version']
+
+    def etag(self, name, variant=''):
+        """ETag for a collection at its current version; `variant` distinguishes query shapes"""
+        epoch, version = self.current(name)
+        return format_etag(name, epoch, version, variant)
+
+
+class AsyncCollectionVersions:
+    """Read side of CollectionVersions over an async (Motor) collection, for the async server"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def current(self, name):
+        doc = await self.collection.find_one({'_id': name})
+        if doc is None:
+            doc = await self.collection.find_one_and_update(
+                {'_id': name},
+                {'$setOnInsert': {'version': 0, 'epoch': str(ObjectId())}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        return doc['epoch'], doc['version']
+
+    async def etag(self, name, variant=''):
+        epoch, version = await self.current(name)
+        return format_etag(name, epoch, version, variant)
@@ -0,0 +1,236 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timezone
+
+
+class WeatherCache:
+    """
+    Two-tier cache for weather reports.
+    Tier 1 is an in-process LRU, tier 2 is the snapshot stored in the weather
+    collection (shared between workers and restarts). Entries younger than `ttl`
+    are served as is; entries younger than `ttl + stale_ttl` are served while a
+    background refresh fetches a new copy. Concurrent fetches of the same location
+    are collapsed into one upstream call.
+    """
+
+    def __init__(self, collection, ttl=600, stale_ttl=1800, max_entries=256):
+        self.collection = collection
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._inflight = {}
+
+    @staticmethod
+    def normalize(location):
+        """Cache key for a location: lowercase with collapsed whitespace"""
+        return ' '.join(location.lower().split())
+
+    def _remember(self, key, data, fetched_at):
+        with self._lock:
+            self._entries[key] = (data, fetched_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _memory_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _from_snapshot(self, key, snapshot):
+        """Load a tier 2 snapshot into tier 1, returning its entry (None for no snapshot)"""
+        if not snapshot or 'data' not in snapshot:
+            return None
+        fetched_at = snapshot['fetchedAt'].replace(tzinfo=timezone.utc).timestamp()
+        self._remember(key, snapshot['data'], fetched_at)
+        return snapshot['data'], fetched_at
+
+    def _snapshot(self, key, data):
+        """Remember fresh data in tier 1 and return the tier 2 snapshot document for it"""
+        fetched_at = time.time()
+        self._remember(key, data, fetched_at)
+        return {'location': key, 'data': data,
+                'fetchedAt': datetime.fromtimestamp(fetched_at, timezone.utc).replace(tzinfo=None)}
+
+    def get(self, key):
+        """Return (data, fetched_at epoch seconds) or None"""
+        entry = self._memory_entry(key)
+        if entry:
+            return entry
+        try:
+            snapshot = self.collection.find_one({'_id': key})
+        except Exception as e:
+            print(f"Weather cache read failed: {e}")
+            return None
+        return self._from_snapshot(key, snapshot)
+
+    def set(self, key, data):
+        snapshot = self._snapshot(key, data)
+        try:
+            self.collection.replace_one({'_id': key}, snapshot, upsert=True)
+        except Exception as e:
+            print(f"Weather cache write failed: {e}")
+
+    def _fetch_and_store(self, key, location, fetch):
+        """Fetch a location, sharing the result with concurrent callers for the same key"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            data, cacheable = fetch(location)
+            if cacheable:
+                self.set(key, data)
+            future.set_result((data, cacheable))
+            return data, cacheable
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key, location, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._fetch_and_store(key, location, fetch)
+            except Exception as e:
+                print(f"Weather refresh failed for {location}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get_or_fetch(self, location, fetch):
+        """
+        Serve a location from cache, calling fetch(location) -> (data, cacheable) on a miss.
+        Returns (data, status) where status is 'hit', 'stale', 'miss', 'bypass'
+        (fetched but not cacheable, e.g. fallback data) or 'expired' (fetch failed,
+        served an entry past its stale window).
+        """
+        key = self.normalize(location)
+        entry = self.get(key)
+        if entry:
+            data, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                return data, 'hit'
+            if age < self.ttl + self.stale_ttl:
+                self._refresh_in_background(key, location, fetch)
+                return data, 'stale'
+        try:
+            data, cacheable = self._fetch_and_store(key, location, fetch)
+        except Exception:
+            # Upstream unavailable: an expired snapshot beats no data at all
+            if entry:
+                return entry[0], 'expired'
+            raise
+        return data, 'miss' if cacheable else 'bypass'
+
+
+class AsyncWeatherCache:
+    """
+    asyncio front end to a WeatherCache: it shares the in-process tier with the sync
+    cache and reads and writes tier 2 through an async (Motor) collection.
+    Concurrent fetches are collapsed per location and stale entries are refreshed
+    in background tasks, as in WeatherCache; fetch is a coroutine function.
+    """
+
+    def __init__(self, cache, collection):
+        self.cache = cache
+        self.collection = collection
+        self._inflight = {}
+        self._refreshing = {}
+
+    async def get(self, key):
+        entry = self.cache._memory_entry(key)
+        if entry:
+            return entry
+        try:
+            snapshot = await self.collection.find_one({'_id': key})
+        except Exception as e:
+            print(f"Weather cache read failed: {e}")
+            return None
+        return self.cache._from_snapshot(key, snapshot)
+
+    async def set(self, key, data):
+        snapshot = self.cache._snapshot(key, data)
+        try:
+            await self.collection.replace_one({'_id': key}, snapshot, upsert=True)
+        except Exception as e:
+            print(f"Weather cache write failed: {e}")
+
+    async def _fetch_and_store(self, key, location, fetch):
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            data, cacheable = await fetch(location)
+            if cacheable:
+                await self.set(key, data)
+            future.set_result((data, cacheable))
+            return data, cacheable
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Followers re-raise it; mark it retrieved in case there are none
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _refresh_in_background(self, key, location, fetch):
+        if key in self._refreshing:
+            return
+
+        async def run():
+            try:
+                await self._fetch_and_store(key, location, fetch)
+            except Exception as e:
+                print(f"Weather refresh failed for {location}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        # Keep a reference so the task is not garbage collected while running
+        self._refreshing[key] = asyncio.get_running_loop().create_task(run())
+
+    async def get_or_fetch(self, location, fetch):
+        """Same contract as WeatherCache.get_or_fetch()"""
+        key = self.cache.normalize(location)
+        entry = await self.get(key)
+        if entry:
+            data, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < self.cache.ttl:
+                return data, 'hit'
+            if age < self.cache.ttl + self.cache.stale_ttl:
+                self._refresh_in_background(key, location, fetch)
+                return data, 'stale'
+        try:
+            data, cacheable = await self._fetch_and_store(key, location, fetch)
+        except Exception:
+            if entry:
+                return entry[0], 'expired'
+            raise
+        return data, 'miss' if cacheable else 'bypass'
@@ -0,0 +1,275 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # Optional, only needed by the async server (asgi.py)
+    httpx = None
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker.
+    Tracks the outcome of the last `window` calls; once at least `min_calls` have been
+    seen and the failure rate reaches `failure_rate` the circuit opens and calls are
+    rejected for `cooldown` seconds. After that a single probe is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate=0.5, min_calls=5, window=20, cooldown=30):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejected = 0
+
+    def allow_request(self):
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    self._rejected += 1
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self._rejected += 1
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            if self._state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._open()
+
+    def snapshot(self):
+        """Current state for /api/health"""
+        with self._lock:
+            calls = len(self._outcomes)
+            snapshot = {
+                'state': self._state,
+                'recentCalls': calls,
+                'failureRate': round(self._outcomes.count(False) / calls, 2) if calls else 0,
+                'rejectedCalls': self._rejected,
+            }
+            if self._state == self.OPEN:
+                snapshot['retryInSeconds'] = max(0, round(self.cooldown - (time.monotonic() - self._opened_at), 1))
+            return snapshot
+
+
+class StageTimings:
+    """Latency statistics per upstream stage, shared by the sync and async clients"""
+
+    STAGES = ('weather', 'forecast', 'air', 'total')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {stage: {'count': 0, 'totalMs': 0.0, 'maxMs': 0.0} for stage in self.STAGES}
+
+    def record(self, timings, stage, started):
+        elapsed = (time.perf_counter() - started) * 1000
+        timings[stage] = elapsed
+        with self._lock:
+            stats = self._stats[stage]
+            stats['count'] += 1
+            stats['totalMs'] += elapsed
+            stats['maxMs'] = max(stats['maxMs'], elapsed)
+
+    def summary(self):
+        """Average and max latency per stage since startup"""
+        with self._lock:
+            return {
+                stage: {
+                    'count': stats['count'],
+                    'avgMs': round(stats['totalMs'] / stats['count'], 1) if stats['count'] else 0,
+                    'maxMs': round(stats['maxMs'], 1),
+                }
+                for stage, stats in self._stats.items()
+            }
+
+
+class OpenWeatherClient:
+    """
+    OpenWeatherMap client using one pooled keep-alive session.
+    The forecast request runs in parallel with the current weather -> air pollution
+    chain (air pollution needs the coordinates returned by the weather call).
+    All calls go through a circuit breaker so a failing upstream is skipped quickly.
+    """
+
+    def __init__(self, base_url='https://api.openweathermap.org', timeout=5, pool_size=10, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='openweather')
+        self.stats = StageTimings()
+
+    def _record(self, timings, stage, started):
+        self.stats.record(timings, stage, started)
+
+    def _get(self, path, params, timings, stage):
+        """GET an API path, returning the JSON body or None on any failure"""
+        started = time.perf_counter()
+        try:
+            response = self.session.get(
+                f'{self.base_url}{path}',
+                params=params,
+                timeout=self.timeout
+            )
+            # Server errors and rate limiting count against the upstream, 4xx (e.g. unknown city) do not
+            if response.status_code >= 500 or response.status_code == 429:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except (requests.RequestException, ValueError) as e:
+            self.breaker.record_failure()
+            print(f"API Error ({stage}): {e}")
+            return None
+        finally:
+            self._record(timings, stage, started)
+
+    def fetch(self, location, api_key, timings=None):
+        """
+        Fetch current weather, forecast and air pollution for a location.
+        Returns (weather, forecast, air) JSON bodies (None where unavailable);
+        per-stage durations in milliseconds are written into `timings`.
+        Raises CircuitOpenError without calling the upstream while the circuit is open.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError('OpenWeatherMap circuit is open')
+        timings = {} if timings is None else timings
+        started = time.perf_counter()
+        query = {'q': location, 'appid': api_key, 'units': 'metric'}
+        forecast_future = self._executor.submit(self._get, '/data/2.5/forecast', query, timings, 'forecast')
+
+        weather = self._get('/data/2.5/weather', query, timings, 'weather')
+        air = None
+        if weather and 'coord' in weather:
+            coords = {'lat': weather['coord']['lat'], 'lon': weather['coord']['lon'], 'appid': api_key}
+            air = self._get('/data/2.5/air_pollution', coords, timings, 'air')
+
+        forecast = forecast_future.result()
+        self._record(timings, 'total', started)
+        return weather, forecast, air
+
+    def timing_summary(self):
+        """Average and max latency per stage since startup"""
+        return self.stats.summary()
+
+
+class AsyncOpenWeatherClient:
+    """
+    asyncio counterpart of OpenWeatherClient on one pooled httpx.AsyncClient.
+    Same call graph (forecast concurrently with weather -> air pollution), and it
+    shares the circuit breaker and stage statistics of the sync client it mirrors,
+    since both talk to the same upstream.
+    """
+
+    def __init__(self, base_url='https://api.openweathermap.org', timeout=5, pool_size=10, breaker=None, stats=None):
+        if httpx is None:
+            raise RuntimeError('The httpx package is required for the async server')
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = stats or StageTimings()
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    @classmethod
+    def mirroring(cls, client):
+        """Async client with the settings, breaker and statistics of an OpenWeatherClient"""
+        return cls(client.base_url, client.timeout, client.pool_size, breaker=client.breaker, stats=client.stats)
+
+    async def _get(self, path, params, timings, stage):
+        """GET an API path, returning the JSON body or None on any failure"""
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(path, params=params)
+            if response.status_code >= 500 or response.status_code == 429:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except (httpx.HTTPError, ValueError) as e:
+            self.breaker.record_failure()
+            print(f"API Error ({stage}): {e}")
+            return None
+        finally:
+            self.stats.record(timings, stage, started)
+
+    async def fetch(self, location, api_key, timings=None):
+        """Same contract as OpenWeatherClient.fetch()"""
+        if not self.breaker.allow_request():
+            raise CircuitOpenError('OpenWeatherMap circuit is open')
+        timings = {} if timings is None else timings
+        started = time.perf_counter()
+        query = {'q': location, 'appid': api_key, 'units': 'metric'}
+
+        async def weather_then_air():
+            weather = await self._get('/data/2.5/weather', query, timings, 'weather')
+            air = None
+            if weather and 'coord' in weather:
+                coords = {'lat': weather['coord']['lat'], 'lon': weather['coord']['lon'], 'appid': api_key}
+                air = await self._get('/data/2.5/air_pollution', coords, timings, 'air')
+            return weather, air
+
+        (weather, air), forecast = await asyncio.gather(
+            weather_then_air(), self._get('/data/2.5/forecast', query, timings, 'forecast')
+        )
+        self.stats.record(timings, 'total', started)
+        return weather, forecast, air
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def server_timing_header(timings):
+    """Format stage timings as a Server-Timing header value"""
+    return ', '.join(f'{stage};dur={ms:.1f}' for stage, ms in timings.items())
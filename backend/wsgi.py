@@ -0,0 +1,15 @@
+"""
+WSGI entry point for production servers, e.g.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    waitress-serve --listen=0.0.0.0:5000 --threads=16 wsgi:app
+
+Settings come from the environment (and a .env file when present), see create_app().
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app import create_app  # noqa: E402
+
+app = create_app()